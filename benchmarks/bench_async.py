@@ -0,0 +1,86 @@
+"""Benchmarks for ``async with`` usage of the context managers"""
+
+from __future__ import annotations
+import asyncio
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+#: Number of concurrent tasks used by the ``*.async_tasks`` benchmarks
+TASKS = 2000
+
+
+def _loop(fx: Fixture) -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    fx.stack.callback(loop.close)
+    return loop
+
+
+@benchmark("attrset.async")
+def attrset_async(fx: Fixture) -> Callable[[], Any]:
+    loop = _loop(fx)
+    obj = SimpleNamespace(foo=42)
+
+    async def main() -> None:
+        async with morecontext.attrset(obj, "foo", "bar"):
+            pass
+
+    return lambda: loop.run_until_complete(main())
+
+
+@benchmark("attrset.async_tasks")
+def attrset_async_tasks(fx: Fixture) -> Callable[[], Any]:
+    # Every task patches the same attribute and yields while inside the
+    # block, so the tasks exit in a different order than they entered.
+    loop = _loop(fx)
+    obj = SimpleNamespace(foo=42)
+
+    async def worker(i: int) -> None:
+        async with morecontext.attrset(obj, "foo", i):
+            await asyncio.sleep(0)
+
+    async def main() -> None:
+        await asyncio.gather(*(worker(i) for i in range(TASKS)))
+        assert obj.foo == 42
+
+    return lambda: loop.run_until_complete(main())
+
+
+@benchmark("envset.async_tasks")
+def envset_async_tasks(fx: Fixture) -> Callable[[], Any]:
+    loop = _loop(fx)
+    fx.stack.enter_context(morecontext.envrollback("MORECONTEXT_BENCH"))
+
+    async def worker(i: int) -> None:
+        async with morecontext.envset("MORECONTEXT_BENCH", str(i)):
+            await asyncio.sleep(0)
+
+    async def main() -> None:
+        await asyncio.gather(*(worker(i) for i in range(TASKS)))
+
+    return lambda: loop.run_until_complete(main())
+
+
+class _Resource(morecontext.AsyncOpenClosable):
+    async def open(self) -> None:  # noqa: A003
+        await asyncio.sleep(0)
+
+    async def close(self) -> None:
+        await asyncio.sleep(0)
+
+
+@benchmark("AsyncOpenClosable.async_tasks")
+def asyncopenclosable_async_tasks(fx: Fixture) -> Callable[[], Any]:
+    loop = _loop(fx)
+    res = _Resource()
+
+    async def worker() -> None:
+        async with res:
+            await asyncio.sleep(0)
+
+    async def main() -> None:
+        await asyncio.gather(*(worker() for _ in range(TASKS)))
+
+    return lambda: loop.run_until_complete(main())
@@ -0,0 +1,230 @@
+"""Benchmarks comparing bulk context managers against nesting single ones"""
+
+from __future__ import annotations
+from collections import UserDict
+from collections.abc import Callable
+from contextlib import ExitStack
+import os
+from types import SimpleNamespace
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+N = 20
+ENVVARS = {f"MORECONTEXT_BENCH_{i}": str(i) for i in range(N)}
+
+
+def _clear_envvars(fx: Fixture) -> None:
+    fx.stack.enter_context(morecontext.envrollback(*ENVVARS))
+    for name in ENVVARS:
+        os.environ.pop(name, None)
+
+
+@benchmark(f"envset.nested{N}")
+def envset_nested(fx: Fixture) -> Callable[[], Any]:
+    _clear_envvars(fx)
+
+    def run() -> None:
+        with ExitStack() as stack:
+            for name, value in ENVVARS.items():
+                stack.enter_context(morecontext.envset(name, value))
+
+    return run
+
+
+@benchmark(f"envset.mapping{N}")
+def envset_mapping(fx: Fixture) -> Callable[[], Any]:
+    _clear_envvars(fx)
+
+    def run() -> None:
+        with morecontext.envset(ENVVARS):
+            pass
+
+    return run
+
+
+@benchmark(f"envdel.nested{N}")
+def envdel_nested(fx: Fixture) -> Callable[[], Any]:
+    _clear_envvars(fx)
+    os.environ.update(ENVVARS)
+
+    def run() -> None:
+        with ExitStack() as stack:
+            for name in ENVVARS:
+                stack.enter_context(morecontext.envdel(name))
+
+    return run
+
+
+@benchmark(f"envdel.multiple{N}")
+def envdel_multiple(fx: Fixture) -> Callable[[], Any]:
+    _clear_envvars(fx)
+    os.environ.update(ENVVARS)
+
+    def run() -> None:
+        with morecontext.envdel(*ENVVARS):
+            pass
+
+    return run
+
+
+ATTRS = {f"attr{i}": i for i in range(N)}
+
+
+@benchmark(f"attrset.nested{N}")
+def attrset_nested(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace(**dict.fromkeys(ATTRS))
+
+    def run() -> None:
+        with ExitStack() as stack:
+            for name, value in ATTRS.items():
+                stack.enter_context(morecontext.attrset(obj, name, value))
+
+    return run
+
+
+@benchmark(f"attrsupdate.kwargs{N}")
+def attrsupdate_kwargs(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace(**dict.fromkeys(ATTRS))
+
+    def run() -> None:
+        with morecontext.attrsupdate(obj, **ATTRS):
+            pass
+
+    return run
+
+
+@benchmark(f"attrsupdate.triples{N}")
+def attrsupdate_triples(_fx: Fixture) -> Callable[[], Any]:
+    objs = [SimpleNamespace(foo=None) for _ in range(N)]
+    triples = [(obj, "foo", i) for i, obj in enumerate(objs)]
+
+    def run() -> None:
+        with morecontext.attrsupdate(triples):
+            pass
+
+    return run
+
+
+#: A large settings dict, a dozen keys of which get overridden
+SETTINGS = {f"setting{i}": i for i in range(1000)}
+OVERRIDES = {f"setting{i}": -i for i in range(0, 1000, 1000 // 12)}
+
+
+@benchmark("itemset.nested12")
+def itemset_nested(_fx: Fixture) -> Callable[[], Any]:
+    d = dict(SETTINGS)
+
+    def run() -> None:
+        with ExitStack() as stack:
+            for key, value in OVERRIDES.items():
+                stack.enter_context(morecontext.itemset(d, key, value))
+
+    return run
+
+
+@benchmark("itemsupdate.dict12")
+def itemsupdate_dict(_fx: Fixture) -> Callable[[], Any]:
+    d = dict(SETTINGS)
+
+    def run() -> None:
+        with morecontext.itemsupdate(d, OVERRIDES):
+            pass
+
+    return run
+
+
+@benchmark("itemsupdate.mapping12")
+def itemsupdate_mapping(_fx: Fixture) -> Callable[[], Any]:
+    d = UserDict(SETTINGS)
+
+    def run() -> None:
+        with morecontext.itemsupdate(d, OVERRIDES):
+            pass
+
+    return run
+
+
+@benchmark("itemsupdate.delete12")
+def itemsupdate_delete(_fx: Fixture) -> Callable[[], Any]:
+    d = dict(SETTINGS)
+
+    def run() -> None:
+        with morecontext.itemsupdate(d, delete=OVERRIDES):
+            pass
+
+    return run
+
+
+def _registry() -> tuple[list[str], list[str]]:
+    return [f"builtin{i}" for i in range(1000)], [f"plugin{i}" for i in range(50)]
+
+
+@benchmark("additems.nested50")
+def additems_nested(_fx: Fixture) -> Callable[[], Any]:
+    lst, plugins = _registry()
+
+    def run() -> None:
+        with ExitStack() as stack:
+            for p in plugins:
+                stack.enter_context(morecontext.additem(lst, p))
+            # Something else registers behind the plugins, so each removal
+            # has to search for its value.
+            lst.insert(0, "late")
+        lst.pop(0)
+
+    return run
+
+
+@benchmark("additems.bulk50")
+def additems_bulk(_fx: Fixture) -> Callable[[], Any]:
+    lst, plugins = _registry()
+
+    def run() -> None:
+        with morecontext.additems(lst, plugins):
+            lst.insert(0, "late")
+        lst.pop(0)
+
+    return run
+
+
+def _request_targets(fx: Fixture) -> tuple[Any, dict[str, Any], list[str]]:
+    _clear_envvars(fx)
+    return (
+        SimpleNamespace(**{f"attr{i}": i for i in range(N)}),
+        {f"key{i}": i for i in range(N)},
+        [],
+    )
+
+
+@benchmark("Patcher.exitstack")
+def patcher_exitstack(fx: Fixture) -> Callable[[], Any]:
+    # A mix of 4 * N changes made by entering the individual context managers
+    # in an ExitStack
+    obj, d, lst = _request_targets(fx)
+
+    def run() -> None:
+        with ExitStack() as stack:
+            for i, name in enumerate(ENVVARS):
+                stack.enter_context(morecontext.attrset(obj, f"attr{i}", "x"))
+                stack.enter_context(morecontext.itemset(d, f"key{i}", "x"))
+                stack.enter_context(morecontext.envset(name, "x"))
+                stack.enter_context(morecontext.additem(lst, i))
+
+    return run
+
+
+@benchmark("Patcher.patcher")
+def patcher_patcher(fx: Fixture) -> Callable[[], Any]:
+    # The same changes as Patcher.exitstack made with one Patcher
+    obj, d, lst = _request_targets(fx)
+
+    def run() -> None:
+        with morecontext.Patcher() as p:
+            for i, name in enumerate(ENVVARS):
+                p.setattr(obj, f"attr{i}", "x")
+                p.setitem(d, f"key{i}", "x")
+                p.setenv(name, "x")
+                p.append(lst, i)
+
+    return run
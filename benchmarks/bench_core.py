@@ -0,0 +1,616 @@
+"""Benchmarks for the basic set/delete/rollback context managers"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import importlib
+import os
+import sys
+from types import SimpleNamespace
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+ENVVAR = "MORECONTEXT_BENCH"
+
+#: A value that is moderately expensive to copy
+BIG = {f"key{i}": [i, str(i), {"n": i}] for i in range(100)}
+
+
+def _setenv(fx: Fixture, value: str | None) -> None:
+    fx.stack.enter_context(morecontext.envrollback(ENVVAR))
+    if value is None:
+        os.environ.pop(ENVVAR, None)
+    else:
+        os.environ[ENVVAR] = value
+
+
+@benchmark("attrset.set")
+def attrset_set(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace(foo=42)
+
+    def run() -> None:
+        with morecontext.attrset(obj, "foo", 23):
+            pass
+
+    return run
+
+
+@benchmark("attrset.unset")
+def attrset_unset(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace()
+
+    def run() -> None:
+        with morecontext.attrset(obj, "foo", 23):
+            pass
+
+    return run
+
+
+@benchmark("attrdel.set")
+def attrdel_set(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace(foo=42)
+
+    def run() -> None:
+        with morecontext.attrdel(obj, "foo"):
+            pass
+
+    return run
+
+
+@benchmark("attrdel.unset")
+def attrdel_unset(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace()
+
+    def run() -> None:
+        with morecontext.attrdel(obj, "foo"):
+            pass
+
+    return run
+
+
+def _attrrollback(copy: bool, deepcopy: bool) -> Callable[[Fixture], Any]:
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        obj = SimpleNamespace(foo=BIG)
+
+        def run() -> None:
+            with morecontext.attrrollback(
+                obj, "foo", copy=copy, deepcopy=deepcopy
+            ):
+                pass
+
+        return run
+
+    return setup
+
+
+benchmark("attrrollback.plain")(_attrrollback(False, False))
+benchmark("attrrollback.copy")(_attrrollback(True, False))
+benchmark("attrrollback.deepcopy")(_attrrollback(False, True))
+
+
+@benchmark("attrrollback.unset")
+def attrrollback_unset(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace()
+
+    def run() -> None:
+        with morecontext.attrrollback(obj, "foo"):
+            pass
+
+    return run
+
+
+@benchmark("itemset.set")
+def itemset_set(_fx: Fixture) -> Callable[[], Any]:
+    d = {"foo": 42}
+
+    def run() -> None:
+        with morecontext.itemset(d, "foo", 23):
+            pass
+
+    return run
+
+
+@benchmark("itemset.unset")
+def itemset_unset(_fx: Fixture) -> Callable[[], Any]:
+    d: dict[str, int] = {}
+
+    def run() -> None:
+        with morecontext.itemset(d, "foo", 23):
+            pass
+
+    return run
+
+
+@benchmark("itemdel.set")
+def itemdel_set(_fx: Fixture) -> Callable[[], Any]:
+    d = {"foo": 42}
+
+    def run() -> None:
+        with morecontext.itemdel(d, "foo"):
+            pass
+
+    return run
+
+
+@benchmark("itemdel.unset")
+def itemdel_unset(_fx: Fixture) -> Callable[[], Any]:
+    d: dict[str, int] = {}
+
+    def run() -> None:
+        with morecontext.itemdel(d, "foo"):
+            pass
+
+    return run
+
+
+def _itemrollback(copy: bool, deepcopy: bool) -> Callable[[Fixture], Any]:
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        d = {"foo": BIG}
+
+        def run() -> None:
+            with morecontext.itemrollback(d, "foo", copy=copy, deepcopy=deepcopy):
+                pass
+
+        return run
+
+    return setup
+
+
+benchmark("itemrollback.plain")(_itemrollback(False, False))
+benchmark("itemrollback.copy")(_itemrollback(True, False))
+benchmark("itemrollback.deepcopy")(_itemrollback(False, True))
+
+
+@benchmark("itemrollback.unset")
+def itemrollback_unset(_fx: Fixture) -> Callable[[], Any]:
+    d: dict[str, int] = {}
+
+    def run() -> None:
+        with morecontext.itemrollback(d, "foo"):
+            pass
+
+    return run
+
+
+@benchmark("envset.set")
+def envset_set(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, "foo")
+
+    def run() -> None:
+        with morecontext.envset(ENVVAR, "bar"):
+            pass
+
+    return run
+
+
+@benchmark("envset.unset")
+def envset_unset(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, None)
+
+    def run() -> None:
+        with morecontext.envset(ENVVAR, "bar"):
+            pass
+
+    return run
+
+
+@benchmark("envdel.set")
+def envdel_set(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, "foo")
+
+    def run() -> None:
+        with morecontext.envdel(ENVVAR):
+            pass
+
+    return run
+
+
+@benchmark("envdel.unset")
+def envdel_unset(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, None)
+
+    def run() -> None:
+        with morecontext.envdel(ENVVAR):
+            pass
+
+    return run
+
+
+@benchmark("envrollback.set")
+def envrollback_set(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, "foo")
+
+    def run() -> None:
+        with morecontext.envrollback(ENVVAR):
+            pass
+
+    return run
+
+
+@benchmark("envrollback.unset")
+def envrollback_unset(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, None)
+
+    def run() -> None:
+        with morecontext.envrollback(ENVVAR):
+            pass
+
+    return run
+
+
+@benchmark("environrollback.unchanged")
+def environrollback_unchanged(_fx: Fixture) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.environrollback():
+            pass
+
+    return run
+
+
+@benchmark("environrollback.changed")
+def environrollback_changed(fx: Fixture) -> Callable[[], Any]:
+    _setenv(fx, "foo")
+
+    def run() -> None:
+        with morecontext.environrollback():
+            os.environ[ENVVAR] = "bar"
+
+    return run
+
+
+@benchmark("environrollback.rewrite_all")
+def environrollback_rewrite_all(fx: Fixture) -> Callable[[], Any]:
+    # Baseline: saving a copy of `os.environ` and clearing & rewriting it on
+    # exit
+    _setenv(fx, "foo")
+
+    def run() -> None:
+        saved = os.environ.copy()
+        try:
+            os.environ[ENVVAR] = "bar"
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+
+    return run
+
+
+@benchmark("dirchanged.basic")
+def dirchanged_basic(fx: Fixture) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.dirchanged(fx.tmpdir):
+            pass
+
+    return run
+
+
+@benchmark("dirrollback.basic")
+def dirrollback_basic(_fx: Fixture) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.dirrollback():
+            pass
+
+    return run
+
+
+def _additem(size: int, prepend: bool) -> Callable[[Fixture], Any]:
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        lst = [f"item{i}" for i in range(size)]
+        value = "new item"
+
+        def run() -> None:
+            with morecontext.additem(lst, value, prepend=prepend):
+                pass
+
+        return run
+
+    return setup
+
+
+for _size in (10, 10_000):
+    benchmark(f"additem.append.{_size}")(_additem(_size, False))
+    benchmark(f"additem.prepend.{_size}")(_additem(_size, True))
+
+
+class SlowEq:
+    """An object with a Python-level ``__eq__``, like a path or handler"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SlowEq) and self.name == other.name
+
+    __hash__ = object.__hash__
+
+
+def _additem_grown(size: int, prepend: bool) -> Callable[[Fixture], Any]:
+    # Items are added to the far side of the list while the context manager
+    # is active, so finding the added value by scanning would compare it
+    # against all of them.
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        lst: list[SlowEq] = []
+        value = SlowEq("new item")
+        others = [SlowEq(f"item{i}") for i in range(size)]
+
+        def run() -> None:
+            with morecontext.additem(lst, value, prepend=prepend):
+                lst.extend(others)
+            lst.clear()
+
+        return run
+
+    return setup
+
+
+for _size in (10_000, 100_000):
+    benchmark(f"additem.append_grown.{_size}")(_additem_grown(_size, False))
+    benchmark(f"additem.prepend_grown.{_size}")(_additem_grown(_size, True))
+
+
+def _plugin_dir(fx: Fixture) -> str:
+    with open(os.path.join(fx.tmpdir, "mc_bench_plugin.py"), "w") as fp:
+        fp.write("VALUE = 42\n")
+    fx.stack.callback(sys.modules.pop, "mc_bench_plugin", None)
+    return fx.tmpdir
+
+
+@benchmark("syspathadd.import")
+def syspathadd_import(fx: Fixture) -> Callable[[], Any]:
+    path = _plugin_dir(fx)
+
+    def run() -> None:
+        with morecontext.syspathadd(path, evict_modules=True):
+            importlib.import_module("mc_bench_plugin")
+
+    return run
+
+
+@benchmark("additem.import_invalidate_caches")
+def additem_import_invalidate_caches(fx: Fixture) -> Callable[[], Any]:
+    # What syspathadd() replaces
+    path = _plugin_dir(fx)
+
+    def run() -> None:
+        with morecontext.additem(sys.path, path):
+            importlib.invalidate_caches()
+            importlib.import_module("mc_bench_plugin")
+        del sys.modules["mc_bench_plugin"]
+
+    return run
+
+
+class Resource(morecontext.OpenClosable):
+    def __init__(self) -> None:
+        self.opened = 0
+
+    def open(self) -> None:
+        self.opened += 1
+
+
+def _openclosable(
+    depth: int, cls: type[Any] = Resource
+) -> Callable[[Fixture], Any]:
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        res = cls()
+
+        def enter(n: int) -> None:
+            with res:
+                if n > 1:
+                    enter(n - 1)
+
+        def run() -> None:
+            enter(depth)
+
+        return run
+
+    return setup
+
+
+class ThreadSafeResource(morecontext.ThreadSafeOpenClosable):
+    def __init__(self) -> None:
+        self.opened = 0
+
+    def open(self) -> None:
+        self.opened += 1
+
+
+for _depth in (1, 4, 16):
+    benchmark(f"OpenClosable.depth{_depth}")(_openclosable(_depth))
+    benchmark(f"ThreadSafeOpenClosable.depth{_depth}")(
+        _openclosable(_depth, ThreadSafeResource)
+    )
+
+#: Number of threads used by the ``*.contended*`` benchmarks
+THREADS = 8
+
+
+def _contended(cls: type[Any]) -> Callable[[Fixture], Any]:
+    # Each run has THREADS threads each enter & exit a shared instance 1000
+    # times.  (Plain OpenClosable is included only as a baseline; it is not
+    # actually safe to use this way.)
+    def setup(fx: Fixture) -> Callable[[], Any]:
+        res = cls()
+        pool = fx.stack.enter_context(ThreadPoolExecutor(max_workers=THREADS))
+
+        def worker() -> None:
+            for _ in range(1000):
+                with res:
+                    pass
+
+        def run() -> None:
+            for f in [pool.submit(worker) for _ in range(THREADS)]:
+                f.result()
+
+        return run
+
+    return setup
+
+
+benchmark(f"OpenClosable.contended{THREADS}")(_contended(Resource))
+benchmark(f"ThreadSafeOpenClosable.contended{THREADS}")(
+    _contended(ThreadSafeResource)
+)
+
+
+@benchmark("dirchanged.usefd")
+def dirchanged_usefd(fx: Fixture) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.dirchanged(fx.tmpdir, usefd=True):
+            pass
+
+    return run
+
+
+@benchmark("dirchanged.fdcache")
+def dirchanged_fdcache(fx: Fixture) -> Callable[[], Any]:
+    cache = fx.stack.enter_context(morecontext.DirFDCache())
+
+    def run() -> None:
+        with morecontext.dirchanged(fx.tmpdir, usefd=True, fdcache=cache):
+            pass
+
+    return run
+
+
+@benchmark("dirrollback.usefd")
+def dirrollback_usefd(_fx: Fixture) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.dirrollback(usefd=True):
+            pass
+
+    return run
+
+
+@benchmark("DirFDCache.get")
+def dirfdcache_get(fx: Fixture) -> Callable[[], Any]:
+    cache = fx.stack.enter_context(morecontext.DirFDCache())
+
+    def run() -> None:
+        cache.get(fx.tmpdir)
+
+    return run
+
+
+def _deepdir(fx: Fixture) -> str:
+    path = os.path.join(fx.tmpdir, *(f"level{i}" for i in range(30)))
+    os.makedirs(path)
+    return path
+
+
+@benchmark("dirchanged.deep")
+def dirchanged_deep(fx: Fixture) -> Callable[[], Any]:
+    path = _deepdir(fx)
+
+    def run() -> None:
+        with morecontext.dirchanged(path):
+            pass
+
+    return run
+
+
+@benchmark("dirchanged.deep.fdcache")
+def dirchanged_deep_fdcache(fx: Fixture) -> Callable[[], Any]:
+    path = _deepdir(fx)
+    cache = fx.stack.enter_context(morecontext.DirFDCache())
+
+    def run() -> None:
+        with morecontext.dirchanged(path, fdcache=cache):
+            pass
+
+    return run
+
+
+class FileResource(morecontext.OpenClosable):
+    """A resource that is relatively costly to open: a file descriptor"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.fd = -1
+
+    def open(self) -> None:
+        self.fd = os.open(self.path, os.O_RDONLY)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class LingeringFileResource(morecontext.LingeringOpenClosable, FileResource):
+    linger = 60
+
+
+def _request_loop(cls: type[Any]) -> Callable[[Fixture], Any]:
+    # One "request": enter the resource and read from it
+    def setup(fx: Fixture) -> Callable[[], Any]:
+        path = os.path.join(fx.tmpdir, "data.txt")
+        with open(path, "w") as fp:
+            fp.write("data\n")
+        res = cls(path)
+        if isinstance(res, morecontext.LingeringOpenClosable):
+            fx.stack.callback(res.close_now)
+
+        def run() -> None:
+            with res:
+                os.pread(res.fd, 5, 0)
+
+        return run
+
+    return setup
+
+
+benchmark("OpenClosable.request_loop")(_request_loop(FileResource))
+benchmark("LingeringOpenClosable.request_loop")(
+    _request_loop(LingeringFileResource)
+)
+
+
+class LazyFileResource(morecontext.LazyOpenClosable, FileResource):
+    pass
+
+
+def _cache_hit(cls: type[Any]) -> Callable[[Fixture], Any]:
+    # A "request" whose scope enters the resource but never uses it
+    def setup(fx: Fixture) -> Callable[[], Any]:
+        path = os.path.join(fx.tmpdir, "data.txt")
+        with open(path, "w") as fp:
+            fp.write("data\n")
+        res = cls(path)
+
+        def run() -> None:
+            with res:
+                pass
+
+        return run
+
+    return setup
+
+
+benchmark("OpenClosable.cache_hit")(_cache_hit(FileResource))
+benchmark("LazyOpenClosable.cache_hit")(_cache_hit(LazyFileResource))
+
+
+@benchmark("OpenClosablePool.hit")
+def openclosablepool_hit(_fx: Fixture) -> Callable[[], Any]:
+    pool = morecontext.OpenClosablePool(lambda _: Resource())
+    pool.get("key")
+
+    def run() -> None:
+        with pool.get("key"):
+            pass
+
+    return run
+
+
+@benchmark("OpenClosablePool.churn")
+def openclosablepool_churn(_fx: Fixture) -> Callable[[], Any]:
+    # Cycling through more keys than the pool holds, so every get() creates
+    # an instance and evicts another
+    pool = morecontext.OpenClosablePool(lambda _: Resource(), maxsize=128)
+    keys = iter(range(1 << 62))
+
+    def run() -> None:
+        with pool.get(next(keys)):
+            pass
+
+    return run
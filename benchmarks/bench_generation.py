@@ -0,0 +1,97 @@
+"""Benchmarks for generation numbers & change subscriptions"""
+
+from __future__ import annotations
+from collections.abc import Callable
+import os
+from types import SimpleNamespace
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+ENVVAR = "MORECONTEXT_BENCH"
+
+
+def _watch(fx: Fixture, target: Any) -> None:
+    morecontext.generation(target)
+    fx.stack.callback(morecontext.unwatch, target)
+
+
+def _attrset(obj: Any) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.attrset(obj, "foo", 23):
+            pass
+
+    return run
+
+
+@benchmark("generation.read")
+def generation_read(fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace()
+    _watch(fx, obj)
+    return lambda: morecontext.generation(obj)
+
+
+@benchmark("generation.attrset_other_watched")
+def generation_attrset_other_watched(fx: Fixture) -> Callable[[], Any]:
+    # Compare with ``attrset.set``: the cost to unrelated patches of watching
+    # something
+    _watch(fx, SimpleNamespace())
+    return _attrset(SimpleNamespace(foo=42))
+
+
+@benchmark("generation.attrset_watched")
+def generation_attrset_watched(fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace(foo=42)
+    _watch(fx, obj)
+    return _attrset(obj)
+
+
+@benchmark("subscribe.attrset")
+def subscribe_attrset(fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace(foo=42)
+    fx.stack.callback(morecontext.subscribe(obj, lambda _t, _k: None))
+    fx.stack.callback(morecontext.unwatch, obj)
+    return _attrset(obj)
+
+
+@benchmark("unwatch.cycle")
+def unwatch_cycle(_fx: Fixture) -> Callable[[], Any]:
+    obj = SimpleNamespace()
+
+    def run() -> None:
+        morecontext.generation(obj)
+        morecontext.unwatch(obj)
+
+    return run
+
+
+def _parse_settings() -> dict[str, str]:
+    return dict(
+        item.partition("=")[::2] for item in os.environ.get(ENVVAR, "").split(",")
+    )
+
+
+@benchmark("generation.settings_reparse")
+def generation_settings_reparse(fx: Fixture) -> Callable[[], Any]:
+    # Baseline: re-deriving settings from the environment on every request
+    fx.stack.enter_context(
+        morecontext.envset(ENVVAR, ",".join(f"k{i}=v{i}" for i in range(20)))
+    )
+    return _parse_settings
+
+
+@benchmark("generation.settings_cached")
+def generation_settings_cached(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(
+        morecontext.envset(ENVVAR, ",".join(f"k{i}=v{i}" for i in range(20)))
+    )
+    _watch(fx, os.environ)
+    cache: list[Any] = [None, None]
+
+    def run() -> dict[str, str]:
+        g = morecontext.generation(os.environ)
+        if cache[0] != g:
+            cache[:] = [g, _parse_settings()]
+        return cache[1]  # type: ignore[no-any-return]
+
+    return run
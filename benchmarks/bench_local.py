@@ -0,0 +1,148 @@
+"""Benchmarks for the context-local patching functions"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import os
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+#: Number of attribute reads per call in the ``*.read*`` benchmarks
+READS = 100
+
+ENVVAR = "MORECONTEXT_BENCH"
+
+#: Number of threads used by the ``*threads`` benchmarks
+THREADS = 8
+
+
+def _client_class() -> type[Any]:
+    # A fresh class per benchmark so that descriptors installed by one
+    # benchmark don't affect another
+    class Client:
+        def __init__(self) -> None:
+            self.timeout = 5
+
+    return Client
+
+
+def _reader(obj: Any) -> Callable[[], Any]:
+    def run() -> None:
+        for _ in range(READS):
+            obj.timeout
+
+    return run
+
+
+@benchmark(f"localattrset.read{READS}.plain")
+def localattrset_read_plain(_fx: Fixture) -> Callable[[], Any]:
+    # Baseline: reading an ordinary instance attribute
+    return _reader(_client_class()())
+
+
+@benchmark(f"localattrset.read{READS}.installed")
+def localattrset_read_installed(_fx: Fixture) -> Callable[[], Any]:
+    # Reading after `localattrset()` has installed its descriptor, with no
+    # override in effect
+    obj = _client_class()()
+    with morecontext.localattrset(obj, "timeout", 1):
+        pass
+    return _reader(obj)
+
+
+@benchmark(f"localattrset.read{READS}.overridden")
+def localattrset_read_overridden(fx: Fixture) -> Callable[[], Any]:
+    obj = _client_class()()
+    fx.stack.enter_context(morecontext.localattrset(obj, "timeout", 1))
+    return _reader(obj)
+
+
+@benchmark("localattrset.basic")
+def localattrset_basic(_fx: Fixture) -> Callable[[], Any]:
+    obj = _client_class()()
+
+    def run() -> None:
+        with morecontext.localattrset(obj, "timeout", 1):
+            pass
+
+    return run
+
+
+@benchmark("localenvset.basic")
+def localenvset_basic(_fx: Fixture) -> Callable[[], Any]:
+    # Compare with ``envset.set``, which calls ``putenv()`` twice
+    def run() -> None:
+        with morecontext.localenvset(ENVVAR, "bar"):
+            pass
+
+    return run
+
+
+def _env_threads(fx: Fixture, cm: Callable[[str, str], Any]) -> Callable[[], Any]:
+    pool = fx.stack.enter_context(ThreadPoolExecutor(max_workers=THREADS))
+
+    def worker(_: int) -> None:
+        for i in range(100):
+            with cm(ENVVAR, str(i)):
+                pass
+
+    def run() -> None:
+        list(pool.map(worker, range(THREADS)))
+
+    return run
+
+
+@benchmark(f"localenvset.{THREADS}threads")
+def localenvset_threads(fx: Fixture) -> Callable[[], Any]:
+    return _env_threads(fx, morecontext.localenvset)
+
+
+@benchmark(f"envset.{THREADS}threads")
+def envset_threads(fx: Fixture) -> Callable[[], Any]:
+    # Not actually safe, as the threads race on `os.environ`; included only
+    # for comparison with ``localenvset.*threads``
+    fx.stack.enter_context(morecontext.envrollback(ENVVAR))
+    return _env_threads(fx, morecontext.envset)
+
+
+@benchmark("getenv.plain")
+def getenv_plain(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.envset(ENVVAR, "foo"))
+
+    def run() -> None:
+        morecontext.getenv(ENVVAR)
+
+    return run
+
+
+@benchmark("getenv.overridden")
+def getenv_overridden(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.localenvset(ENVVAR, "foo"))
+
+    def run() -> None:
+        morecontext.getenv(ENVVAR)
+
+    return run
+
+
+@benchmark("getenv.os_getenv")
+def os_getenv(fx: Fixture) -> Callable[[], Any]:
+    # Baseline: `os.getenv()` itself
+    fx.stack.enter_context(morecontext.envset(ENVVAR, "foo"))
+
+    def run() -> None:
+        os.getenv(ENVVAR)
+
+    return run
+
+
+@benchmark("environ_for_subprocess.plain")
+def environ_for_subprocess_plain(_fx: Fixture) -> Callable[[], Any]:
+    return morecontext.environ_for_subprocess
+
+
+@benchmark("environ_for_subprocess.overridden")
+def environ_for_subprocess_overridden(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.localenvset({ENVVAR: "foo", "HOME": None}))
+    return morecontext.environ_for_subprocess
@@ -0,0 +1,85 @@
+"""Benchmarks for the snapshot modes of attrrollback() & itemrollback()"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+BIG_LIST = list(range(100_000))
+BIG_DICT = {f"key{i}": i for i in range(100_000)}
+
+
+def _attrrollback(
+    value: Any, mutate: bool, **kwargs: bool
+) -> Callable[[Fixture], Callable[[], Any]]:
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        obj = SimpleNamespace(foo=value)
+
+        def run() -> None:
+            with morecontext.attrrollback(obj, "foo", **kwargs):
+                obj.foo[0 if isinstance(value, list) else "key0"]
+                if mutate:
+                    obj.foo[0 if isinstance(value, list) else "key0"] = -1
+
+        return run
+
+    return setup
+
+
+for _kind, _value in [("list", BIG_LIST), ("dict", BIG_DICT)]:
+    for _mutate in (False, True):
+        _suffix = f"{_kind}.{'write' if _mutate else 'read'}"
+        benchmark(f"attrrollback.copy.{_suffix}")(
+            _attrrollback(_value, _mutate, copy=True)
+        )
+        benchmark(f"attrrollback.lazycopy.{_suffix}")(
+            _attrrollback(_value, _mutate, copy=True, lazy=True)
+        )
+
+
+@benchmark("itemrollback.lazycopy.dict.read")
+def itemrollback_lazy(_fx: Fixture) -> Callable[[], Any]:
+    d = {"foo": BIG_DICT}
+
+    def run() -> None:
+        with morecontext.itemrollback(d, "foo", copy=True, lazy=True):
+            d["foo"]["key0"]
+
+    return run
+
+
+def _make_config() -> dict[str, Any]:
+    """Build a nested config of a few megabytes"""
+    return {
+        f"section{i}": {
+            "enabled": True,
+            "name": f"Section {i}",
+            "options": {f"opt{j}": j for j in range(20)},
+            "items": [{"id": j, "tags": ["a", "b"]} for j in range(10)],
+        }
+        for i in range(2000)
+    }
+
+
+def _config_rollback(**kwargs: bool) -> Callable[[Fixture], Callable[[], Any]]:
+    def setup(_fx: Fixture) -> Callable[[], Any]:
+        obj = SimpleNamespace(config=_make_config())
+
+        def run() -> None:
+            with morecontext.attrrollback(obj, "config", **kwargs):
+                cfg = obj.config
+                cfg["section7"]["enabled"] = False
+                cfg["section7"]["options"]["opt3"] = -1
+                cfg["section42"]["items"][0]["tags"].append("c")
+                cfg["section99"]["items"].append({"id": 10, "tags": []})
+                del cfg["section1"]
+
+        return run
+
+    return setup
+
+
+benchmark("attrrollback.deepcopy.config5writes")(_config_rollback(deepcopy=True))
+benchmark("attrrollback.journal.config5writes")(_config_rollback(journal=True))
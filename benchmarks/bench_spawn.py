@@ -0,0 +1,61 @@
+"""Benchmarks for building environments for child processes"""
+
+from __future__ import annotations
+from collections.abc import Callable
+import os
+import subprocess
+import sys
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+ENVVAR = "MORECONTEXT_BENCH"
+
+#: The environment changes made for each child
+CHANGES = {ENVVAR: "bar", "MORECONTEXT_BENCH_DEL": None}
+
+
+@benchmark("ChildEnv.env")
+def childenv_env(_fx: Fixture) -> Callable[[], Any]:
+    return morecontext.ChildEnv(CHANGES).env
+
+
+@benchmark("ChildEnv.env_localenvset")
+def childenv_env_localenvset(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.localenvset("MORECONTEXT_BENCH_LOCAL", "x"))
+    return morecontext.ChildEnv(CHANGES).env
+
+
+@benchmark("ChildEnv.envset_copy")
+def childenv_envset_copy(fx: Fixture) -> Callable[[], Any]:
+    # Baseline: what ``ChildEnv.env`` replaces
+    fx.stack.enter_context(morecontext.envrollback(*CHANGES))
+
+    def run() -> None:
+        with morecontext.envset(CHANGES):
+            _ = dict(os.environ)
+
+    return run
+
+
+@benchmark("ChildEnv.popen")
+def childenv_popen(_fx: Fixture) -> Callable[[], Any]:
+    ce = morecontext.ChildEnv(CHANGES)
+
+    def run() -> None:
+        subprocess.run([sys.executable, "-S", "-c", "pass"], env=ce.env(), check=True)
+
+    return run
+
+
+@benchmark("ChildEnv.popen_envset")
+def childenv_popen_envset(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.envrollback(*CHANGES))
+
+    def run() -> None:
+        with morecontext.envset(CHANGES):
+            subprocess.run(
+                [sys.executable, "-S", "-c", "pass"], env=dict(os.environ), check=True
+            )
+
+    return run
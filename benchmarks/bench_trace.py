@@ -0,0 +1,28 @@
+"""Benchmarks for the cost of `MutationTrace`"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+
+def _attrset(reprs: bool) -> Callable[[Fixture], Any]:
+    # Compare against attrset.set for the cost of tracing being on; when no
+    # trace is open, the only cost is a check of a global list
+    def setup(fx: Fixture) -> Callable[[], Any]:
+        fx.stack.enter_context(morecontext.MutationTrace(reprs=reprs))
+        obj = SimpleNamespace(foo=42)
+
+        def run() -> None:
+            with morecontext.attrset(obj, "foo", "bar"):
+                pass
+
+        return run
+
+    return setup
+
+
+benchmark("MutationTrace.attrset.reprs")(_attrset(True))
+benchmark("MutationTrace.attrset.typenames")(_attrset(False))
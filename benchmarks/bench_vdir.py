@@ -0,0 +1,125 @@
+"""Benchmarks for the virtual working directory functions"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+from typing import Any
+from harness import Fixture, benchmark
+import morecontext
+
+THREADS = 8
+
+
+def _tree(fx: Fixture) -> list[str]:
+    dirs = []
+    for i in range(THREADS):
+        path = os.path.join(fx.tmpdir, f"dir{i}")
+        os.mkdir(path)
+        with open(os.path.join(path, "file.txt"), "w") as fp:
+            fp.write(f"{i}\n")
+        dirs.append(path)
+    return dirs
+
+
+@benchmark("vdirchanged.basic")
+def vdirchanged_basic(fx: Fixture) -> Callable[[], Any]:
+    def run() -> None:
+        with morecontext.vdirchanged(fx.tmpdir):
+            pass
+
+    return run
+
+
+@benchmark("vopen.read")
+def vopen_read(fx: Fixture) -> Callable[[], Any]:
+    path = _tree(fx)[0]
+    fx.stack.enter_context(morecontext.vdirchanged(path))
+
+    def run() -> None:
+        with morecontext.vopen("file.txt") as fp:
+            fp.read()
+
+    return run
+
+
+@benchmark("vstat.basic")
+def vstat_basic(fx: Fixture) -> Callable[[], Any]:
+    path = _tree(fx)[0]
+    fx.stack.enter_context(morecontext.vdirchanged(path))
+
+    def run() -> None:
+        morecontext.vstat("file.txt")
+
+    return run
+
+
+@benchmark("vlistdir.basic")
+def vlistdir_basic(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.vdirchanged(fx.tmpdir))
+    _tree(fx)
+
+    def run() -> None:
+        morecontext.vlistdir()
+
+    return run
+
+
+@benchmark("vresolve.basic")
+def vresolve_basic(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.vdirchanged(fx.tmpdir))
+
+    def run() -> None:
+        morecontext.vresolve("foo/../bar")
+
+    return run
+
+
+@benchmark("vgetcwd.basic")
+def vgetcwd_basic(fx: Fixture) -> Callable[[], Any]:
+    fx.stack.enter_context(morecontext.vdirchanged(fx.tmpdir))
+
+    def run() -> None:
+        morecontext.vgetcwd()
+
+    return run
+
+
+# The following benchmarks each time a batch of 100 "change directory, stat a
+# file" operations per thread across a pool of threads.  With dirchanged(),
+# the threads must be serialized with a lock because the working directory is
+# process-wide.
+
+
+@benchmark(f"dirchanged.locked.{THREADS}threads")
+def dirchanged_threads(fx: Fixture) -> Callable[[], Any]:
+    dirs = _tree(fx)
+    lock = threading.Lock()
+    pool = fx.stack.enter_context(ThreadPoolExecutor(max_workers=THREADS))
+
+    def work(path: str) -> None:
+        for _ in range(100):
+            with lock, morecontext.dirchanged(path):
+                os.stat("file.txt")
+
+    def run() -> None:
+        list(pool.map(work, dirs))
+
+    return run
+
+
+@benchmark(f"vdirchanged.{THREADS}threads")
+def vdirchanged_threads(fx: Fixture) -> Callable[[], Any]:
+    dirs = _tree(fx)
+    pool = fx.stack.enter_context(ThreadPoolExecutor(max_workers=THREADS))
+
+    def work(path: str) -> None:
+        for _ in range(100):
+            with morecontext.vdirchanged(path):
+                morecontext.vstat("file.txt")
+
+    def run() -> None:
+        list(pool.map(work, dirs))
+
+    return run
@@ -0,0 +1,121 @@
+"""
+Compare the per-``with`` cost of morecontext's context managers against the
+generator-based implementations they replaced.
+
+Run from the repository root with::
+
+    python benchmarks/compare_legacy.py [-n NUMBER] [-r REPEAT]
+"""
+
+from __future__ import annotations
+import argparse
+from collections.abc import Callable
+import os
+from pathlib import Path
+import sys
+import tempfile
+from timeit import repeat
+from types import ModuleType, SimpleNamespace
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import legacy  # noqa: E402
+import morecontext  # noqa: E402
+
+ENVVAR = "MORECONTEXT_BENCH"
+
+
+def cases(mod: ModuleType, tmpdir: str) -> dict[str, Callable[[], Any]]:
+    obj = SimpleNamespace(foo=42)
+    d = {"foo": 42}
+    lst = list(range(10))
+    os.environ[ENVVAR] = "foo"
+
+    def attrset() -> None:
+        with mod.attrset(obj, "foo", 23):
+            pass
+
+    def attrdel() -> None:
+        with mod.attrdel(obj, "foo"):
+            pass
+
+    def attrrollback() -> None:
+        with mod.attrrollback(obj, "foo"):
+            pass
+
+    def itemset() -> None:
+        with mod.itemset(d, "foo", 23):
+            pass
+
+    def itemdel() -> None:
+        with mod.itemdel(d, "foo"):
+            pass
+
+    def itemrollback() -> None:
+        with mod.itemrollback(d, "foo"):
+            pass
+
+    def envset() -> None:
+        with mod.envset(ENVVAR, "bar"):
+            pass
+
+    def envdel() -> None:
+        with mod.envdel(ENVVAR):
+            pass
+
+    def envrollback() -> None:
+        with mod.envrollback(ENVVAR):
+            pass
+
+    def dirchanged() -> None:
+        with mod.dirchanged(tmpdir):
+            pass
+
+    def dirrollback() -> None:
+        with mod.dirrollback():
+            pass
+
+    def additem() -> None:
+        with mod.additem(lst, 42):
+            pass
+
+    return {
+        "attrset": attrset,
+        "attrdel": attrdel,
+        "attrrollback": attrrollback,
+        "itemset": itemset,
+        "itemdel": itemdel,
+        "itemrollback": itemrollback,
+        "envset": envset,
+        "envdel": envdel,
+        "envrollback": envrollback,
+        "dirchanged": dirchanged,
+        "dirrollback": dirrollback,
+        "additem": additem,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--number", type=int, default=100_000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old = cases(legacy, tmpdir)
+        new = cases(morecontext, tmpdir)
+        print(f"{'':<14}{'legacy (ns)':>12}{'classes (ns)':>14}{'speedup':>9}")
+        for name in old:
+            t_old, t_new = (
+                min(repeat(fn[name], number=args.number, repeat=args.repeat))
+                / args.number
+                * 1e9
+                for fn in (old, new)
+            )
+            print(f"{name:<14}{t_old:>12.0f}{t_new:>14.0f}{t_old / t_new:>8.2f}x")
+    os.environ.pop(ENVVAR, None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Registry & timing machinery shared by the ``bench_*.py`` modules and
+``run.py``
+"""
+
+from __future__ import annotations
+from collections.abc import Callable
+from contextlib import ExitStack
+from dataclasses import dataclass
+import statistics
+from timeit import Timer
+from typing import Any
+
+#: A benchmark setup function.  It is passed a `Fixture` and returns the
+#: zero-argument callable to time.
+Setup = Callable[["Fixture"], Callable[[], Any]]
+
+BENCHMARKS: dict[str, Setup] = {}
+
+
+def benchmark(name: str) -> Callable[[Setup], Setup]:
+    """
+    Register a benchmark under ``name``.  By convention, ``name`` starts with
+    the name of the `morecontext` API being measured followed by a period.
+    """
+
+    def decorator(func: Setup) -> Setup:
+        if name in BENCHMARKS:
+            raise ValueError(f"Duplicate benchmark name: {name!r}")
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+@dataclass
+class Fixture:
+    """Resources available to benchmark setup functions"""
+
+    #: A temporary directory that is deleted after the benchmark runs
+    tmpdir: str
+    #: Cleanup callbacks registered here run after the benchmark completes
+    stack: ExitStack
+
+
+@dataclass
+class Result:
+    number: int
+    repeat: int
+    ns_min: float
+    ns_median: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "number": self.number,
+            "repeat": self.repeat,
+            "ns_min": self.ns_min,
+            "ns_median": self.ns_median,
+        }
+
+
+def measure(
+    func: Callable[[], Any], repeat: int = 5, min_time: float = 0.2
+) -> Result:
+    """
+    Time ``func``, choosing a loop count so that each of the ``repeat`` runs
+    takes at least ``min_time`` seconds, and return the per-call times in
+    nanoseconds
+    """
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    while True:
+        t = timer.timeit(number)
+        if t >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(t, 1e-9)))
+    times = [t] + timer.repeat(repeat=repeat - 1, number=number)
+    per_call = [x / number * 1e9 for x in times]
+    return Result(
+        number=number,
+        repeat=repeat,
+        ns_min=min(per_call),
+        ns_median=statistics.median(per_call),
+    )
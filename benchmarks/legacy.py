@@ -0,0 +1,161 @@
+"""
+The ``contextlib.contextmanager``-based implementations from morecontext 0.6,
+kept as a reference point for ``compare_legacy.py``
+"""
+
+from __future__ import annotations
+from collections.abc import Iterator, MutableMapping, MutableSequence
+from contextlib import contextmanager, suppress
+import copy as copymod
+import os
+from typing import Any, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+@contextmanager
+def dirchanged(
+    dirpath: str | bytes | os.PathLike[str] | os.PathLike[bytes],
+) -> Iterator[None]:
+    with dirrollback():
+        os.chdir(dirpath)
+        yield
+
+
+@contextmanager
+def dirrollback() -> Iterator[None]:
+    olddir = os.getcwd()
+    try:
+        yield
+    finally:
+        os.chdir(olddir)
+
+
+@contextmanager
+def attrset(obj: Any, name: str, value: Any) -> Iterator[None]:
+    with attrrollback(obj, name):
+        setattr(obj, name, value)
+        yield
+
+
+@contextmanager
+def attrdel(obj: Any, name: str) -> Iterator[None]:
+    with attrrollback(obj, name):
+        with suppress(AttributeError):
+            delattr(obj, name)
+        yield
+
+
+@contextmanager
+def attrrollback(
+    obj: Any,
+    name: str,
+    copy: bool = False,
+    deepcopy: bool = False,
+) -> Iterator[None]:
+    try:
+        oldvalue = getattr(obj, name)
+    except AttributeError:
+        oldset = False
+    else:
+        oldset = True
+        if deepcopy:
+            oldvalue = copymod.deepcopy(oldvalue)
+        elif copy:
+            oldvalue = copymod.copy(oldvalue)
+    try:
+        yield
+    finally:
+        if oldset:
+            setattr(obj, name, oldvalue)
+        else:
+            with suppress(AttributeError):
+                delattr(obj, name)
+
+
+@contextmanager
+def envset(name: str, value: str) -> Iterator[None]:
+    with envrollback(name):
+        os.environ[name] = value
+        yield
+
+
+@contextmanager
+def envdel(name: str) -> Iterator[None]:
+    with envrollback(name):
+        os.environ.pop(name, None)
+        yield
+
+
+@contextmanager
+def envrollback(name: str) -> Iterator[None]:
+    oldvalue = os.environ.get(name)
+    try:
+        yield
+    finally:
+        if oldvalue is not None:
+            os.environ[name] = oldvalue
+        else:
+            with suppress(KeyError):
+                del os.environ[name]
+
+
+@contextmanager
+def itemset(d: MutableMapping[K, V], key: K, value: V) -> Iterator[None]:
+    with itemrollback(d, key):
+        d[key] = value
+        yield
+
+
+@contextmanager
+def itemdel(d: MutableMapping[K, Any], key: K) -> Iterator[None]:
+    with itemrollback(d, key):
+        d.pop(key, None)
+        yield
+
+
+@contextmanager
+def itemrollback(
+    d: MutableMapping[K, Any],
+    key: K,
+    copy: bool = False,
+    deepcopy: bool = False,
+) -> Iterator[None]:
+    try:
+        oldvalue = d[key]
+    except KeyError:
+        oldset = False
+    else:
+        oldset = True
+        if deepcopy:
+            oldvalue = copymod.deepcopy(oldvalue)
+        elif copy:
+            oldvalue = copymod.copy(oldvalue)
+    try:
+        yield
+    finally:
+        if oldset:
+            d[key] = oldvalue
+        else:
+            with suppress(KeyError):
+                del d[key]
+
+
+@contextmanager
+def additem(lst: MutableSequence[K], value: K, prepend: bool = False) -> Iterator[None]:
+    if prepend:
+        lst.insert(0, value)
+    else:
+        lst.append(value)
+    try:
+        yield
+    finally:
+        if prepend:
+            with suppress(ValueError):
+                lst.remove(value)
+        else:
+            for i in range(len(lst) - 1, -1, -1):
+                if lst[i] == value:
+                    del lst[i]
+                    break
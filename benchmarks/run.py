@@ -0,0 +1,129 @@
+"""
+Run the morecontext benchmark suite.
+
+Run from the repository root with::
+
+    python benchmarks/run.py [-k PATTERN] [-o results.json] [--compare old.json]
+
+Each benchmark reports the time in nanoseconds per ``with`` block (or per
+operation, for benchmarks that time something else).  Results can be saved as
+JSON with ``--output`` and compared against a previous run with ``--compare``,
+in which case the exit status is nonzero if any benchmark got slower by more
+than ``--threshold``.
+"""
+
+from __future__ import annotations
+import argparse
+from contextlib import ExitStack
+from datetime import datetime, timezone
+import fnmatch
+import importlib
+import json
+from pathlib import Path
+import platform
+import sys
+import tempfile
+from typing import Any
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "src"))
+sys.path.insert(0, str(HERE))
+
+from harness import BENCHMARKS, Fixture, measure  # noqa: E402
+import morecontext  # noqa: E402
+
+
+def load_benchmarks() -> None:
+    for path in sorted(HERE.glob("bench_*.py")):
+        importlib.import_module(path.stem)
+
+
+#: Names in ``morecontext.__all__`` that are plain data types with nothing
+#: worth timing on their own
+UNTIMED = {"InstrumentEvent", "TraceRecord"}
+
+
+def uncovered() -> list[str]:
+    """Return the names in ``morecontext.__all__`` that have no benchmarks"""
+    covered = {name.partition(".")[0] for name in BENCHMARKS} | UNTIMED
+    return [name for name in morecontext.__all__ if name not in covered]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "-k",
+        "--select",
+        metavar="PATTERN",
+        action="append",
+        help="Only run benchmarks whose names match this glob pattern",
+    )
+    parser.add_argument("-l", "--list", action="store_true", help="List benchmarks")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Minimum duration in seconds of each timing run [default: 0.2]",
+    )
+    parser.add_argument("-o", "--output", type=Path, help="Save results as JSON")
+    parser.add_argument(
+        "--compare", type=Path, help="Compare against results saved as JSON"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.10,
+        help="Slowdown ratio above which --compare reports a regression"
+        " [default: 1.10]",
+    )
+    args = parser.parse_args()
+    load_benchmarks()
+    for name in uncovered():
+        print(f"Warning: no benchmarks for morecontext.{name}", file=sys.stderr)
+    names = [
+        name
+        for name in BENCHMARKS
+        if not args.select or any(fnmatch.fnmatchcase(name, p) for p in args.select)
+    ]
+    if args.list:
+        for name in names:
+            print(name)
+        return 0
+    baseline: dict[str, Any] = {}
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text())["results"]
+    results: dict[str, Any] = {}
+    regressions = []
+    width = max(map(len, names), default=0)
+    for name in names:
+        with tempfile.TemporaryDirectory() as tmpdir, ExitStack() as stack:
+            func = BENCHMARKS[name](Fixture(tmpdir=tmpdir, stack=stack))
+            res = measure(func, repeat=args.repeat, min_time=args.min_time)
+        results[name] = res.as_dict()
+        line = f"{name:<{width}}  {res.ns_min:>12.1f} ns  (median {res.ns_median:.1f})"
+        if name in baseline:
+            ratio = res.ns_min / baseline[name]["ns_min"]
+            line += f"  {ratio:.2f}x"
+            if ratio > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line, flush=True)
+    if args.output is not None:
+        report = {
+            "morecontext_version": morecontext.__version__,
+            "python_version": platform.python_version(),
+            "python_implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "results": results,
+        }
+        args.output.write_text(json.dumps(report, indent=4) + "\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,12 +13,43 @@ Visit <https://github.com/jwodder/morecontext> for more information.
 """
 
 from __future__ import annotations
-from collections.abc import Iterator, MutableMapping, MutableSequence
-from contextlib import contextmanager, suppress
+import asyncio
+from collections import Counter, OrderedDict, deque
+from collections.abc import (
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    MutableSequence,
+)
+from contextlib import suppress
+from contextvars import ContextVar, Token
 import copy as copymod
+from functools import wraps
+import inspect
+from itertools import compress, count
+import json
+from operator import is_, is_not
 import os
-from types import TracebackType
-from typing import Any, TypeVar
+import reprlib
+import sys
+import threading
+import time
+import traceback
+from types import MappingProxyType, TracebackType
+from typing import (
+    IO,
+    Any,
+    ClassVar,
+    Generic,
+    NamedTuple,
+    SupportsIndex,
+    TypeVar,
+    cast,
+    overload,
+)
 
 __version__ = "0.7.0.dev1"
 __author__ = "John Thorvald Wodder II"
@@ -27,346 +58,4023 @@ __license__ = "MIT"
 __url__ = "https://github.com/jwodder/morecontext"
 
 __all__ = [
+    "AsyncOpenClosable",
+    "ChildEnv",
+    "DirFDCache",
+    "InstrumentEvent",
+    "InstrumentHistogram",
+    "LazyOpenClosable",
+    "LingeringOpenClosable",
+    "MutationTrace",
     "OpenClosable",
+    "OpenClosablePool",
+    "Patcher",
+    "ThreadSafeOpenClosable",
+    "TraceRecord",
+    "additems",
     "attrdel",
     "attrrollback",
     "attrset",
+    "attrsupdate",
     "dirchanged",
     "dirrollback",
     "envdel",
+    "environ_for_subprocess",
+    "environrollback",
     "envrollback",
     "envset",
+    "generation",
+    "getenv",
+    "instrumented",
     "itemdel",
     "itemrollback",
     "itemset",
+    "itemsupdate",
+    "localattrset",
+    "localenvset",
+    "subscribe",
+    "syspathadd",
+    "unwatch",
+    "vdirchanged",
+    "vgetcwd",
+    "vlistdir",
+    "vopen",
+    "vresolve",
+    "vstat",
 ]
 
 K = TypeVar("K")
 V = TypeVar("V")
+F = TypeVar("F", bound=Callable[..., Any])
 OC = TypeVar("OC", bound="OpenClosable")
+AOC = TypeVar("AOC", bound="AsyncOpenClosable")
+TOC = TypeVar("TOC", bound="ThreadSafeOpenClosable")
+LOC = TypeVar("LOC", bound="LingeringOpenClosable")
+ZOC = TypeVar("ZOC", bound="LazyOpenClosable")
 
+#: Sentinel for "this attribute/item was unset on entry"
+_UNSET: Any = object()
 
-@contextmanager
-def dirchanged(
-    dirpath: str | bytes | os.PathLike[str] | os.PathLike[bytes],
-) -> Iterator[None]:
+#: An immutable empty mapping, used as the default for context variables that
+#: hold mappings
+_EMPTY: Mapping[Any, Any] = MappingProxyType({})
+
+#: The currently open `MutationTrace` instances
+_tracers: list[MutationTrace] = []
+
+#: The targets whose changes are being counted by `generation()` and/or
+#: reported to `subscribe()` callbacks, keyed by ID
+_watched: dict[int, _Watch] = {}
+
+
+class _AsyncPatch:
+    """
+    A link in a chain of context managers that have patched the same target
+    via ``async with``, ordered by when they were entered
+    """
+
+    __slots__ = ("cm", "key", "below", "above")
+
+    def __init__(
+        self, cm: _ContextManager, key: Hashable, below: _AsyncPatch | None
+    ) -> None:
+        self.cm = cm
+        self.key = key
+        self.below = below
+        self.above: _AsyncPatch | None = None
+
+
+#: Maps each target (an attribute, mapping entry, environment variable, or the
+#: current working directory) currently patched via ``async with`` to the most
+#: recent `_AsyncPatch` for it
+_async_patches: dict[Hashable, _AsyncPatch] = {}
+
+#: Maps the IDs of context managers currently entered via ``async with`` to
+#: their `_AsyncPatch` links
+_async_links: dict[int, list[_AsyncPatch]] = {}
+
+
+class _ContextManager:
+    """
+    Base class for the context managers in this module.  Subclasses define
+    ``__enter__`` and ``__exit__`` directly, and instances can also be used as
+    function decorators (like those created with `contextlib.contextmanager`),
+    in which case a fresh copy of the instance is entered for each call.
+
+    Instances can also be used with ``async with``.  In that case, the targets
+    that an instance patches (as reported by `_guard_keys()`) are tracked so
+    that, if concurrent tasks patch the same target and exit out of order, an
+    instance that exits while a later patch of the same target is still active
+    does not restore the target itself but instead hands its saved state to
+    the later patch (via `_handoff()`), which then restores it.
+
+    Instances are not reentrant: entering an instance that is already entered
+    raises a `RuntimeError`.  Subclasses must set ``_entered`` to `False` in
+    ``__init__``, check & set it in ``__enter__``, and clear it in
+    ``__exit__``.
+    """
+
+    __slots__ = ("_entered",)
+
+    _entered: bool
+
+    def __call__(self, func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def ainner(*args: Any, **kwargs: Any) -> Any:
+                async with copymod.copy(self):
+                    return await func(*args, **kwargs)
+
+            return cast(F, ainner)
+
+        else:
+
+            @wraps(func)
+            def inner(*args: Any, **kwargs: Any) -> Any:
+                with copymod.copy(self):
+                    return func(*args, **kwargs)
+
+            return cast(F, inner)
+
+    def __enter__(self) -> None:
+        raise NotImplementedError
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        raise NotImplementedError
+
+    async def __aenter__(self) -> None:
+        self.__enter__()
+        links = []
+        for key in self._guard_keys():
+            below = _async_patches.get(key)
+            link = _AsyncPatch(self, key, below)
+            if below is not None:
+                below.above = link
+            _async_patches[key] = link
+            links.append(link)
+        if links:
+            _async_links[id(self)] = links
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        links = _async_links.pop(id(self), [])
+        restore = []
+        for link in links:
+            below, above = link.below, link.above
+            if below is not None:
+                below.above = above
+            if above is None:
+                restore.append(link.key)
+                if below is not None:
+                    _async_patches[link.key] = below
+                else:
+                    del _async_patches[link.key]
+            else:
+                self._handoff(link.key, above.cm)
+                above.below = below
+        if len(restore) == len(links):
+            self.__exit__(exc_type, exc_val, exc_tb)
+        else:
+            # Handing off still discharges this instance's restore, so record
+            # it as one
+            if _tracers and self._traced:
+                _trace(self, "restore")
+            if restore:
+                self._restore_keys(restore)
+
+    #: Whether sets & restores by instances of this class are recorded by
+    #: `MutationTrace`
+    _traced: ClassVar[bool] = False
+
+    def _trace_values(self, restoring: bool) -> tuple[Any, Any, Any, Any]:
+        """
+        Return the target, key, old value, and new value for a set (if
+        ``restoring`` is false; called after setting) or a restore (if
+        ``restoring`` is true; called before restoring), for use by
+        `MutationTrace`
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        """
+        Return keys identifying the targets patched by this instance for the
+        purposes of ``async with`` tracking.  Only called after entry.
+        """
+        return ()
+
+    def _handoff(self, key: Hashable, later: Any) -> None:
+        """
+        Transfer this instance's saved state for the target identified by
+        ``key`` to ``later``, a context manager of the same family that patched
+        the same target after this one did, and perform any cleanup that
+        ``__exit__`` would do other than restoring the target
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def _adopt(self, key: Hashable, oldvalue: Any) -> None:
+        """
+        Make ``oldvalue`` the value to which the target identified by ``key``
+        will be restored.  Called by the `_handoff()` methods of attribute and
+        mapping entry context managers, which can hand off to each other.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+    def _restore_keys(self, keys: list[Hashable]) -> None:
+        """
+        Restore only the targets identified by ``keys``.  Only needs to be
+        implemented by context managers that patch more than one target.
+        """
+        raise NotImplementedError  # pragma: no cover
+
+
+#: Flags for opening a directory solely so that we can `os.fchdir()` back to
+#: it later
+_DIRFD_FLAGS = getattr(os, "O_PATH", os.O_RDONLY) | getattr(os, "O_DIRECTORY", 0)
+
+
+def _savecwd(usefd: bool) -> str | int:
+    """
+    Return a reference to the current working directory: either a file
+    descriptor (if ``usefd`` is true and `os.fchdir()` is supported) or the
+    directory's path
+    """
+    if usefd and os.chdir in os.supports_fd:
+        with suppress(OSError):
+            return os.open(".", _DIRFD_FLAGS)
+    return os.getcwd()
+
+
+def _restorecwd(olddir: str | int) -> None:
+    if isinstance(olddir, int):
+        try:
+            os.fchdir(olddir)
+        finally:
+            os.close(olddir)
+    else:
+        os.chdir(olddir)
+
+
+def _reentry_error(cm: _ContextManager) -> RuntimeError:
+    return RuntimeError(
+        f"{type(cm).__name__} instance is already entered and cannot be"
+        " entered again until it exits"
+    )
+
+
+class _DirRollback(_ContextManager):
+    __slots__ = ("_usefd", "_olddir")
+
+    _olddir: str | int
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        return (("cwd",),)
+
+    def _handoff(self, _key: Hashable, later: _DirRollback) -> None:
+        if isinstance(later._olddir, int):
+            os.close(later._olddir)
+        later._olddir = self._olddir
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        if _tracers and self._traced:
+            _trace(self, "restore")
+        _restorecwd(self._olddir)
+
+    def _trace_values(self, restoring: bool) -> tuple[Any, Any, Any, Any]:
+        olddir = self._olddir
+        saved = f"<fd {olddir}>" if isinstance(olddir, int) else olddir
+        if restoring:
+            return ("cwd", None, os.getcwd(), saved)
+        else:
+            return ("cwd", None, saved, os.getcwd())
+
+
+class dirchanged(_DirRollback):
     """
+    .. versionchanged:: 0.7.0
+        ``usefd`` and ``fdcache`` arguments added
+
     Temporarily change the current working directory.
 
     ``dirchanged(dirpath)`` returns a context manager.  On entry, it stores the
     current working directory path and then changes the current directory to
     ``dirpath``.  On exit, it changes the current directory back to the stored
     path.
+
+    If ``usefd`` is true, the current working directory is stored as an open
+    file descriptor rather than as a path, and it is changed back to with
+    `os.fchdir()`.  This avoids resolving a path on exit and works even if the
+    original directory is renamed in the meantime.  On platforms without
+    `os.fchdir()` (or if the current directory cannot be opened), ``usefd``
+    has no effect.
+
+    If ``fdcache`` is a `DirFDCache` and ``dirpath`` is an absolute path, the
+    directory is changed to by calling `os.fchdir()` on a file descriptor for
+    ``dirpath`` obtained from the cache, so that repeatedly changing into the
+    same directories skips path lookups.
     """
-    with dirrollback():
-        os.chdir(dirpath)
-        yield
 
+    __slots__ = ("_dirpath", "_fdcache")
+
+    _traced = True
 
-@contextmanager
-def dirrollback() -> Iterator[None]:
+    def __init__(
+        self,
+        dirpath: str | bytes | os.PathLike[str] | os.PathLike[bytes],
+        usefd: bool = False,
+        fdcache: DirFDCache | None = None,
+    ) -> None:
+        self._dirpath = dirpath
+        self._usefd = usefd
+        self._fdcache = fdcache
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        olddir = self._olddir = _savecwd(self._usefd)
+        try:
+            if self._fdcache is not None and os.path.isabs(self._dirpath):
+                os.fchdir(self._fdcache.get(self._dirpath))
+            else:
+                os.chdir(self._dirpath)
+        except BaseException:
+            if isinstance(olddir, int):
+                os.close(olddir)
+            raise
+        if _tracers:
+            _trace(self, "set")
+        self._entered = True
+
+
+class dirrollback(_DirRollback):
     """
     .. versionadded:: 0.2.0
 
+    .. versionchanged:: 0.7.0
+        ``usefd`` argument added
+
     Save & restore the current working directory.
 
     ``dirrollback()`` returns a context manager that stores the current working
     directory on entry and changes back to that directory on exit.
+
+    If ``usefd`` is true, the current working directory is stored as an open
+    file descriptor rather than as a path, and it is changed back to with
+    `os.fchdir()`.  This avoids resolving a path on exit and works even if the
+    original directory is renamed in the meantime.  On platforms without
+    `os.fchdir()` (or if the current directory cannot be opened), ``usefd``
+    has no effect.
     """
-    olddir = os.getcwd()
-    try:
-        yield
-    finally:
-        os.chdir(olddir)
 
+    __slots__ = ()
 
-@contextmanager
-def attrset(obj: Any, name: str, value: Any) -> Iterator[None]:
-    """
-    Temporarily change the value of an object's attribute.
+    def __init__(self, usefd: bool = False) -> None:
+        self._usefd = usefd
+        self._entered = False
 
-    ``attrset(obj, name, value)`` returns a context manager.  On entry, it
-    stores the current value of the attribute of ``obj`` with name ``name``,
-    and then it sets that attribute to ``value``.  On exit, it sets the
-    attribute back to the stored value.
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._olddir = _savecwd(self._usefd)
+        self._entered = True
 
-    If the given attribute is unset on entry, the context manager will unset it
-    on exit.
-    """
-    with attrrollback(obj, name):
-        setattr(obj, name, value)
-        yield
 
+class _VirtualDir:
+    __slots__ = ("fd", "path")
 
-@contextmanager
-def attrdel(obj: Any, name: str) -> Iterator[None]:
-    """
-    Temporarily unset an object's attribute.
+    def __init__(self, fd: int, path: str) -> None:
+        self.fd = fd
+        self.path = path
 
-    ``attrdel(obj, name)`` returns a context manager.  On entry, it stores the
-    current value of the attribute of ``obj`` with name ``name``, and then it
-    unsets that attribute.  On exit, it sets the attribute back to the stored
-    value.
 
-    If the given attribute is unset on entry, the context manager will unset it
-    on exit.
+#: The current virtual working directory, or `None` to use the process's
+#: actual working directory
+_vcwd: ContextVar[_VirtualDir | None] = ContextVar("_vcwd", default=None)
+
+_VDIR_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)
+
+
+def _vdirfd() -> int | None:
+    vdir = _vcwd.get()
+    return vdir.fd if vdir is not None else None
+
+
+class vdirchanged(_ContextManager):
     """
-    with attrrollback(obj, name):
-        with suppress(AttributeError):
-            delattr(obj, name)
-        yield
+    .. versionadded:: 0.7.0
+
+    Temporarily change the *virtual* working directory.
+
+    ``vdirchanged(dirpath)`` returns a context manager that, on entry, opens
+    the directory ``dirpath`` (resolved relative to the current virtual working
+    directory) and makes it the virtual working directory for the current
+    thread or `asyncio` task by storing it in a `contextvars.ContextVar`.  On
+    exit, the previous virtual working directory is reinstated and the
+    directory is closed.  The process's actual working directory is never
+    changed, so different threads & tasks can each have their own virtual
+    working directory at the same time without any locking.
+
+    Relative paths are only resolved against the virtual working directory by
+    the `vopen()`, `vstat()`, `vlistdir()`, `vresolve()`, and `vgetcwd()`
+    functions; all other code continues to use the actual working directory.
+    Outside of any `vdirchanged()` block, the virtual working directory is the
+    actual working directory.
+
+    Tasks & threads that copy the current context (such as tasks created
+    inside the ``with`` block) share its virtual working directory, so they
+    must not outlive the block.
+
+    This function requires support for the ``dir_fd`` argument to `os`
+    functions, which is not available on Windows.
+    """
+
+    __slots__ = ("_dirpath", "_vdir", "_token")
+
+    _vdir: _VirtualDir
+    _token: Token[_VirtualDir | None]
 
+    def __init__(
+        self,
+        dirpath: str | bytes | os.PathLike[str] | os.PathLike[bytes],
+    ) -> None:
+        self._dirpath = dirpath
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        parent = _vcwd.get()
+        if parent is None:
+            path = os.path.abspath(self._dirpath)
+            fd = os.open(self._dirpath, _VDIR_FLAGS)
+        else:
+            path = os.path.join(parent.path, os.fsdecode(self._dirpath))
+            fd = os.open(self._dirpath, _VDIR_FLAGS, dir_fd=parent.fd)
+        self._vdir = _VirtualDir(fd, os.path.normpath(os.fsdecode(path)))
+        self._token = _vcwd.set(self._vdir)
+        self._entered = True
 
-@contextmanager
-def attrrollback(
-    obj: Any,
-    name: str,
-    copy: bool = False,
-    deepcopy: bool = False,
-) -> Iterator[None]:
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        try:
+            _vcwd.reset(self._token)
+        finally:
+            os.close(self._vdir.fd)
+
+
+def vopen(
+    file: str | bytes | os.PathLike[str] | os.PathLike[bytes],
+    mode: str = "r",
+    buffering: int = -1,
+    encoding: str | None = None,
+    errors: str | None = None,
+    newline: str | None = None,
+) -> IO[Any]:
     """
-    .. versionadded:: 0.2.0
+    .. versionadded:: 0.7.0
 
-    .. versionchanged:: 0.3.0
-        ``copy`` and ``deepcopy`` arguments added
+    Like the built-in `open()`, but relative paths are resolved against the
+    virtual working directory set by `vdirchanged()`
+    """
+    dir_fd = _vdirfd()
+
+    def opener(path: str, flags: int) -> int:
+        return os.open(path, flags, 0o666, dir_fd=dir_fd)
+
+    return open(
+        file,
+        mode,
+        buffering=buffering,
+        encoding=encoding,
+        errors=errors,
+        newline=newline,
+        opener=opener,
+    )
+
+
+def vstat(
+    path: str | bytes | os.PathLike[str] | os.PathLike[bytes],
+    follow_symlinks: bool = True,
+) -> os.stat_result:
+    """
+    .. versionadded:: 0.7.0
 
-    Save & restore the value of an object's attribute.
+    Like `os.stat()`, but relative paths are resolved against the virtual
+    working directory set by `vdirchanged()`
+    """
+    return os.stat(path, dir_fd=_vdirfd(), follow_symlinks=follow_symlinks)
 
-    ``attrrollback(obj, name)`` returns a context manager that stores the value
-    of the attribute of ``obj`` with name ``name`` on entry and sets the
-    attribute back to that value on exit.  If the given attribute is unset on
-    entry, the context manager will unset it on exit.
 
-    If ``copy`` is true, a shallow copy of the attribute will be saved &
-    restored.  If ``deepcopy`` is true, a deep copy of the attribute will be
-    saved & restored.  If both options are true, ``deepcopy`` takes precedence.
+def vlistdir(
+    path: str | os.PathLike[str] = ".",
+) -> list[str]:
     """
+    .. versionadded:: 0.7.0
+
+    Like `os.listdir()`, but relative paths (including the default of
+    ``"."``) are resolved against the virtual working directory set by
+    `vdirchanged()`
+    """
+    dir_fd = _vdirfd()
+    if dir_fd is None:
+        return os.listdir(path)
+    fd = os.open(path, _VDIR_FLAGS, dir_fd=dir_fd)
     try:
-        oldvalue = getattr(obj, name)
-    except AttributeError:
-        oldset = False
-    else:
-        oldset = True
-        if deepcopy:
-            oldvalue = copymod.deepcopy(oldvalue)
-        elif copy:
-            oldvalue = copymod.copy(oldvalue)
-    try:
-        yield
+        return os.listdir(fd)
     finally:
-        if oldset:
-            setattr(obj, name, oldvalue)
-        else:
-            with suppress(AttributeError):
-                delattr(obj, name)
+        os.close(fd)
 
 
-@contextmanager
-def envset(name: str, value: str) -> Iterator[None]:
+def vresolve(path: str | os.PathLike[str]) -> str:
     """
-    Temporarily set an environment variable.
-
-    ``envset(name, value)`` returns a context manager.  On entry, it stores the
-    current value of the environment variable ``name``, and then it sets that
-    environment variable to ``value``.  On exit, it sets the environment
-    variable back to the stored value.
+    .. versionadded:: 0.7.0
 
-    If the given environment variable is unset on entry, the context manager
-    will unset it on exit.
+    Return an absolute, normalized version of ``path``, treating relative paths
+    as relative to the virtual working directory set by `vdirchanged()`.  As
+    with `os.path.abspath()`, symbolic links are not resolved.
     """
-    with envrollback(name):
-        os.environ[name] = value
-        yield
+    return os.path.normpath(os.path.join(vgetcwd(), path))
 
 
-@contextmanager
-def envdel(name: str) -> Iterator[None]:
+def vgetcwd() -> str:
     """
-    Temporarily unset an environment variable.
-
-    ``envdel(name)`` returns a context manager.  On entry, it stores the
-    current value of the environment variable ``name``, and then it unsets that
-    environment variable.  On exit, it sets the environment variable back to
-    the stored value.
+    .. versionadded:: 0.7.0
 
-    If the given environment variable is unset on entry, the context manager
-    will unset it on exit.
+    Return the path to the virtual working directory set by `vdirchanged()`,
+    or the actual working directory if not inside a `vdirchanged()` block.
+    The path is computed when the directory is entered and is not updated if
+    the directory is later renamed.
     """
-    with envrollback(name):
-        os.environ.pop(name, None)
-        yield
+    vdir = _vcwd.get()
+    return vdir.path if vdir is not None else os.getcwd()
 
 
-@contextmanager
-def envrollback(name: str) -> Iterator[None]:
-    """
-    .. versionadded:: 0.2.0
+def _cow_data(value: Any) -> Any:
+    if isinstance(value, (_CowDict, _CowList)):
+        return value._data
+    return value
 
-    Save & restore the value of an environment variable.
 
-    ``envrollback(name)`` returns a context manager that stores the value of
-    the environment variable ``name`` on entry and sets the environment
-    variable back to that value on exit.  If the given environment variable is
-    unset on entry, the context manager will unset it on exit.
+class _CowDict(MutableMapping[K, V]):
+    """
+    A copy-on-write view of a `dict`.  Reads go to the original `dict` until
+    the first mutation, at which point the original is shallow-copied and all
+    further operations use the copy.  The original is never modified.
     """
-    oldvalue = os.environ.get(name)
-    try:
-        yield
-    finally:
-        if oldvalue is not None:
-            os.environ[name] = oldvalue
-        else:
-            with suppress(KeyError):
-                del os.environ[name]
 
+    __slots__ = ("_data", "_copied")
 
-@contextmanager
-def itemset(d: MutableMapping[K, V], key: K, value: V) -> Iterator[None]:
-    """
-    Temporarily change the value of a mapping's entry.
+    def __init__(self, data: dict[K, V]) -> None:
+        self._data = data
+        self._copied = False
 
-    ``itemset(d, key, value)`` returns a context manager.  On entry, it stores
-    the current value of ``d[key]``, and then it sets that field to ``value``.
-    On exit, it sets the field back to the stored value.
+    def _writable(self) -> dict[K, V]:
+        if not self._copied:
+            self._data = self._data.copy()
+            self._copied = True
+        return self._data
 
-    If the given field is unset on entry, the context manager will unset it
-    on exit.
-    """
-    with itemrollback(d, key):
-        d[key] = value
-        yield
+    def __getitem__(self, key: K) -> V:
+        return self._data[key]
 
+    def __setitem__(self, key: K, value: V) -> None:
+        self._writable()[key] = value
 
-@contextmanager
-def itemdel(d: MutableMapping[K, Any], key: K) -> Iterator[None]:
-    """
-    Temporarily unset a mapping's entry.
+    def __delitem__(self, key: K) -> None:
+        del self._writable()[key]
 
-    ``itemdel(d, key)`` returns a context manager.  On entry, it stores the
-    current value of ``d[key]``, and then it unsets that field.  On exit, it
-    sets the field back to the stored value.
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._data)
 
-    If the given field is unset on entry, the context manager will unset it
-    on exit.
-    """
-    with itemrollback(d, key):
-        d.pop(key, None)
-        yield
+    def __len__(self) -> int:
+        return len(self._data)
 
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
 
-@contextmanager
-def itemrollback(
-    d: MutableMapping[K, Any],
-    key: K,
-    copy: bool = False,
-    deepcopy: bool = False,
-) -> Iterator[None]:
-    """
-    .. versionadded:: 0.2.0
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _CowDict):
+            other = other._data
+        return self._data == other
 
-    .. versionchanged:: 0.3.0
-        ``copy`` and ``deepcopy`` arguments added
+    def __ne__(self, other: object) -> bool:
+        return not (self == other)
 
-    Save & restore the value of a mapping's entry.
+    __hash__ = None  # type: ignore[assignment]
 
-    ``itemrollback(d, key)`` returns a context manager that stores the value
-    of ``d[key]`` on entry and sets the field back to that value on exit.  If
-    the given field is unset on entry, the context manager will unset it on
-    exit.
+    def __or__(self, other: Any) -> Any:
+        return self._data.__or__(_cow_data(other))
 
-    If ``copy`` is true, a shallow copy of the field will be saved & restored.
-    If ``deepcopy`` is true, a deep copy of the field will be saved & restored.
-    If both options are true, ``deepcopy`` takes precedence.
-    """
-    try:
-        oldvalue = d[key]
-    except KeyError:
-        oldset = False
-    else:
-        oldset = True
-        if deepcopy:
-            oldvalue = copymod.deepcopy(oldvalue)
-        elif copy:
-            oldvalue = copymod.copy(oldvalue)
-    try:
-        yield
-    finally:
-        if oldset:
-            d[key] = oldvalue
-        else:
-            with suppress(KeyError):
-                del d[key]
+    def __ror__(self, other: Any) -> Any:
+        return self._data.__ror__(_cow_data(other))
 
+    def __ior__(self, other: Any) -> _CowDict[K, V]:
+        self._writable().__ior__(_cow_data(other))
+        return self
 
-@contextmanager
-def additem(lst: MutableSequence[K], value: K, prepend: bool = False) -> Iterator[None]:
-    """
-    .. versionadded:: 0.4.0
+    def __repr__(self) -> str:
+        return repr(self._data)
 
-    Temporarily add a value to a sequence.
+    def get(self, key: K, default: Any = None) -> Any:
+        return self._data.get(key, default)
 
-    ``additem(lst, value)`` returns a context manager that appends ``value`` to
-    the sequence ``lst`` on entry and removes the last item (if any) in ``lst``
-    that equals ``value`` on exit.
+    def clear(self) -> None:
+        self._data = {}
+        self._copied = True
 
-    If ``prepend`` is true, ``value`` is instead prepended to ``lst`` on entry,
-    and the first item in ``lst`` that equals ``value`` is removed on exit.
-    """
-    if prepend:
-        lst.insert(0, value)
-    else:
-        lst.append(value)
-    try:
-        yield
-    finally:
-        if prepend:
-            with suppress(ValueError):
-                lst.remove(value)
-        else:
-            for i in range(len(lst) - 1, -1, -1):
-                if lst[i] == value:
-                    del lst[i]
-                    break
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._writable().update(*args, **kwargs)
 
+    def copy(self) -> dict[K, V]:
+        return self._data.copy()
 
-class OpenClosable:
+
+class _CowList(MutableSequence[K]):
+    """
+    A copy-on-write view of a `list`.  Reads go to the original `list` until
+    the first mutation, at which point the original is shallow-copied and all
+    further operations use the copy.  The original is never modified.
     """
-    A base class for creating simple reentrant_ context managers.
-    `OpenClosable` defines ``__enter__`` and ``__exit__`` methods that keep
-    track of the number of nested ``with`` statements in effect and call the
-    instance's ``open()`` and ``close()`` methods when entering & exiting the
-    outermost ``with``.
 
-    Subclasses should override ``open()`` and/or ``close()`` with the desired
-    code to run on entering & exiting the outermost ``with``; the default
-    ``open()`` and ``close()`` methods defined by `OpenClosable` do nothing.
+    __slots__ = ("_data", "_copied")
 
-    .. _reentrant: https://docs.python.org/3/library/contextlib.html
-                   #reentrant-cms
-    """
+    def __init__(self, data: list[K]) -> None:
+        self._data = data
+        self._copied = False
 
-    __depth: int
+    def _writable(self) -> list[K]:
+        if not self._copied:
+            self._data = self._data.copy()
+            self._copied = True
+        return self._data
 
-    def __enter__(self: OC) -> OC:
-        try:
-            self.__depth += 1
-        except AttributeError:
-            self.__depth = 1
-        if self.__depth == 1:
-            self.open()
+    @overload
+    def __getitem__(self, index: int) -> K: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[K]: ...
+
+    def __getitem__(self, index: int | slice) -> K | list[K]:
+        return self._data[index]
+
+    @overload
+    def __setitem__(self, index: int, value: K) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[K]) -> None: ...
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        self._writable()[index] = value
+
+    def __delitem__(self, index: int | slice) -> None:
+        del self._writable()[index]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._data)
+
+    def __reversed__(self) -> Iterator[K]:
+        return reversed(self._data)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._data
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _CowList):
+            other = other._data
+        return self._data == other
+
+    def __ne__(self, other: object) -> bool:
+        return not (self == other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __lt__(self, other: Any) -> Any:
+        return self._data.__lt__(_cow_data(other))
+
+    def __le__(self, other: Any) -> Any:
+        return self._data.__le__(_cow_data(other))
+
+    def __gt__(self, other: Any) -> Any:
+        return self._data.__gt__(_cow_data(other))
+
+    def __ge__(self, other: Any) -> Any:
+        return self._data.__ge__(_cow_data(other))
+
+    def __add__(self, other: Any) -> Any:
+        return self._data.__add__(_cow_data(other))
+
+    def __radd__(self, other: Any) -> Any:
+        if isinstance(other, list):
+            return other + self._data
+        return NotImplemented
+
+    def __mul__(self, n: SupportsIndex) -> list[K]:
+        return self._data * n
+
+    def __rmul__(self, n: SupportsIndex) -> list[K]:
+        return n * self._data
+
+    def __imul__(self, n: SupportsIndex) -> _CowList[K]:
+        self._writable().__imul__(n)
         return self
 
-    def __exit__(
-        self,
-        _exc_type: type[BaseException] | None,
-        _exc_val: BaseException | None,
-        _exc_tb: TracebackType | None,
-    ) -> None:
-        self.__depth -= 1
-        if self.__depth == 0:
-            self.close()
+    def __repr__(self) -> str:
+        return repr(self._data)
 
-    def open(self) -> None:  # noqa: A003
-        ...
+    def insert(self, index: int, value: K) -> None:
+        self._writable().insert(index, value)
 
-    def close(self) -> None: ...
+    def append(self, value: K) -> None:
+        self._writable().append(value)
+
+    def extend(self, values: Iterable[K]) -> None:
+        self._writable().extend(values)
+
+    def clear(self) -> None:
+        self._data = []
+        self._copied = True
+
+    def index(self, value: Any, start: int = 0, stop: int = sys.maxsize) -> int:
+        return self._data.index(value, start, stop)
+
+    def count(self, value: Any) -> int:
+        return self._data.count(value)
+
+    def sort(
+        self, *, key: Callable[[K], Any] | None = None, reverse: bool = False
+    ) -> None:
+        self._writable().sort(key=key, reverse=reverse)  # type: ignore[arg-type]
+
+    def copy(self) -> list[K]:
+        return self._data.copy()
+
+
+class _Journal:
+    """
+    An undo log shared by the `_JournalDict` and `_JournalList` proxies
+    wrapping a value and all of the containers nested inside it.  Each entry
+    is a bound method of an underlying `dict` or `list` plus the arguments
+    that, when passed to it, undo a single mutation.
+    """
+
+    __slots__ = ("log", "proxies")
+
+    def __init__(self) -> None:
+        self.log: list[tuple[Callable[..., Any], tuple[Any, ...]]] = []
+        #: Maps ``id(container)`` to the proxy for that container, so that
+        #: repeated reads of the same nested container return the same proxy
+        self.proxies: dict[int, _JournalDict | _JournalList] = {}
+
+    def wrap(self, value: Any) -> Any:
+        if type(value) is dict:
+            cls: type[_JournalDict | _JournalList] = _JournalDict
+        elif type(value) is list:
+            cls = _JournalList
+        else:
+            return value
+        try:
+            return self.proxies[id(value)]
+        except KeyError:
+            proxy = self.proxies[id(value)] = cls(value, self)
+            return proxy
+
+    def rollback(self) -> None:
+        log = self.log
+        while log:
+            func, args = log.pop()
+            func(*args)
+        self.proxies.clear()
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, (_JournalDict, _JournalList)):
+        return value._data
+    return value
+
+
+class _JournalDict(MutableMapping[Any, Any]):
+    """
+    A proxy for a `dict` that passes all mutations through to the `dict` while
+    recording how to undo them in a `_Journal`.  `dict` and `list` values read
+    from the proxy are themselves wrapped in journaling proxies.
+    """
+
+    __slots__ = ("_data", "_journal")
+
+    def __init__(self, data: dict[Any, Any], journal: _Journal) -> None:
+        self._data = data
+        self._journal = journal
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._journal.wrap(self._data[key])
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        data = self._data
+        oldvalue = data.get(key, _UNSET)
+        data[key] = _unwrap(value)
+        if oldvalue is _UNSET:
+            self._journal.log.append((data.pop, (key, None)))
+        else:
+            self._journal.log.append((data.__setitem__, (key, oldvalue)))
+
+    def __delitem__(self, key: Any) -> None:
+        data = self._data
+        oldvalue = data[key]
+        del data[key]
+        self._journal.log.append((data.__setitem__, (key, oldvalue)))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __eq__(self, other: object) -> bool:
+        return bool(self._data == _unwrap(other))
+
+    def __ne__(self, other: object) -> bool:
+        return not (self == other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __or__(self, other: Any) -> Any:
+        return self._data.__or__(_unwrap(other))
+
+    def __ror__(self, other: Any) -> Any:
+        return self._data.__ror__(_unwrap(other))
+
+    def __ior__(self, other: Any) -> _JournalDict:
+        self.update(_unwrap(other))
+        return self
+
+    def __repr__(self) -> str:
+        return repr(self._data)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self._journal.wrap(self._data.get(key, default))
+
+    def clear(self) -> None:
+        data = self._data
+        oldvalue = data.copy()
+        data.clear()
+        self._journal.log.append((data.update, (oldvalue,)))
+
+    def copy(self) -> dict[Any, Any]:
+        return self._data.copy()
+
+
+class _JournalList(MutableSequence[Any]):
+    """
+    A proxy for a `list` that passes all mutations through to the `list` while
+    recording how to undo them in a `_Journal`.  `dict` and `list` values read
+    from the proxy are themselves wrapped in journaling proxies.
+    """
+
+    __slots__ = ("_data", "_journal")
+
+    def __init__(self, data: list[Any], journal: _Journal) -> None:
+        self._data = data
+        self._journal = journal
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Any]: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return list(map(self._journal.wrap, self._data[index]))
+        return self._journal.wrap(self._data[index])
+
+    @overload
+    def __setitem__(self, index: int, value: Any) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[Any]) -> None: ...
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        data = self._data
+        oldvalue = data[index]
+        if isinstance(index, slice):
+            value = list(map(_unwrap, value))
+            start, _, step = index.indices(len(data))
+            data[index] = value
+            if step == 1:
+                index = slice(start, start + len(value))
+        else:
+            data[index] = _unwrap(value)
+        self._journal.log.append((data.__setitem__, (index, oldvalue)))
+
+    def __delitem__(self, index: int | slice) -> None:
+        data = self._data
+        if isinstance(index, slice):
+            start, _, step = index.indices(len(data))
+            if step == 1:
+                oldvalue = data[index]
+                del data[index]
+                self._journal.log.append(
+                    (data.__setitem__, (slice(start, start), oldvalue))
+                )
+            else:
+                oldvalue = data[:]
+                del data[index]
+                self._journal.log.append(
+                    (data.__setitem__, (slice(None), oldvalue))
+                )
+        else:
+            oldvalue = data[index]
+            if index < 0:
+                index += len(data)
+            del data[index]
+            self._journal.log.append((data.insert, (index, oldvalue)))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Any]:
+        return map(self._journal.wrap, self._data)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return map(self._journal.wrap, reversed(self._data))
+
+    def __contains__(self, value: object) -> bool:
+        return _unwrap(value) in self._data
+
+    def __eq__(self, other: object) -> bool:
+        return bool(self._data == _unwrap(other))
+
+    def __ne__(self, other: object) -> bool:
+        return not (self == other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __lt__(self, other: Any) -> Any:
+        return self._data.__lt__(_unwrap(other))
+
+    def __le__(self, other: Any) -> Any:
+        return self._data.__le__(_unwrap(other))
+
+    def __gt__(self, other: Any) -> Any:
+        return self._data.__gt__(_unwrap(other))
+
+    def __ge__(self, other: Any) -> Any:
+        return self._data.__ge__(_unwrap(other))
+
+    def __add__(self, other: Any) -> Any:
+        return self._data.__add__(_unwrap(other))
+
+    def __radd__(self, other: Any) -> Any:
+        if isinstance(other, list):
+            return other + self._data
+        return NotImplemented
+
+    def __mul__(self, n: SupportsIndex) -> list[Any]:
+        return self._data * n
+
+    def __rmul__(self, n: SupportsIndex) -> list[Any]:
+        return n * self._data
+
+    def __imul__(self, n: SupportsIndex) -> _JournalList:
+        data = self._data
+        oldvalue = data[:]
+        data *= n
+        self._journal.log.append((data.__setitem__, (slice(None), oldvalue)))
+        return self
+
+    def __repr__(self) -> str:
+        return repr(self._data)
+
+    def insert(self, index: int, value: Any) -> None:
+        data = self._data
+        n = len(data)
+        if index < 0:
+            index = max(index + n, 0)
+        else:
+            index = min(index, n)
+        data.insert(index, _unwrap(value))
+        self._journal.log.append((data.__delitem__, (index,)))
+
+    def append(self, value: Any) -> None:
+        data = self._data
+        data.append(_unwrap(value))
+        self._journal.log.append((data.pop, ()))
+
+    def extend(self, values: Iterable[Any]) -> None:
+        data = self._data
+        n = len(data)
+        data.extend(list(map(_unwrap, values)))
+        self._journal.log.append((data.__delitem__, (slice(n, None),)))
+
+    def clear(self) -> None:
+        data = self._data
+        oldvalue = data[:]
+        data.clear()
+        self._journal.log.append((data.extend, (oldvalue,)))
+
+    def reverse(self) -> None:
+        self._data.reverse()
+        self._journal.log.append((self._data.reverse, ()))
+
+    def sort(
+        self, *, key: Callable[[Any], Any] | None = None, reverse: bool = False
+    ) -> None:
+        data = self._data
+        oldvalue = data[:]
+        data.sort(key=key, reverse=reverse)
+        self._journal.log.append((data.__setitem__, (slice(None), oldvalue)))
+
+    def index(self, value: Any, start: int = 0, stop: int = sys.maxsize) -> int:
+        return self._data.index(_unwrap(value), start, stop)
+
+    def count(self, value: Any) -> int:
+        return self._data.count(_unwrap(value))
+
+    def copy(self) -> list[Any]:
+        return self._data.copy()
+
+
+def _snapshot(
+    value: Any, copy: bool, deepcopy: bool, lazy: bool, journal: bool
+) -> tuple[Any, Any]:
+    """
+    Compute the value to save for a rollback on entry.  Returns a pair of the
+    saved value and either a proxy to install in place of ``value`` or
+    `_UNSET` if nothing should be installed.
+    """
+    if journal:
+        proxy = _Journal().wrap(value)
+        if proxy is not value:
+            return (value, proxy)
+        return (copymod.deepcopy(value), _UNSET)
+    elif deepcopy:
+        return (copymod.deepcopy(value), _UNSET)
+    elif copy:
+        if lazy:
+            if type(value) is dict:
+                return (value, _CowDict(value))
+            elif type(value) is list:
+                return (value, _CowList(value))
+        return (copymod.copy(value), _UNSET)
+    else:
+        return (value, _UNSET)
+
+
+class _AttrRollback(_ContextManager):
+    __slots__ = ("_obj", "_name", "_oldvalue")
+
+    _oldvalue: Any
+
+    def __init__(self, obj: Any, name: str) -> None:
+        self._obj = obj
+        self._name = name
+        self._entered = False
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        return (("attr", id(self._obj), self._name),)
+
+    def _handoff(self, key: Hashable, later: _ContextManager) -> None:
+        later._adopt(key, self._oldvalue)
+
+    def _adopt(self, _key: Hashable, oldvalue: Any) -> None:
+        self._oldvalue = oldvalue
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        if _tracers and self._traced:
+            _trace(self, "restore")
+        if self._oldvalue is not _UNSET:
+            setattr(self._obj, self._name, self._oldvalue)
+        else:
+            with suppress(AttributeError):
+                delattr(self._obj, self._name)
+        if _watched:
+            _bump(self._obj, self._name)
+
+    def _trace_values(self, restoring: bool) -> tuple[Any, Any, Any, Any]:
+        current = getattr(self._obj, self._name, _UNSET)
+        if restoring:
+            return (self._obj, self._name, current, self._oldvalue)
+        else:
+            return (self._obj, self._name, self._oldvalue, current)
+
+
+class attrset(_AttrRollback):
+    """
+    Temporarily change the value of an object's attribute.
+
+    ``attrset(obj, name, value)`` returns a context manager.  On entry, it
+    stores the current value of the attribute of ``obj`` with name ``name``,
+    and then it sets that attribute to ``value``.  On exit, it sets the
+    attribute back to the stored value.
+
+    If the given attribute is unset on entry, the context manager will unset it
+    on exit.
+    """
+
+    __slots__ = ("_value",)
+
+    _traced = True
+
+    def __init__(self, obj: Any, name: str, value: Any) -> None:
+        self._obj = obj
+        self._name = name
+        self._value = value
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._oldvalue = getattr(self._obj, self._name, _UNSET)
+        try:
+            setattr(self._obj, self._name, self._value)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        if _tracers:
+            _trace(self, "set")
+        if _watched:
+            _bump(self._obj, self._name)
+        self._entered = True
+
+
+class attrdel(_AttrRollback):
+    """
+    Temporarily unset an object's attribute.
+
+    ``attrdel(obj, name)`` returns a context manager.  On entry, it stores the
+    current value of the attribute of ``obj`` with name ``name``, and then it
+    unsets that attribute.  On exit, it sets the attribute back to the stored
+    value.
+
+    If the given attribute is unset on entry, the context manager will unset it
+    on exit.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._oldvalue = getattr(self._obj, self._name, _UNSET)
+        try:
+            delattr(self._obj, self._name)
+        except AttributeError:
+            pass
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        if _watched:
+            _bump(self._obj, self._name)
+        self._entered = True
+
+
+class attrrollback(_AttrRollback):
+    """
+    .. versionadded:: 0.2.0
+
+    .. versionchanged:: 0.3.0
+        ``copy`` and ``deepcopy`` arguments added
+
+    .. versionchanged:: 0.7.0
+        ``lazy`` and ``journal`` arguments added
+
+    Save & restore the value of an object's attribute.
+
+    ``attrrollback(obj, name)`` returns a context manager that stores the value
+    of the attribute of ``obj`` with name ``name`` on entry and sets the
+    attribute back to that value on exit.  If the given attribute is unset on
+    entry, the context manager will unset it on exit.
+
+    If ``copy`` is true, a shallow copy of the attribute will be saved &
+    restored.  If ``deepcopy`` is true, a deep copy of the attribute will be
+    saved & restored.  If both options are true, ``deepcopy`` takes precedence.
+
+    If ``lazy`` is true along with ``copy`` (but not ``deepcopy``) and the
+    attribute's value is a `dict` or `list`, the value is not copied on entry.
+    Instead, the attribute is set to a copy-on-write proxy of the value that
+    reads from the original until the first mutation, at which point it makes
+    its own shallow copy.  On exit, the original, unmodified value is
+    restored, so blocks that only read the attribute never copy anything.
+    The proxy supports the same operators as the value (e.g., ``+``, ``*``,
+    ``<``, and ``|``), but it is not an instance of `dict` or `list` (it
+    implements `~collections.abc.MutableMapping` or
+    `~collections.abc.MutableSequence` instead), so code that requires an
+    actual `dict` or `list` — such as ``isinstance()`` checks and
+    `json.dumps()` — will not accept it.  Changes made to the original value
+    through other references are not undone.  For values of other types,
+    ``lazy`` has no effect.
+
+    If ``journal`` is true, it takes precedence over the other options, and a
+    `dict` or `list` value is not copied on entry.  Instead, the attribute is
+    set to a proxy of the value that passes all changes through to the original
+    while recording how to undo them, and any `dict` or `list` read from the
+    proxy (at any depth) is likewise wrapped in a recording proxy.  On exit, the
+    recorded changes are undone in reverse order and the original value is
+    restored, giving the same result as ``deepcopy`` for changes made through
+    the attribute at a cost proportional to the number of changes rather than
+    to the size of the value.  Changes made through other references, or to
+    objects nested in the value other than dicts and lists, are not undone, and
+    proxies should not be stored outside of the value.  For values other than
+    dicts and lists, ``journal`` behaves like ``deepcopy``.
+    """
+
+    __slots__ = ("_copy", "_deepcopy", "_lazy", "_journal", "_proxy")
+
+    def __init__(
+        self,
+        obj: Any,
+        name: str,
+        copy: bool = False,
+        deepcopy: bool = False,
+        lazy: bool = False,
+        journal: bool = False,
+    ) -> None:
+        self._obj = obj
+        self._name = name
+        self._copy = copy
+        self._deepcopy = deepcopy
+        self._lazy = lazy
+        self._journal = journal
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        oldvalue = getattr(self._obj, self._name, _UNSET)
+        proxy = _UNSET
+        if oldvalue is not _UNSET and (
+            self._copy or self._deepcopy or self._journal
+        ):
+            oldvalue, proxy = _snapshot(
+                oldvalue, self._copy, self._deepcopy, self._lazy, self._journal
+            )
+            if proxy is not _UNSET:
+                setattr(self._obj, self._name, proxy)
+        self._oldvalue = oldvalue
+        self._proxy = proxy
+        self._entered = True
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if isinstance(self._proxy, (_JournalDict, _JournalList)):
+            self._proxy._journal.rollback()
+        super().__exit__(exc_type, exc_val, exc_tb)
+
+    def _handoff(self, key: Hashable, later: _ContextManager) -> None:
+        super()._handoff(key, later)
+        if isinstance(self._proxy, (_JournalDict, _JournalList)):
+            self._proxy._journal.rollback()
+            if _watched:
+                _bump(self._obj, self._name)
+
+
+class attrsupdate(_ContextManager):
+    """
+    .. versionadded:: 0.7.0
+
+    Temporarily change the values of multiple attributes at once.
+
+    ``attrsupdate(obj, **attrs)`` returns a context manager that, on entry,
+    sets each attribute of ``obj`` named in ``attrs`` to the corresponding
+    value, and on exit sets the attributes back to their original values.
+
+    ``attrsupdate(triples)``, where ``triples`` is an iterable of ``(obj, name,
+    value)`` tuples, does the same for attributes of any number of objects.
+    (If no keyword arguments are given, the sole positional argument is always
+    taken to be such an iterable.)
+
+    On entry, the current value of each attribute is recorded in a single undo
+    log just before the attribute is set, and on exit the log is replayed in
+    reverse order.  As with `attrrollback()`, an attribute that is unset on
+    entry is unset again on exit.  If setting an attribute fails on entry, the
+    attributes set so far are restored before the exception is propagated.
+    """
+
+    __slots__ = ("_triples", "_undo")
+
+    _undo: list[tuple[Any, str, Any]]
+
+    @overload
+    def __init__(self, triples: Iterable[tuple[Any, str, Any]], /) -> None: ...
+
+    @overload
+    def __init__(self, obj: Any, /, **attrs: Any) -> None: ...
+
+    def __init__(self, obj: Any, /, **attrs: Any) -> None:
+        self._triples: list[tuple[Any, str, Any]]
+        if attrs:
+            self._triples = [(obj, name, value) for name, value in attrs.items()]
+        else:
+            self._triples = list(obj)
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        undo = self._undo = []
+        try:
+            for obj, name, value in self._triples:
+                undo.append((obj, name, getattr(obj, name, _UNSET)))
+                setattr(obj, name, value)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        if _watched:
+            for obj, name, _ in self._triples:
+                _bump(obj, name)
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        undo = self._undo
+        while undo:
+            obj, name, oldvalue = undo.pop()
+            if oldvalue is not _UNSET:
+                setattr(obj, name, oldvalue)
+            else:
+                with suppress(AttributeError):
+                    delattr(obj, name)
+            if _watched:
+                _bump(obj, name)
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        return tuple(
+            dict.fromkeys(("attr", id(obj), name) for obj, name, _ in self._undo)
+        )
+
+    def _undo_index(self, key: Hashable) -> int:
+        # The earliest entry for an attribute holds its value from before entry
+        for i, (obj, name, _) in enumerate(self._undo):
+            if ("attr", id(obj), name) == key:
+                return i
+        raise AssertionError(f"{key!r} not patched")  # pragma: no cover
+
+    def _handoff(self, key: Hashable, later: _ContextManager) -> None:
+        later._adopt(key, self._undo[self._undo_index(key)][2])
+
+    def _adopt(self, key: Hashable, oldvalue: Any) -> None:
+        i = self._undo_index(key)
+        obj, name, _ = self._undo[i]
+        self._undo[i] = (obj, name, oldvalue)
+
+    def _restore_keys(self, keys: list[Hashable]) -> None:
+        for key in keys:
+            obj, name, oldvalue = self._undo[self._undo_index(key)]
+            _restore_attr(obj, name, oldvalue)
+
+
+#: The attribute overrides made by `localattrset()` in the current context,
+#: keyed by ``(id(obj), name)``.  The dict is never mutated; a new one is set
+#: for each change.
+_local_attrs: ContextVar[Mapping[tuple[int, str], Any]] = ContextVar(
+    "_local_attrs"
+)
+
+_local_attrs_lock = threading.Lock()
+
+
+class _LocalAttr:
+    """
+    A data descriptor installed on a class by `localattrset()` that returns
+    the override for an instance's attribute in the current context, if any,
+    and otherwise behaves like the original attribute
+    """
+
+    __slots__ = ("name", "orig", "orig_get", "orig_set", "orig_delete", "data")
+
+    def __init__(self, name: str, orig: Any) -> None:
+        self.name = name
+        #: The class attribute that this descriptor replaced, or `_UNSET`
+        self.orig = orig
+        otype = type(orig)
+        self.orig_get = getattr(otype, "__get__", None)
+        self.orig_set = getattr(otype, "__set__", None)
+        self.orig_delete = getattr(otype, "__delete__", None)
+        #: Whether the original attribute was a data descriptor, which takes
+        #: precedence over the instance dict
+        self.data = self.orig_get is not None and (
+            self.orig_set is not None or self.orig_delete is not None
+        )
+
+    def __get__(self, instance: Any, owner: type | None = None) -> Any:
+        if instance is None:
+            if self.orig is _UNSET:
+                raise AttributeError(self.name)
+            elif self.orig_get is not None:
+                return self.orig_get(self.orig, None, owner)
+            else:
+                return self.orig
+        overrides = _local_attrs.get(_EMPTY)
+        if overrides:
+            value = overrides.get((id(instance), self.name), _UNSET)
+            if value is not _UNSET:
+                return value
+        if self.data:
+            return self.orig_get(self.orig, instance, owner)  # type: ignore[misc]
+        try:
+            return instance.__dict__[self.name]
+        except (AttributeError, KeyError):
+            pass
+        if self.orig is _UNSET:
+            raise AttributeError(
+                f"{type(instance).__name__!r} object has no attribute"
+                f" {self.name!r}"
+            )
+        elif self.orig_get is not None:
+            return self.orig_get(self.orig, instance, owner)
+        else:
+            return self.orig
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        if self.orig_set is not None:
+            self.orig_set(self.orig, instance, value)
+        else:
+            instance.__dict__[self.name] = value
+
+    def __delete__(self, instance: Any) -> None:
+        if self.orig_delete is not None:
+            self.orig_delete(self.orig, instance)
+        else:
+            try:
+                del instance.__dict__[self.name]
+            except KeyError:
+                raise AttributeError(self.name) from None
+
+
+def _install_local_attr(cls: type, name: str) -> None:
+    with _local_attrs_lock:
+        for klass in cls.__mro__:
+            if name in klass.__dict__:
+                orig = klass.__dict__[name]
+                if isinstance(orig, _LocalAttr):
+                    return
+                break
+        else:
+            orig = _UNSET
+        setattr(cls, name, _LocalAttr(name, orig))
+
+
+class localattrset(_ContextManager):
+    """
+    .. versionadded:: 0.7.0
+
+    Temporarily change the value of an object's attribute in the current
+    thread or `asyncio` task only.
+
+    ``localattrset(obj, name, value)`` returns a context manager that, on
+    entry, overrides the attribute of ``obj`` named ``name`` to be ``value``
+    for code running in the current `contextvars` context (i.e., the current
+    thread, or the current task when using `asyncio`), leaving its value
+    unchanged for all other threads & tasks.  On exit, the override is
+    removed.  The object itself is never modified.
+
+    This works by installing a data descriptor for ``name`` on the class of
+    ``obj`` the first time the class & attribute are used with
+    `localattrset()`.  The descriptor looks up overrides in a
+    `contextvars.ContextVar` and otherwise defers to the instance's own
+    attribute (or the class attribute it replaced), so setting & deleting the
+    attribute keep working as before.  The descriptor remains installed
+    afterwards, adding a small cost to every access of the attribute on
+    instances of the class.  Consequently, ``obj``'s class must allow setting
+    attributes on it (which most builtin types do not).
+
+    Like `vdirchanged()`, new threads start without any overrides, while
+    `asyncio` tasks inherit the overrides in effect when they are created.
+    """
+
+    __slots__ = ("_obj", "_name", "_value", "_token")
+
+    def __init__(self, obj: Any, name: str, value: Any) -> None:
+        self._obj = obj
+        self._name = name
+        self._value = value
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        obj = self._obj
+        if not isinstance(type(obj).__dict__.get(self._name), _LocalAttr):
+            _install_local_attr(type(obj), self._name)
+        overrides = _local_attrs.get(_EMPTY)
+        self._token = _local_attrs.set(
+            {**overrides, (id(obj), self._name): self._value}
+        )
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        _local_attrs.reset(self._token)
+
+
+class _EnvRollback(_ContextManager):
+    __slots__ = ("_names", "_oldvalues")
+
+    _oldvalues: list[str | None]
+
+    def __init__(self, name: str, *names: str) -> None:
+        self._names = (name, *names)
+        self._entered = False
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        return tuple(("env", name) for name in dict.fromkeys(self._names))
+
+    def _trace_values(self, restoring: bool) -> tuple[Any, Any, Any, Any]:
+        current: Any = list(map(os.environ.get, self._names))
+        saved: Any = self._oldvalues
+        key: Any = self._names
+        if len(key) == 1:
+            key, current, saved = key[0], current[0], saved[0]
+        if restoring:
+            return (os.environ, key, current, saved)
+        else:
+            return (os.environ, key, saved, current)
+
+    def _handoff(self, key: Hashable, later: _EnvRollback) -> None:
+        assert isinstance(key, tuple)
+        name = key[1]
+        later._oldvalues[later._names.index(name)] = self._oldvalues[
+            self._names.index(name)
+        ]
+
+    def _restore_keys(self, keys: list[Hashable]) -> None:
+        environ = os.environ
+        for key in keys:
+            assert isinstance(key, tuple)
+            name = key[1]
+            oldvalue = self._oldvalues[self._names.index(name)]
+            if oldvalue is not None:
+                environ[name] = oldvalue
+            else:
+                with suppress(KeyError):
+                    del environ[name]
+            if _watched:
+                _bump(environ, name)
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        if _tracers and self._traced:
+            _trace(self, "restore")
+        environ = os.environ
+        names = self._names
+        oldvalues = self._oldvalues
+        # Restore in reverse so that, if a name was given more than once, its
+        # earliest snapshot wins
+        i = len(oldvalues)
+        while i:
+            i -= 1
+            oldvalue = oldvalues[i]
+            if oldvalue is not None:
+                environ[names[i]] = oldvalue
+            else:
+                with suppress(KeyError):
+                    del environ[names[i]]
+        if _watched:
+            for name in dict.fromkeys(names):
+                _bump(environ, name)
+
+
+class envset(_EnvRollback):
+    """
+    .. versionchanged:: 0.7.0
+        Multiple environment variables can now be set at once by passing a
+        mapping
+
+    Temporarily set one or more environment variables.
+
+    ``envset(name, value)`` returns a context manager.  On entry, it stores the
+    current value of the environment variable ``name``, and then it sets that
+    environment variable to ``value``.  On exit, it sets the environment
+    variable back to the stored value.
+
+    If the given environment variable is unset on entry, the context manager
+    will unset it on exit.
+
+    ``envset(mapping)`` does the same for every name in ``mapping`` at once:
+    all of the variables' values are stored before any are changed, and they
+    are all restored together on exit.  A value of `None` in ``mapping``
+    causes the corresponding variable to be unset on entry.
+    """
+
+    __slots__ = ("_values",)
+
+    _traced = True
+
+    @overload
+    def __init__(self, name: str, value: str) -> None: ...
+
+    @overload
+    def __init__(self, name: Mapping[str, str | None]) -> None: ...
+
+    def __init__(
+        self, name: str | Mapping[str, str | None], value: str | None = None
+    ) -> None:
+        if isinstance(name, str):
+            if value is None:
+                raise TypeError("envset() with a single name requires a value")
+            self._names: tuple[str, ...] = (name,)
+            self._values: tuple[str | None, ...] = (value,)
+        elif value is not None:
+            raise TypeError("envset() with a mapping does not take a value")
+        else:
+            self._names = tuple(name.keys())
+            self._values = tuple(name.values())
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._oldvalues = list(map(os.environ.get, self._names))
+        environ = os.environ
+        try:
+            for name, value in zip(self._names, self._values):
+                if value is not None:
+                    environ[name] = value
+                else:
+                    with suppress(KeyError):
+                        del environ[name]
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        if _tracers:
+            _trace(self, "set")
+        if _watched:
+            for name in dict.fromkeys(self._names):
+                _bump(environ, name)
+        self._entered = True
+
+
+class envdel(_EnvRollback):
+    """
+    .. versionchanged:: 0.7.0
+        Multiple names can now be passed
+
+    Temporarily unset one or more environment variables.
+
+    ``envdel(name, *names)`` returns a context manager.  On entry, it stores
+    the current values of the given environment variables, and then it unsets
+    them.  On exit, it sets the environment variables back to the stored
+    values.
+
+    If a given environment variable is unset on entry, the context manager
+    will unset it on exit.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._oldvalues = list(map(os.environ.get, self._names))
+        environ = os.environ
+        try:
+            for name, oldvalue in zip(self._names, self._oldvalues):
+                if oldvalue is not None:
+                    with suppress(KeyError):
+                        del environ[name]
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        if _watched:
+            for name in dict.fromkeys(self._names):
+                _bump(environ, name)
+        self._entered = True
+
+
+class envrollback(_EnvRollback):
+    """
+    .. versionadded:: 0.2.0
+
+    .. versionchanged:: 0.7.0
+        Multiple names can now be passed
+
+    Save & restore the values of one or more environment variables.
+
+    ``envrollback(name, *names)`` returns a context manager that stores the
+    values of the given environment variables on entry and sets the
+    environment variables back to those values on exit.  If a given
+    environment variable is unset on entry, the context manager will unset it
+    on exit.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._oldvalues = list(map(os.environ.get, self._names))
+        self._entered = True
+
+
+class environrollback(_ContextManager):
+    """
+    .. versionadded:: 0.7.0
+
+    Save & restore the entire environment.
+
+    ``environrollback()`` returns a context manager that stores a snapshot of
+    all of `os.environ` on entry.  On exit, the environment is compared with
+    the snapshot, and only the variables that were added, removed, or changed
+    in the meantime are set back; if nothing changed, the exit costs only a
+    single comparison.
+
+    The snapshot is taken of the encoded data that `os.environ` keeps
+    internally, so changes made by calling `os.putenv()` or
+    `os.unsetenv()` directly (or by C extensions) are neither detected nor
+    undone.  If `os.environ` is not a standard `os._Environ`, a plain `dict`
+    copy of it is taken instead, and the same mapping is restored on exit.
+    """
+
+    __slots__ = ("_encoded", "_environ", "_saved")
+
+    _encoded: bool
+    _environ: Any
+    _saved: dict[Any, Any]
+
+    def __init__(self) -> None:
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        environ = _environ_internals()
+        if environ is not None:
+            self._encoded = True
+            self._environ = environ
+            self._saved = environ._data.copy()
+        else:
+            self._encoded = False
+            self._environ = os.environ
+            self._saved = dict(self._environ)
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        environ = self._environ
+        saved = self._saved
+        if self._encoded:
+            data = environ._data
+            decodekey = environ.decodekey
+            decodevalue = environ.decodevalue
+        else:
+            # The keys & values are already `str`s, so "decoding" is a no-op.
+            data = environ
+            decodekey = decodevalue = str
+        if data == saved:
+            return
+        # Values that weren't touched are still the same objects, so the keys
+        # that were added or changed can be found with identity comparisons.
+        changed = list(
+            compress(data, map(is_not, map(saved.get, data), data.values()))
+        )
+        restored = []
+        for key in changed:
+            value = saved.get(key)
+            if value is None:
+                del environ[decodekey(key)]
+                restored.append(key)
+            elif value != data[key]:
+                environ[decodekey(key)] = decodevalue(value)
+                restored.append(key)
+        # Now every key in `data` is in `saved`, so any difference in size is
+        # due to keys that were removed.
+        if len(data) != len(saved):
+            for key in saved.keys() - data.keys():
+                environ[decodekey(key)] = decodevalue(saved[key])
+                restored.append(key)
+        if _watched:
+            for key in restored:
+                _bump(environ, decodekey(key))
+
+
+#: The environment variable overrides made by `localenvset()` in the current
+#: context, with `None` values for variables that are unset.  The dict is never
+#: mutated; a new one is set for each change.
+_local_env: ContextVar[Mapping[str, str | None]] = ContextVar("_local_env")
+
+
+class localenvset(_ContextManager):
+    """
+    .. versionadded:: 0.7.0
+
+    Temporarily set or unset one or more environment variables in the current
+    thread or `asyncio` task only, without modifying `os.environ`.
+
+    ``localenvset(name, value)`` returns a context manager that, on entry,
+    overrides the environment variable ``name`` to be ``value`` for code
+    running in the current `contextvars` context (i.e., the current thread, or
+    the current task when using `asyncio`).  ``localenvset(mapping)`` does the
+    same for every name in ``mapping`` at once, with a value of `None` causing
+    the corresponding variable to be treated as unset.  On exit, the overrides
+    are removed.
+
+    The overrides are only visible through `getenv()` and
+    `environ_for_subprocess()`; `os.environ` and the process's actual
+    environment are never changed, so different threads & tasks can each have
+    their own overrides at the same time without any locking or calls to
+    ``putenv()``.  Pass ``env=environ_for_subprocess()`` when starting a
+    subprocess for it to receive the overrides.
+
+    Like `vdirchanged()`, new threads start without any overrides, while
+    `asyncio` tasks inherit the overrides in effect when they are created.
+    """
+
+    __slots__ = ("_values", "_token")
+
+    _token: Token[Mapping[str, str | None]]
+
+    @overload
+    def __init__(self, name: str, value: str | None) -> None: ...
+
+    @overload
+    def __init__(self, name: Mapping[str, str | None]) -> None: ...
+
+    def __init__(
+        self, name: str | Mapping[str, str | None], value: str | None = None
+    ) -> None:
+        if isinstance(name, str):
+            self._values: dict[str, str | None] = {name: value}
+        elif value is not None:
+            raise TypeError("localenvset() with a mapping does not take a value")
+        else:
+            self._values = dict(name)
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        self._token = _local_env.set({**_local_env.get(_EMPTY), **self._values})
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        _local_env.reset(self._token)
+
+
+@overload
+def getenv(name: str) -> str | None: ...
+
+
+@overload
+def getenv(name: str, default: str) -> str: ...
+
+
+def getenv(name: str, default: str | None = None) -> str | None:
+    """
+    .. versionadded:: 0.7.0
+
+    Like `os.getenv()`, but taking into account any overrides made by
+    `localenvset()` in the current thread or `asyncio` task
+    """
+    overrides = _local_env.get(_EMPTY)
+    if overrides and name in overrides:
+        value = overrides[name]
+        return default if value is None else value
+    return os.environ.get(name, default)
+
+
+def _environ_internals() -> Any:
+    """
+    Return `os.environ` if it is a standard `os._Environ` exposing the
+    internal encoded data & codecs used by `ChildEnv` and `environrollback`;
+    otherwise, return `None`
+    """
+    environ = os.environ
+    if isinstance(environ, os._Environ) and all(
+        hasattr(environ, attr)
+        for attr in ("_data", "encodekey", "encodevalue", "decodekey", "decodevalue")
+    ):
+        return environ
+    return None
+
+
+def environ_for_subprocess() -> dict[str, str]:
+    """
+    .. versionadded:: 0.7.0
+
+    Return a new `dict` of the environment variables in `os.environ` with the
+    overrides made by `localenvset()` in the current thread or `asyncio` task
+    applied, suitable for passing as the ``env`` argument to
+    `subprocess.Popen` and the like
+    """
+    env = dict(os.environ)
+    for name, value in _local_env.get(_EMPTY).items():
+        if value is not None:
+            env[name] = value
+        else:
+            env.pop(name, None)
+    return env
+
+
+class ChildEnv:
+    """
+    .. versionadded:: 0.7.0
+
+    A reusable set of changes to the environment for child processes.
+
+    ``ChildEnv(changes)`` encodes the environment variables in ``changes``
+    (with `None` values for variables to unset) once, up front.  Each call to
+    `env()` then returns a new mapping of the current environment with the
+    changes applied, suitable for passing as the ``env`` argument to
+    `subprocess.Popen`, `os.posix_spawn()`, and the like, without modifying
+    `os.environ` and without calling ``putenv()``.
+
+    The current environment is taken to be `os.environ` with any overrides
+    made by `localenvset()` in the current thread or `asyncio` task applied,
+    as with `environ_for_subprocess()`.  However, rather than decoding &
+    re-encoding every variable in `os.environ`, `env()` copies the
+    already-encoded data that `os.environ` keeps internally and encodes only
+    the overrides.  Consequently, on POSIX, the returned mapping has `bytes`
+    keys & values.  If `os.environ` is not a standard `os._Environ`, `env()`
+    instead applies the changes to `environ_for_subprocess()` and returns a
+    mapping with `str` keys & values.
+    """
+
+    __slots__ = ("_changes", "_set", "_unset")
+
+    def __init__(self, changes: Mapping[str, str | None] | None = None) -> None:
+        self._changes = dict(changes or {})
+        self._set: dict[Any, Any] | None = None
+        self._unset: tuple[Any, ...] = ()
+        environ = _environ_internals()
+        if environ is None:
+            return
+        self._set = {}
+        unset: dict[Any, None] = {}
+        for name, value in self._changes.items():
+            # On Windows, different names can encode to the same key
+            key = environ.encodekey(name)
+            if value is None:
+                self._set.pop(key, None)
+                unset[key] = None
+            else:
+                unset.pop(key, None)
+                self._set[key] = environ.encodevalue(value)
+        self._unset = tuple(unset)
+
+    def env(self) -> dict[bytes, bytes] | dict[str, str]:
+        """
+        Return a new mapping of the current environment with the changes
+        applied
+        """
+        environ = _environ_internals()
+        if environ is None or self._set is None:
+            plain = environ_for_subprocess()
+            for name, value in self._changes.items():
+                if value is None:
+                    plain.pop(name, None)
+                else:
+                    plain[name] = value
+            return plain
+        env = environ._data.copy()
+        overrides = _local_env.get(_EMPTY)
+        if overrides:
+            for name, value in overrides.items():
+                key = environ.encodekey(name)
+                if value is None:
+                    env.pop(key, None)
+                else:
+                    env[key] = environ.encodevalue(value)
+        env.update(self._set)
+        for key in self._unset:
+            env.pop(key, None)
+        return cast("dict[bytes, bytes] | dict[str, str]", env)
+
+
+class _ItemRollback(_ContextManager):
+    __slots__ = ("_d", "_key", "_oldvalue")
+
+    _oldvalue: Any
+
+    def __init__(self, d: MutableMapping[Any, Any], key: Any) -> None:
+        self._d = d
+        self._key = key
+        self._entered = False
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        return (("item", id(self._d), self._key),)
+
+    def _handoff(self, key: Hashable, later: _ContextManager) -> None:
+        later._adopt(key, self._oldvalue)
+
+    def _adopt(self, _key: Hashable, oldvalue: Any) -> None:
+        self._oldvalue = oldvalue
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        if _tracers and self._traced:
+            _trace(self, "restore")
+        if self._oldvalue is not _UNSET:
+            self._d[self._key] = self._oldvalue
+        else:
+            with suppress(KeyError):
+                del self._d[self._key]
+        if _watched:
+            _bump(self._d, self._key)
+
+    def _trace_values(self, restoring: bool) -> tuple[Any, Any, Any, Any]:
+        current = self._d.get(self._key, _UNSET)
+        if restoring:
+            return (self._d, self._key, current, self._oldvalue)
+        else:
+            return (self._d, self._key, self._oldvalue, current)
+
+
+class itemset(_ItemRollback, Generic[K, V]):
+    """
+    Temporarily change the value of a mapping's entry.
+
+    ``itemset(d, key, value)`` returns a context manager.  On entry, it stores
+    the current value of ``d[key]``, and then it sets that field to ``value``.
+    On exit, it sets the field back to the stored value.
+
+    If the given field is unset on entry, the context manager will unset it
+    on exit.
+    """
+
+    __slots__ = ("_value",)
+
+    _traced = True
+
+    def __init__(self, d: MutableMapping[K, V], key: K, value: V) -> None:
+        self._d = d
+        self._key = key
+        self._value = value
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        try:
+            self._oldvalue = self._d[self._key]
+        except KeyError:
+            self._oldvalue = _UNSET
+        try:
+            self._d[self._key] = self._value
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        if _tracers:
+            _trace(self, "set")
+        if _watched:
+            _bump(self._d, self._key)
+        self._entered = True
+
+
+class itemdel(_ItemRollback, Generic[K]):
+    """
+    Temporarily unset a mapping's entry.
+
+    ``itemdel(d, key)`` returns a context manager.  On entry, it stores the
+    current value of ``d[key]``, and then it unsets that field.  On exit, it
+    sets the field back to the stored value.
+
+    If the given field is unset on entry, the context manager will unset it
+    on exit.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, d: MutableMapping[K, Any], key: K) -> None:
+        self._d = d
+        self._key = key
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        try:
+            self._oldvalue = self._d.pop(self._key)
+        except KeyError:
+            self._oldvalue = _UNSET
+        if _watched:
+            _bump(self._d, self._key)
+        self._entered = True
+
+
+class itemrollback(_ItemRollback, Generic[K]):
+    """
+    .. versionadded:: 0.2.0
+
+    .. versionchanged:: 0.3.0
+        ``copy`` and ``deepcopy`` arguments added
+
+    .. versionchanged:: 0.7.0
+        ``lazy`` and ``journal`` arguments added
+
+    Save & restore the value of a mapping's entry.
+
+    ``itemrollback(d, key)`` returns a context manager that stores the value
+    of ``d[key]`` on entry and sets the field back to that value on exit.  If
+    the given field is unset on entry, the context manager will unset it on
+    exit.
+
+    If ``copy`` is true, a shallow copy of the field will be saved & restored.
+    If ``deepcopy`` is true, a deep copy of the field will be saved & restored.
+    If both options are true, ``deepcopy`` takes precedence.
+
+    If ``lazy`` is true along with ``copy`` (but not ``deepcopy``) and the
+    field's value is a `dict` or `list`, the value is not copied on entry.
+    Instead, the field is set to a copy-on-write proxy of the value that reads
+    from the original until the first mutation, at which point it makes its
+    own shallow copy.  On exit, the original, unmodified value is restored, so
+    blocks that only read the field never copy anything.  Note that the proxy
+    supports the same operators as the value (e.g., ``+``, ``*``, ``<``, and
+    ``|``), but it is not an instance of `dict` or `list` (it implements
+    `~collections.abc.MutableMapping` or `~collections.abc.MutableSequence`
+    instead), so code that requires an actual `dict` or `list` — such as
+    ``isinstance()`` checks and `json.dumps()` — will not accept it.  Changes
+    made to the original value through other references are not undone.  For
+    values of other types, ``lazy`` has no effect.
+
+    If ``journal`` is true, it takes precedence over the other options, and a
+    `dict` or `list` value is not copied on entry.  Instead, the field is set to
+    a proxy of the value that passes all changes through to the original while
+    recording how to undo them, and any `dict` or `list` read from the proxy
+    (at any depth) is likewise wrapped in a recording proxy.  On exit, the
+    recorded changes are undone in reverse order and the original value is
+    restored, giving the same result as ``deepcopy`` for changes made through
+    the field at a cost proportional to the number of changes rather than to
+    the size of the value.  Changes made through other references, or to objects
+    nested in the value other than dicts and lists, are not undone, and proxies
+    should not be stored outside of the value.  For values other than dicts and
+    lists, ``journal`` behaves like ``deepcopy``.
+    """
+
+    __slots__ = ("_copy", "_deepcopy", "_lazy", "_journal", "_proxy")
+
+    def __init__(
+        self,
+        d: MutableMapping[K, Any],
+        key: K,
+        copy: bool = False,
+        deepcopy: bool = False,
+        lazy: bool = False,
+        journal: bool = False,
+    ) -> None:
+        self._d = d
+        self._key = key
+        self._copy = copy
+        self._deepcopy = deepcopy
+        self._lazy = lazy
+        self._journal = journal
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        proxy = _UNSET
+        try:
+            oldvalue = self._d[self._key]
+        except KeyError:
+            oldvalue = _UNSET
+        else:
+            if self._copy or self._deepcopy or self._journal:
+                oldvalue, proxy = _snapshot(
+                    oldvalue,
+                    self._copy,
+                    self._deepcopy,
+                    self._lazy,
+                    self._journal,
+                )
+                if proxy is not _UNSET:
+                    self._d[self._key] = proxy
+        self._oldvalue = oldvalue
+        self._proxy = proxy
+        self._entered = True
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        if isinstance(self._proxy, (_JournalDict, _JournalList)):
+            self._proxy._journal.rollback()
+        super().__exit__(exc_type, exc_val, exc_tb)
+
+    def _handoff(self, key: Hashable, later: _ContextManager) -> None:
+        super()._handoff(key, later)
+        if isinstance(self._proxy, (_JournalDict, _JournalList)):
+            self._proxy._journal.rollback()
+            if _watched:
+                _bump(self._d, self._key)
+
+
+class itemsupdate(_ContextManager, Generic[K, V]):
+    """
+    .. versionadded:: 0.7.0
+
+    Temporarily change and/or unset multiple entries of a mapping at once.
+
+    ``itemsupdate(d, values, delete=keys)`` returns a context manager.  On
+    entry, it stores the current values of all keys in ``values`` and
+    ``delete`` (and no others), and then it updates ``d`` with ``values`` (a
+    mapping or iterable of key-value pairs, as accepted by ``dict.update()``)
+    and unsets the keys in ``delete``.  A key that appears in both ``values``
+    and ``delete`` ends up unset.  On exit, all of the stored values are
+    restored in a single pass.
+
+    As with `itemrollback()`, any of the fields that are unset on entry will be
+    unset on exit.
+
+    When ``d`` is a plain `dict`, the updates & restores are performed with
+    ``dict.update()`` and ``dict.pop()``.
+    """
+
+    __slots__ = ("_d", "_values", "_delete", "_oldvalues")
+
+    _oldvalues: dict[K, Any]
+
+    def __init__(
+        self,
+        d: MutableMapping[K, V],
+        values: Mapping[K, V] | Iterable[tuple[K, V]] = (),
+        delete: Iterable[K] = (),
+    ) -> None:
+        self._d = d
+        self._values: dict[K, V] = dict(values)
+        self._delete = tuple(delete)
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        d = self._d
+        if type(d) is dict:
+            get = d.get
+            oldvalues = {k: get(k, _UNSET) for k in self._values}
+            oldvalues.update((k, get(k, _UNSET)) for k in self._delete)
+            self._oldvalues = oldvalues
+            try:
+                d.update(self._values)
+                pop = d.pop
+                for k in self._delete:
+                    pop(k, None)
+            except BaseException:
+                self.__exit__(None, None, None)
+                raise
+        else:
+            oldvalues = {}
+            for k in (*self._values, *self._delete):
+                try:
+                    oldvalues[k] = d[k]
+                except KeyError:
+                    oldvalues[k] = _UNSET
+            self._oldvalues = oldvalues
+            try:
+                for k, v in self._values.items():
+                    d[k] = v
+                for k in self._delete:
+                    with suppress(KeyError):
+                        del d[k]
+            except BaseException:
+                self.__exit__(None, None, None)
+                raise
+        if _watched:
+            for k in oldvalues:
+                _bump(d, k)
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        d = self._d
+        if type(d) is dict:
+            d.update(
+                {k: v for k, v in self._oldvalues.items() if v is not _UNSET}
+            )
+            pop = d.pop
+            for k, v in self._oldvalues.items():
+                if v is _UNSET:
+                    pop(k, None)
+        else:
+            for k, v in self._oldvalues.items():
+                if v is not _UNSET:
+                    d[k] = v
+                else:
+                    with suppress(KeyError):
+                        del d[k]
+        if _watched:
+            for k in self._oldvalues:
+                _bump(d, k)
+
+    def _guard_keys(self) -> tuple[Hashable, ...]:
+        return tuple(("item", id(self._d), k) for k in self._oldvalues)
+
+    def _handoff(self, key: Hashable, later: _ContextManager) -> None:
+        assert isinstance(key, tuple)
+        later._adopt(key, self._oldvalues[key[2]])
+
+    def _adopt(self, key: Hashable, oldvalue: Any) -> None:
+        assert isinstance(key, tuple)
+        self._oldvalues[key[2]] = oldvalue
+
+    def _restore_keys(self, keys: list[Hashable]) -> None:
+        d = self._d
+        for key in keys:
+            assert isinstance(key, tuple)
+            _restore_item(d, key[2], self._oldvalues[key[2]])
+
+
+class additem(_ContextManager, Generic[K]):
+    """
+    .. versionadded:: 0.4.0
+
+    .. versionchanged:: 0.7.0
+        The context manager now remembers the index at which it added
+        ``value``.  If ``value`` itself is still at that index on exit, it is
+        removed from there directly, without comparing it against any other
+        items; a scan for an equal item is only performed if the sequence was
+        otherwise rearranged.  Previously, the last (or, with ``prepend``,
+        first) equal item was always removed, which differs when an equal
+        item was later added to the sequence.
+
+    Temporarily add a value to a sequence.
+
+    ``additem(lst, value)`` returns a context manager that appends ``value`` to
+    the sequence ``lst`` on entry.  On exit, if the item at the index where
+    ``value`` was added is still ``value`` itself (the same object), that item
+    is removed; otherwise, the last item (if any) in ``lst`` that equals
+    ``value`` is removed.
+
+    If ``prepend`` is true, ``value`` is instead prepended to ``lst`` on entry,
+    and on exit it is removed from the start of ``lst`` if it is still there;
+    otherwise, the first item in ``lst`` that equals ``value`` is removed.
+    """
+
+    __slots__ = ("_lst", "_value", "_prepend", "_pos")
+
+    _traced = True
+
+    def __init__(
+        self, lst: MutableSequence[K], value: K, prepend: bool = False
+    ) -> None:
+        self._lst = lst
+        self._value = value
+        self._prepend = prepend
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        if self._prepend:
+            self._lst.insert(0, self._value)
+            self._pos = 0
+        else:
+            self._pos = len(self._lst)
+            self._lst.append(self._value)
+        if _tracers:
+            _trace(self, "set")
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        if _tracers:
+            _trace(self, "restore")
+        lst = self._lst
+        value = self._value
+        pos = self._pos
+        if pos < len(lst) and lst[pos] is value:
+            del lst[pos]
+        elif self._prepend:
+            with suppress(ValueError):
+                lst.remove(value)
+        else:
+            for i in range(len(lst) - 1, -1, -1):
+                if lst[i] == value:
+                    del lst[i]
+                    break
+
+    def _trace_values(self, restoring: bool) -> tuple[Any, Any, Any, Any]:
+        if restoring:
+            return (self._lst, None, self._value, _UNSET)
+        else:
+            return (self._lst, None, _UNSET, self._value)
+
+
+class additems(_ContextManager, Generic[K]):
+    """
+    .. versionadded:: 0.7.0
+
+    Temporarily add multiple values to a sequence.
+
+    ``additems(lst, values)`` returns a context manager that appends the
+    elements of ``values`` to the sequence ``lst`` (in order) on entry and
+    removes them on exit.  The effect is the same as nesting an `additem()`
+    call for each value, but the values are added with a single ``extend()``
+    and removed with a single pass over ``lst``.
+
+    If ``prepend`` is true, ``values`` are instead inserted (in order) at the
+    start of ``lst`` on entry.
+
+    Removal follows the same rules as `additem()`: if the added values are
+    still in the same place on exit, they are deleted from there directly.
+    Otherwise, for each value, the last item in ``lst`` that equals it (or, if
+    ``prepend`` is true, the first such item) is removed, with values that
+    occur multiple times in ``values`` removing that many equal items.  If any
+    of the values or items are unhashable, this is done by searching ``lst``
+    once per value.
+    """
+
+    __slots__ = ("_lst", "_values", "_prepend", "_pos")
+
+    def __init__(
+        self, lst: MutableSequence[K], values: Iterable[K], prepend: bool = False
+    ) -> None:
+        self._lst = lst
+        self._values = tuple(values)
+        self._prepend = prepend
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        lst = self._lst
+        if self._prepend:
+            self._pos = 0
+            if isinstance(lst, list):
+                lst[:0] = self._values
+            else:
+                for i, v in enumerate(self._values):
+                    lst.insert(i, v)
+        else:
+            self._pos = len(lst)
+            lst.extend(self._values)
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        lst = self._lst
+        values = self._values
+        n = len(values)
+        if self._prepend:
+            candidates = [0]
+        else:
+            # Check both where the values were added and the end of `lst`,
+            # where they'll still be if only earlier items were removed or
+            # inserted.
+            candidates = [self._pos, len(lst) - n]
+        for start in candidates:
+            if self._is_at(lst, start):
+                if isinstance(lst, list):
+                    del lst[start : start + n]
+                else:
+                    for _ in values:
+                        del lst[start]
+                return
+        try:
+            drop = self._find(lst)
+        except TypeError:
+            # Unhashable
+            if self._prepend:
+                for v in values:
+                    with suppress(ValueError):
+                        lst.remove(v)
+            else:
+                for v in reversed(values):
+                    for i in range(len(lst) - 1, -1, -1):
+                        if lst[i] == v:
+                            del lst[i]
+                            break
+            return
+        for i in sorted(drop, reverse=True):
+            del lst[i]
+
+    def _is_at(self, lst: MutableSequence[K], start: int) -> bool:
+        """
+        Test whether the added values themselves are at index ``start`` of
+        ``lst``
+        """
+        values = self._values
+        end = start + len(values)
+        if start < 0 or end > len(lst):
+            return False
+        elif isinstance(lst, list):
+            return all(map(is_, lst[start:end], values))
+        else:
+            return all(lst[start + i] is v for i, v in enumerate(values))
+
+    def _find(self, lst: MutableSequence[K]) -> set[int]:
+        """
+        Return the indices of the items in ``lst`` to remove.  Raises
+        `TypeError` if any of the values or compared items are unhashable.
+        """
+        wanted = Counter(self._values)
+        remaining = len(self._values)
+        drop = set()
+        if self._prepend:
+            indices: Iterable[int] = range(len(lst))
+        else:
+            indices = range(len(lst) - 1, -1, -1)
+        for i in indices:
+            x = lst[i]
+            if wanted[x] > 0:
+                wanted[x] -= 1
+                drop.add(i)
+                remaining -= 1
+                if not remaining:
+                    break
+        return drop
+
+
+class syspathadd(additem[str]):
+    """
+    .. versionadded:: 0.7.0
+
+    Temporarily add a directory to `sys.path`.
+
+    ``syspathadd(dirpath)`` returns a context manager that appends ``dirpath``
+    to `sys.path` on entry and removes it on exit, in the same way as
+    ``additem(sys.path, dirpath)``; if ``prepend`` is true, ``dirpath`` is
+    prepended instead.
+
+    In addition, the entry for ``dirpath`` in `sys.path_importer_cache` is
+    discarded on both entry and exit, so that modules added to the directory
+    since it was last searched can be found without calling
+    `importlib.invalidate_caches()` (which clears the caches of every finder),
+    and so that a finder for the directory does not outlive the context.
+
+    If ``evict_modules`` is true, then on exit, the modules that were added to
+    `sys.modules` during the block and that were loaded from files in
+    ``dirpath`` (or its subdirectories, other than those that are themselves
+    on `sys.path`) are removed from `sys.modules`.  Modules that were already
+    imported on entry are left alone.
+    """
+
+    __slots__ = ("_evict_modules", "_oldmodules")
+
+    _oldmodules: set[str]
+
+    def __init__(
+        self,
+        dirpath: str | os.PathLike[str],
+        prepend: bool = False,
+        evict_modules: bool = False,
+    ) -> None:
+        super().__init__(sys.path, os.fspath(dirpath), prepend)
+        self._evict_modules = evict_modules
+
+    def __enter__(self) -> None:
+        super().__enter__()
+        if self._evict_modules:
+            self._oldmodules = set(sys.modules)
+        sys.path_importer_cache.pop(self._value, None)
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        super().__exit__(exc_type, exc_val, exc_tb)
+        sys.path_importer_cache.pop(self._value, None)
+        if self._evict_modules:
+            prefix = os.path.join(os.path.abspath(self._value), "")
+            # Modules under other `sys.path` entries inside the directory (such
+            # as a virtualenv's site-packages) were not loaded via this entry.
+            others = tuple(
+                p
+                for p in (
+                    os.path.join(os.path.abspath(e), "")
+                    for e in sys.path
+                    if isinstance(e, str)
+                )
+                if p != prefix and p.startswith(prefix)
+            )
+            for name in sys.modules.keys() - self._oldmodules:
+                module = sys.modules.get(name)
+                spec = getattr(module, "__spec__", None)
+                if spec is None:
+                    continue
+                if spec.origin is not None and spec.has_location:
+                    paths = [spec.origin]
+                else:
+                    # Namespace packages
+                    paths = list(spec.submodule_search_locations or ())
+                # Finders for `sys.path` entries build absolute paths by
+                # joining onto the absolute entry, so a prefix test suffices.
+                if paths and all(
+                    p.startswith(prefix) and not p.startswith(others)
+                    for p in paths
+                ):
+                    sys.modules.pop(name, None)
+
+
+class Patcher:
+    """
+    .. versionadded:: 0.7.0
+
+    A single context manager for making any number of temporary changes.
+
+    Within a ``with Patcher() as p:`` block, each call to one of the methods
+    below makes a change immediately and records how to undo it in a single
+    flat undo log.  On exit, the log is replayed in reverse order, restoring
+    everything that was changed.  This is equivalent to (but much cheaper
+    than) entering the corresponding context managers in a
+    `contextlib.ExitStack`.
+
+    The undo log can also be replayed without exiting by calling `restore()`,
+    after which the instance can be used again.  A `Patcher` can also be used
+    without a ``with`` block, in which case `restore()` must be called
+    explicitly.
+
+    If an undo step raises an exception, the remaining steps are still
+    performed, and the first exception is reraised at the end.
+    """
+
+    __slots__ = ("_undo",)
+
+    def __init__(self) -> None:
+        self._undo: list[tuple[Callable[..., Any], tuple[Any, ...]]] = []
+
+    def __enter__(self) -> Patcher:
+        return self
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self.restore()
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def setattr(self, obj: Any, name: str, value: Any) -> None:  # noqa: A003
+        """Set an attribute, as with `attrset()`"""
+        oldvalue = getattr(obj, name, _UNSET)
+        setattr(obj, name, value)
+        self._undo.append((_restore_attr, (obj, name, oldvalue)))
+        if _watched:
+            _bump(obj, name)
+
+    def delattr(self, obj: Any, name: str) -> None:  # noqa: A003
+        """Unset an attribute (if it is set), as with `attrdel()`"""
+        oldvalue = getattr(obj, name, _UNSET)
+        if oldvalue is not _UNSET:
+            delattr(obj, name)
+            self._undo.append((_restore_attr, (obj, name, oldvalue)))
+            if _watched:
+                _bump(obj, name)
+
+    def setitem(self, d: MutableMapping[Any, Any], key: Any, value: Any) -> None:
+        """Set an entry of a mapping, as with `itemset()`"""
+        try:
+            oldvalue = d[key]
+        except KeyError:
+            oldvalue = _UNSET
+        d[key] = value
+        self._undo.append((_restore_item, (d, key, oldvalue)))
+        if _watched:
+            _bump(d, key)
+
+    def delitem(self, d: MutableMapping[Any, Any], key: Any) -> None:
+        """Unset an entry of a mapping (if it is set), as with `itemdel()`"""
+        try:
+            oldvalue = d.pop(key)
+        except KeyError:
+            pass
+        else:
+            self._undo.append((_restore_item, (d, key, oldvalue)))
+            if _watched:
+                _bump(d, key)
+
+    def setenv(self, name: str, value: str | None) -> None:
+        """
+        Set an environment variable, or unset it if ``value`` is `None`, as
+        with `envset()`
+        """
+        oldvalue = os.environ.get(name)
+        if value is not None:
+            os.environ[name] = value
+        elif oldvalue is not None:
+            del os.environ[name]
+        else:
+            return
+        self._undo.append((_restore_env, (name, oldvalue)))
+        if _watched:
+            _bump(os.environ, name)
+
+    def chdir(
+        self, dirpath: str | bytes | os.PathLike[str] | os.PathLike[bytes]
+    ) -> None:
+        """Change the current working directory, as with `dirchanged()`"""
+        olddir = os.getcwd()
+        os.chdir(dirpath)
+        self._undo.append((os.chdir, (olddir,)))
+
+    def append(
+        self, lst: MutableSequence[Any], value: Any, prepend: bool = False
+    ) -> None:
+        """Add a value to a sequence, as with `additem()`"""
+        self.enter(additem(lst, value, prepend))
+
+    def enter(self, cm: Any) -> Any:
+        """
+        Enter an arbitrary context manager, arranging for it to be exited when
+        the undo log is replayed, and return the result of its ``__enter__``
+        method
+        """
+        r = cm.__enter__()
+        self._undo.append((cm.__exit__, (None, None, None)))
+        return r
+
+    def restore(self) -> None:
+        """Undo all changes made so far, most recent first"""
+        undo = self._undo
+        error: BaseException | None = None
+        while undo:
+            func, args = undo.pop()
+            # Keep replaying after an error; the first error is re-raised once
+            # the log is empty.
+            try:
+                func(*args)
+            except BaseException as e:  # noqa: B036
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+
+def _restore_attr(obj: Any, name: str, oldvalue: Any) -> None:
+    if oldvalue is not _UNSET:
+        setattr(obj, name, oldvalue)
+    else:
+        with suppress(AttributeError):
+            delattr(obj, name)
+    if _watched:
+        _bump(obj, name)
+
+
+def _restore_item(d: MutableMapping[Any, Any], key: Any, oldvalue: Any) -> None:
+    if oldvalue is not _UNSET:
+        d[key] = oldvalue
+    else:
+        with suppress(KeyError):
+            del d[key]
+    if _watched:
+        _bump(d, key)
+
+
+def _restore_env(name: str, oldvalue: str | None) -> None:
+    if oldvalue is not None:
+        os.environ[name] = oldvalue
+    else:
+        with suppress(KeyError):
+            del os.environ[name]
+    if _watched:
+        _bump(os.environ, name)
+
+
+class OpenClosable:
+    """
+    A base class for creating simple reentrant_ context managers.
+    `OpenClosable` defines ``__enter__`` and ``__exit__`` methods that keep
+    track of the number of nested ``with`` statements in effect and call the
+    instance's ``open()`` and ``close()`` methods when entering & exiting the
+    outermost ``with``.
+
+    Subclasses should override ``open()`` and/or ``close()`` with the desired
+    code to run on entering & exiting the outermost ``with``; the default
+    ``open()`` and ``close()`` methods defined by `OpenClosable` do nothing.
+
+    .. _reentrant: https://docs.python.org/3/library/contextlib.html
+                   #reentrant-cms
+    """
+
+    __depth: int
+
+    def __enter__(self: OC) -> OC:
+        try:
+            self.__depth += 1
+        except AttributeError:
+            self.__depth = 1
+        if self.__depth == 1:
+            if _sinks:
+                _timed_call(self, "open")
+            else:
+                self.open()
+        return self
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self.__depth -= 1
+        if self.__depth == 0:
+            if _sinks:
+                _timed_call(self, "close")
+            else:
+                self.close()
+
+    def open(self) -> None:  # noqa: A003
+        ...
+
+    def close(self) -> None: ...
+
+
+class LazyOpenClosable(OpenClosable):
+    """
+    .. versionadded:: 0.7.0
+
+    A variant of `OpenClosable` that does not call ``open()`` on entering the
+    outermost ``with``.  Instead, code inside the ``with`` calls
+    `ensure_open()` before using the resource, which calls ``open()`` the
+    first time it is called within the outermost ``with``.  On exiting the
+    outermost ``with``, ``close()`` is called only if ``open()`` was, so a
+    ``with`` block that never calls `ensure_open()` does not touch the
+    resource at all.
+
+    Like `OpenClosable`, this class is not thread-safe.
+    """
+
+    __depth: int = 0
+    __is_open: bool = False
+
+    def __enter__(self: ZOC) -> ZOC:
+        self.__depth += 1
+        return self
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self.__depth -= 1
+        if self.__depth == 0 and self.__is_open:
+            self.__is_open = False
+            if _sinks:
+                _timed_call(self, "close")
+            else:
+                self.close()
+
+    def ensure_open(self: ZOC) -> ZOC:
+        """
+        Call ``open()`` if it has not yet been called within the current
+        outermost ``with``, and return the instance.  Raises `RuntimeError`
+        if called outside of a ``with``.
+        """
+        if not self.__is_open:
+            if self.__depth == 0:
+                raise RuntimeError(
+                    "ensure_open() called outside of a with block"
+                )
+            if _sinks:
+                _timed_call(self, "open")
+            else:
+                self.open()
+            self.__is_open = True
+        return self
+
+    @property
+    def is_open(self) -> bool:
+        """Whether ``open()`` has been called within the current ``with``"""
+        return self.__is_open
+
+
+class ThreadSafeOpenClosable(OpenClosable):
+    """
+    .. versionadded:: 0.7.0
+
+    A variant of `OpenClosable` that can be entered & exited concurrently from
+    multiple threads.  The nesting depth is guarded by a lock that is also
+    held while ``open()`` and ``close()`` run, so if multiple threads enter an
+    instance at once, ``open()`` is only called once, and the other threads
+    wait for it to finish before entering their ``with`` bodies.  Likewise,
+    ``close()`` is not called while any thread is still inside a ``with`` for
+    the instance.  ``open()`` and ``close()`` must not themselves enter the
+    instance.
+
+    If ``open()`` raises an exception, the instance is left closed, and the
+    next entry will call ``open()`` again.
+
+    The lock is created in ``__new__``, so subclasses do not need to call
+    ``super().__init__()``.
+    """
+
+    __depth: int
+    __lock: threading.Lock
+
+    def __new__(cls, *_args: Any, **_kwargs: Any) -> ThreadSafeOpenClosable:
+        self = super().__new__(cls)
+        self.__depth = 0
+        self.__lock = threading.Lock()
+        return self
+
+    def __enter__(self: TOC) -> TOC:
+        lock = self.__lock
+        lock.acquire()
+        try:
+            if self.__depth == 0:
+                if _sinks:
+                    _timed_call(self, "open")
+                else:
+                    self.open()
+            self.__depth += 1
+        finally:
+            lock.release()
+        return self
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        lock = self.__lock
+        lock.acquire()
+        try:
+            self.__depth -= 1
+            if self.__depth == 0:
+                if _sinks:
+                    _timed_call(self, "close")
+                else:
+                    self.close()
+        finally:
+            lock.release()
+
+
+class LingeringOpenClosable(OpenClosable):
+    """
+    .. versionadded:: 0.7.0
+
+    A thread-safe variant of `OpenClosable` that can keep its resource open
+    for a while after the outermost ``with`` exits, so that entering the
+    instance again soon afterwards does not have to call ``open()`` again.
+
+    The number of seconds to wait before calling ``close()`` is given by the
+    ``linger`` attribute, which subclasses or instances can set; the default
+    of 0 closes immediately, like `OpenClosable`.  When the outermost ``with``
+    exits, a single `threading.Timer` is started for the idle period; if the
+    instance is re-entered in the meantime, it is reused as-is, and the timer,
+    on firing, sees that the instance is no longer idle (or was only idle for
+    part of the period) and either does nothing or waits for the remainder.
+    Note that this means that ``close()`` may be called from the timer's
+    thread.  The timer thread is a daemon thread, so a lingering resource is
+    not closed when the interpreter exits unless `close_now()` is called.
+
+    As with `ThreadSafeOpenClosable`, a lock guards the instance's state and
+    is held while ``open()`` and ``close()`` run, and ``open()`` and
+    ``close()`` must not themselves enter the instance.
+
+    The read-only properties ``opens``, ``closes``, and ``avoided_opens`` count
+    the calls to ``open()`` & ``close()`` and the entries that reused a
+    lingering resource instead of calling ``open()``.
+    """
+
+    #: Number of seconds to keep the resource open after the outermost
+    #: ``with`` exits
+    linger: float = 0
+
+    __depth: int
+    __lock: threading.Lock
+    __is_open: bool
+    __idle_since: float
+    __timer: threading.Timer | None
+    __opens: int
+    __closes: int
+    __avoided_opens: int
+
+    def __new__(cls, *_args: Any, **_kwargs: Any) -> LingeringOpenClosable:
+        self = super().__new__(cls)
+        self.__depth = 0
+        self.__lock = threading.Lock()
+        self.__is_open = False
+        self.__idle_since = 0.0
+        self.__timer = None
+        self.__opens = 0
+        self.__closes = 0
+        self.__avoided_opens = 0
+        return self
+
+    @property
+    def opens(self) -> int:
+        """The number of times ``open()`` has been called"""
+        return self.__opens
+
+    @property
+    def closes(self) -> int:
+        """The number of times ``close()`` has been called"""
+        return self.__closes
+
+    @property
+    def avoided_opens(self) -> int:
+        """
+        The number of outermost entries that reused a lingering resource
+        instead of calling ``open()``
+        """
+        return self.__avoided_opens
+
+    def __enter__(self: LOC) -> LOC:
+        lock = self.__lock
+        lock.acquire()
+        try:
+            if self.__depth == 0:
+                if self.__is_open:
+                    self.__avoided_opens += 1
+                else:
+                    if _sinks:
+                        _timed_call(self, "open")
+                    else:
+                        self.open()
+                    self.__is_open = True
+                    self.__opens += 1
+            self.__depth += 1
+        finally:
+            lock.release()
+        return self
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        lock = self.__lock
+        lock.acquire()
+        try:
+            self.__depth -= 1
+            if self.__depth == 0:
+                if self.linger <= 0:
+                    self.__close()
+                else:
+                    self.__idle_since = time.monotonic()
+                    if self.__timer is None:
+                        self.__start_timer(self.linger)
+        finally:
+            lock.release()
+
+    def close_now(self) -> None:
+        """
+        If the resource is lingering (i.e., open but not currently entered),
+        close it immediately
+        """
+        with self.__lock:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            if self.__depth == 0 and self.__is_open:
+                self.__close()
+
+    def __start_timer(self, delay: float) -> None:
+        self.__timer = threading.Timer(delay, self.__reap)
+        self.__timer.daemon = True
+        self.__timer.start()
+
+    def __reap(self) -> None:
+        with self.__lock:
+            if threading.current_thread() is not self.__timer:
+                # Cancelled by `close_now()` after the timer fired
+                return
+            self.__timer = None
+            if self.__depth > 0 or not self.__is_open:
+                # The next exit will start a new timer
+                return
+            remaining = self.__idle_since + self.linger - time.monotonic()
+            if remaining > 0:
+                self.__start_timer(remaining)
+            else:
+                self.__close()
+
+    def __close(self) -> None:
+        self.__is_open = False
+        self.__closes += 1
+        if _sinks:
+            _timed_call(self, "close")
+        else:
+            self.close()
+
+
+class AsyncOpenClosable:
+    """
+    .. versionadded:: 0.7.0
+
+    An asynchronous counterpart to `OpenClosable` for use with ``async with``.
+    `AsyncOpenClosable` defines ``__aenter__`` and ``__aexit__`` methods that
+    keep track of the number of nested ``async with`` statements in effect and
+    await the instance's ``open()`` and ``close()`` coroutine methods when
+    entering & exiting the outermost ``async with``.
+
+    Entering & exiting are serialized with an `asyncio.Lock`, so if multiple
+    tasks enter an instance at once, ``open()`` is only awaited once, and the
+    other tasks wait for it to finish before entering their ``async with``
+    bodies.  Likewise, ``close()`` is not awaited while any task is still
+    inside an ``async with`` for the instance.  ``open()`` and ``close()``
+    must not themselves enter the instance.
+    """
+
+    __depth: int
+    __lock: asyncio.Lock
+
+    def __get_lock(self) -> asyncio.Lock:
+        try:
+            return self.__lock
+        except AttributeError:
+            self.__lock = asyncio.Lock()
+            return self.__lock
+
+    async def __aenter__(self: AOC) -> AOC:
+        async with self.__get_lock():
+            depth = getattr(self, "_AsyncOpenClosable__depth", 0)
+            if depth == 0:
+                await self.open()
+            self.__depth = depth + 1
+        return self
+
+    async def __aexit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        async with self.__get_lock():
+            self.__depth -= 1
+            if self.__depth == 0:
+                await self.close()
+
+    async def open(self) -> None:  # noqa: A003
+        ...
+
+    async def close(self) -> None: ...
+
+
+class DirFDCache(OpenClosable):
+    """
+    .. versionadded:: 0.7.0
+
+    A least-recently-used cache of open file descriptors for directories, for
+    use with the ``fdcache`` argument of `dirchanged()`.  At most ``maxsize``
+    file descriptors are kept open at once; when a new directory would exceed
+    this limit, the descriptor for the least recently used directory is
+    closed.
+
+    Directories are cached by the path as given, which should be absolute.  A
+    cached descriptor continues to refer to the same directory even if it is
+    later renamed or replaced, so call `clear()` if that matters.
+
+    `DirFDCache` is an `OpenClosable`; on exiting the outermost ``with`` block
+    for an instance, all of its file descriptors are closed.  Descriptors can
+    also be closed at any time by calling `clear()`.
+
+    This class requires `os.fchdir()`, which is not available on Windows.
+    """
+
+    def __init__(self, maxsize: int = 32) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._fds: OrderedDict[str | bytes, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._fds)
+
+    def get(
+        self, dirpath: str | bytes | os.PathLike[str] | os.PathLike[bytes]
+    ) -> int:
+        """
+        Return an open file descriptor for the directory at ``dirpath``,
+        opening the directory if it is not already in the cache
+        """
+        key = os.fspath(dirpath)
+        fds = self._fds
+        try:
+            fd = fds[key]
+        except KeyError:
+            fd = fds[key] = os.open(key, _DIRFD_FLAGS)
+            if len(fds) > self.maxsize:
+                os.close(fds.popitem(last=False)[1])
+        else:
+            fds.move_to_end(key)
+        return fd
+
+    def clear(self) -> None:
+        """Close all cached file descriptors"""
+        fds = self._fds
+        while fds:
+            os.close(fds.popitem()[1])
+
+    def close(self) -> None:
+        self.clear()
+
+
+class OpenClosablePool(Generic[K, OC]):
+    """
+    .. versionadded:: 0.7.0
+
+    A registry of shared `OpenClosable` instances, one per key, with
+    least-recently-used eviction of idle instances.
+
+    ``get(key)`` returns the instance for ``key``, creating it by calling
+    ``factory(key)`` if there is none; the instance is then used in a ``with``
+    statement as normal, so that multiple users of the same key share one
+    instance and its nesting depth.
+
+    Whenever `get()` adds a new instance, instances that are not currently
+    entered are evicted, least recently used first, until there are at most
+    ``maxsize`` instances (if ``maxsize`` is not `None`) and the total weight
+    of the instances is at most ``maxweight`` (if given), where the weight of
+    an instance is ``weigher(instance)`` (computed once, when the instance is
+    created).  Instances that are currently entered are never evicted, so the
+    limits may be exceeded while they are in use.  A `LingeringOpenClosable`
+    that is evicted while its resource is lingering has its `close_now()`
+    method called; other idle instances have already been closed.
+
+    Instances should be entered right after being retrieved, as an instance
+    that has been retrieved but not yet entered can be evicted by other calls
+    to `get()`.  Such an instance still works, but it is no longer shared.
+
+    `get()` and `clear()` are thread-safe, but the pooled instances
+    themselves must be `ThreadSafeOpenClosable` or `LingeringOpenClosable`
+    instances if they will be entered from multiple threads.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[K], OC],
+        maxsize: int | None = 128,
+        weigher: Callable[[OC], float] | None = None,
+        maxweight: float | None = None,
+    ) -> None:
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        if (weigher is None) != (maxweight is None):
+            raise ValueError("weigher and maxweight must be given together")
+        self.factory = factory
+        self.maxsize = maxsize
+        self.weigher = weigher
+        self.maxweight = maxweight
+        self._instances: OrderedDict[K, tuple[OC, float]] = OrderedDict()
+        self._weight: float = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._instances
+
+    @property
+    def weight(self) -> float:
+        """The total weight of the pooled instances"""
+        return self._weight
+
+    def get(self, key: K) -> OC:
+        """
+        Return the instance for ``key``, creating it if there is none, and
+        evict idle instances if the pool's limits are exceeded
+        """
+        with self._lock:
+            instances = self._instances
+            try:
+                oc, _ = instances[key]
+            except KeyError:
+                pass
+            else:
+                instances.move_to_end(key)
+                return oc
+            oc = self.factory(key)
+            w = self.weigher(oc) if self.weigher is not None else 0
+            instances[key] = (oc, w)
+            self._weight += w
+            victims = self._evict(key)
+        for v in victims:
+            _close_idle(v)
+        return oc
+
+    def clear(self) -> None:
+        """Evict all instances that are not currently entered"""
+        with self._lock:
+            victims = self._evict(_UNSET, everything=True)
+        for v in victims:
+            _close_idle(v)
+
+    def _evict(self, keep: Any, everything: bool = False) -> list[OC]:
+        instances = self._instances
+        size = len(instances)
+        weight = self._weight
+        doomed = []
+        for key, (oc, w) in instances.items():
+            if not everything and not self._over_limit(size, weight):
+                break
+            if key is not keep and not _oc_depth(oc):
+                doomed.append(key)
+                size -= 1
+                weight -= w
+        victims = []
+        for key in doomed:
+            victims.append(instances.pop(key)[0])
+        self._weight = weight
+        return victims
+
+    def _over_limit(self, size: int, weight: float) -> bool:
+        if self.maxsize is not None and size > self.maxsize:
+            return True
+        return self.maxweight is not None and weight > self.maxweight
+
+
+#: The attributes in which `OpenClosable` and its subclasses in this module
+#: store the number of ``with`` statements in effect (their mangled
+#: ``__depth``); only the one belonging to the class whose ``__enter__`` runs
+#: is ever nonzero
+_OC_DEPTH_ATTRS = (
+    "_OpenClosable__depth",
+    "_LazyOpenClosable__depth",
+    "_ThreadSafeOpenClosable__depth",
+    "_LingeringOpenClosable__depth",
+)
+
+
+def _oc_depth(oc: OpenClosable) -> int:
+    """Return the number of ``with`` statements currently in effect for ``oc``"""
+    depth = 0
+    for attr in _OC_DEPTH_ATTRS:
+        depth += getattr(oc, attr, 0)
+    return depth
+
+
+def _close_idle(oc: OpenClosable) -> None:
+    if isinstance(oc, LingeringOpenClosable):
+        oc.close_now()
+
+
+class InstrumentEvent(NamedTuple):
+    """
+    .. versionadded:: 0.7.0
+
+    A measurement passed to the sinks registered with `instrumented()`
+    """
+
+    #: The name of the type of the context manager or `OpenClosable` measured
+    type: str
+    #: What was measured: ``"enter"``, ``"exit"``, ``"snapshot"`` (the
+    #: copying done by `attrrollback()` and `itemrollback()` on entry),
+    #: ``"open"``, or ``"close"``
+    phase: str
+    #: The time taken, in nanoseconds
+    ns: int
+    #: For ``"snapshot"`` events, the approximate size in bytes of the copy
+    #: made (0 if no copy was made); otherwise, `None`
+    nbytes: int | None = None
+    #: The exception raised, if any; an ``"exit"`` event with an exception is
+    #: a failed restore
+    error: BaseException | None = None
+
+
+class InstrumentHistogram:
+    """
+    .. versionadded:: 0.7.0
+
+    An in-memory sink for `instrumented()` that aggregates events by type &
+    phase.  For each pair, it records the number of events, the number that
+    raised an exception, the total, minimum, & maximum durations, the total
+    snapshot bytes, and a histogram of durations in power-of-two nanosecond
+    buckets.  It is thread-safe.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[tuple[str, str], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: InstrumentEvent) -> None:
+        with self._lock:
+            try:
+                st = self._stats[event.type, event.phase]
+            except KeyError:
+                st = self._stats[event.type, event.phase] = {
+                    "count": 0,
+                    "errors": 0,
+                    "total_ns": 0,
+                    "min_ns": event.ns,
+                    "max_ns": event.ns,
+                    "nbytes": 0,
+                    "buckets": {},
+                }
+            st["count"] += 1
+            if event.error is not None:
+                st["errors"] += 1
+            st["total_ns"] += event.ns
+            st["min_ns"] = min(st["min_ns"], event.ns)
+            st["max_ns"] = max(st["max_ns"], event.ns)
+            if event.nbytes is not None:
+                st["nbytes"] += event.nbytes
+            # Bucket n holds durations in [2**(n-1), 2**n)
+            b = event.ns.bit_length()
+            st["buckets"][b] = st["buckets"].get(b, 0) + 1
+
+    def as_dict(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Return the statistics as a `dict` mapping type names to dicts mapping
+        phases to statistics.  Histogram buckets are given as a `dict`
+        mapping the (exclusive) upper bound of each bucket in nanoseconds to
+        the number of events in it.
+        """
+        data: dict[str, dict[str, dict[str, Any]]] = {}
+        with self._lock:
+            for (typename, phase), st in sorted(self._stats.items()):
+                data.setdefault(typename, {})[phase] = {
+                    **st,
+                    "buckets": {
+                        1 << b: n for b, n in sorted(st["buckets"].items())
+                    },
+                }
+        return data
+
+    def dump(self, fp: IO[str]) -> None:
+        """Write the statistics from `as_dict()` to ``fp`` as JSON"""
+        json.dump(self.as_dict(), fp, indent=4)
+
+    def clear(self) -> None:
+        """Discard all recorded statistics"""
+        with self._lock:
+            self._stats.clear()
+
+
+#: The sinks registered with currently-active `instrumented()` calls in all
+#: threads & tasks; instrumentation is installed while this is nonempty
+_sinks: list[Callable[[InstrumentEvent], Any]] = []
+
+#: The sinks registered with `instrumented()` calls active in the current
+#: context, which are the only ones that events in the context are passed to
+_context_sinks: ContextVar[tuple[Callable[[InstrumentEvent], Any], ...]] = (
+    ContextVar("_context_sinks", default=())
+)
+
+#: The original methods & functions replaced while instrumentation is active,
+#: as (owner namespace, attribute name, original value, wrapper) tuples
+_uninstrumented: list[tuple[Any, str, Any, Any]] = []
+
+_instrument_lock = threading.Lock()
+
+#: Per-thread record of the objects whose instrumented methods are currently
+#: running, used to avoid recording calls made via `super()` and to attribute
+#: snapshots to the context manager taking them
+_instrument_local = threading.local()
+
+
+class instrumented(_ContextManager):
+    """
+    .. versionadded:: 0.7.0
+
+    Record timings for the context managers and `OpenClosable` classes in
+    this module.
+
+    ``instrumented(sink)`` returns a context manager that, while active,
+    calls ``sink(event)`` with an `InstrumentEvent` for each ``__enter__``
+    and ``__exit__`` of the context managers in this module and of
+    `OpenClosable` & its subclasses, for each snapshot taken by
+    `attrrollback()` and `itemrollback()`, and for each call of the
+    ``open()`` and ``close()`` methods of `OpenClosable` subclasses made by
+    the methods of `OpenClosable` & its subclasses in this module.  ``sink``
+    may be any callable, such as an `InstrumentHistogram`.
+
+    Only events occurring in the current thread or `asyncio` task (and tasks
+    created from it while the block is active) are passed to ``sink``.
+    Multiple `instrumented()` blocks may be active at once, in which case
+    each event is passed to the sinks of all of the blocks active in its
+    context.  Exceptions raised by a sink are reported via
+    `sys.unraisablehook` rather than propagated.
+
+    Instrumentation works by replacing the ``__enter__`` and ``__exit__``
+    methods of the classes in this module with timing wrappers while any
+    `instrumented()` block is active, and putting the originals back
+    afterwards (unless the method has since been replaced by something
+    else).  Classes defined outside of this module are never modified, so an
+    `OpenClosable` subclass that overrides ``__enter__`` or ``__exit__``
+    itself is only timed to the extent that it calls the base class's
+    methods.  Outside of an `instrumented()` block, the only overhead is a
+    check when `OpenClosable` instances call ``open()`` or ``close()``.
+    """
+
+    __slots__ = ("_sink", "_token")
+
+    def __init__(self, sink: Callable[[InstrumentEvent], Any]) -> None:
+        self._sink = sink
+        self._entered = False
+
+    def __enter__(self) -> None:
+        if self._entered:
+            raise _reentry_error(self)
+        with _instrument_lock:
+            if not _sinks:
+                _install_instrumentation()
+            _sinks.append(self._sink)
+        self._token = _context_sinks.set((*_context_sinks.get(), self._sink))
+        self._entered = True
+
+    def __exit__(
+        self,
+        _exc_type: type[BaseException] | None,
+        _exc_val: BaseException | None,
+        _exc_tb: TracebackType | None,
+    ) -> None:
+        self._entered = False
+        _context_sinks.reset(self._token)
+        with _instrument_lock:
+            _sinks.remove(self._sink)
+            if not _sinks:
+                while _uninstrumented:
+                    owner, name, orig, wrapper = _uninstrumented.pop()
+                    if vars(owner).get(name) is wrapper:
+                        setattr(owner, name, orig)
+
+
+class _UnraisableHookArgs:
+    """
+    A stand-in for `sys.UnraisableHookArgs`, whose type is not exposed to
+    Python code
+    """
+
+    __slots__ = ("exc_type", "exc_value", "exc_traceback", "err_msg", "object")
+
+    def __init__(self, exc: BaseException, err_msg: str, obj: Any) -> None:
+        self.exc_type: type[BaseException] = type(exc)
+        self.exc_value: BaseException | None = exc
+        self.exc_traceback: TracebackType | None = exc.__traceback__
+        self.err_msg: str | None = err_msg
+        self.object: Any = obj
+
+
+def _report_unraisable(exc: BaseException, err_msg: str, obj: Any) -> None:
+    """
+    Report an exception raised by a callback that cannot be propagated to
+    `sys.unraisablehook`
+    """
+    hook = sys.unraisablehook
+    if hook is sys.__unraisablehook__:
+        # The default hook only accepts the internal `UnraisableHookArgs` type,
+        # which cannot be created from Python, so mimic its output instead.
+        print(f"{err_msg}: {obj!r}", file=sys.stderr)
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+    else:
+        hook(_UnraisableHookArgs(exc, err_msg, obj))
+
+
+def _emit(event: InstrumentEvent) -> None:
+    for sink in _context_sinks.get():
+        try:
+            sink(event)
+        except Exception as e:
+            _report_unraisable(e, "Exception ignored in instrumented() sink", sink)
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    sub: type
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _subclasses(sub)
+
+
+def _install_instrumentation() -> None:
+    g = globals()
+    orig = g["_snapshot"]
+    wrapper = g["_snapshot"] = _timed_snapshot(orig)
+    _uninstrumented.append((sys.modules[__name__], "_snapshot", orig, wrapper))
+    for base in (_ContextManager, OpenClosable):
+        for cls in [base, *_subclasses(base)]:
+            # Leave classes defined by users alone
+            if cls is instrumented or cls.__module__ != __name__:
+                continue
+            for name in ("__enter__", "__exit__"):
+                if name in cls.__dict__:
+                    orig = cls.__dict__[name]
+                    wrapper = _timed_method(orig, name.strip("_"))
+                    _uninstrumented.append((cls, name, orig, wrapper))
+                    setattr(cls, name, wrapper)
+
+
+def _timed_method(func: Callable[..., Any], phase: str) -> Callable[..., Any]:
+    @wraps(func)
+    def wrapper(self: Any, *args: Any) -> Any:
+        if not _context_sinks.get():
+            return func(self, *args)
+        try:
+            active = _instrument_local.active
+        except AttributeError:
+            active = _instrument_local.active = []
+        for obj in active:
+            if obj is self:
+                # Called via `super()` from another instrumented method
+                return func(self, *args)
+        active.append(self)
+        start = time.perf_counter_ns()
+        try:
+            r = func(self, *args)
+        except BaseException as e:
+            elapsed = time.perf_counter_ns() - start
+            _emit(InstrumentEvent(type(self).__name__, phase, elapsed, error=e))
+            raise
+        else:
+            elapsed = time.perf_counter_ns() - start
+            _emit(InstrumentEvent(type(self).__name__, phase, elapsed))
+            return r
+        finally:
+            active.pop()
+
+    return wrapper
+
+
+def _timed_call(oc: Any, phase: str) -> None:
+    """
+    Call ``oc.open()`` or ``oc.close()`` (as selected by ``phase``), timing it
+    if instrumentation is active in the current context
+    """
+    method = getattr(oc, phase)
+    if not _context_sinks.get():
+        method()
+        return
+    start = time.perf_counter_ns()
+    try:
+        method()
+    except BaseException as e:
+        elapsed = time.perf_counter_ns() - start
+        _emit(InstrumentEvent(type(oc).__name__, phase, elapsed, error=e))
+        raise
+    else:
+        elapsed = time.perf_counter_ns() - start
+        _emit(InstrumentEvent(type(oc).__name__, phase, elapsed))
+
+
+def _timed_snapshot(func: Callable[..., Any]) -> Callable[..., Any]:
+    @wraps(func)
+    def wrapper(value: Any, *args: Any) -> tuple[Any, Any]:
+        if not _context_sinks.get():
+            saved, proxy = func(value, *args)
+            return (saved, proxy)
+        active = getattr(_instrument_local, "active", None)
+        typename = type(active[-1]).__name__ if active else "_snapshot"
+        start = time.perf_counter_ns()
+        saved, proxy = func(value, *args)
+        elapsed = time.perf_counter_ns() - start
+        nbytes = 0 if saved is value else _sizeof(saved)
+        _emit(InstrumentEvent(typename, "snapshot", elapsed, nbytes))
+        return (saved, proxy)
+
+    return wrapper
+
+
+def _sizeof(value: Any) -> int:
+    """
+    Estimate the memory used by ``value`` and (for the builtin container
+    types) everything in it
+    """
+    seen: set[int] = set()
+    size = 0
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        if id(v) in seen:
+            continue
+        seen.add(id(v))
+        size += sys.getsizeof(v)
+        if isinstance(v, dict):
+            stack.extend(v.keys())
+            stack.extend(v.values())
+        elif isinstance(v, (list, tuple, set, frozenset)):
+            stack.extend(v)
+    return size
+
+
+class TraceRecord(NamedTuple):
+    """
+    .. versionadded:: 0.7.0
+
+    A record of a set or restore performed by a context manager, as recorded
+    by `MutationTrace`
+    """
+
+    #: The time of the operation, as returned by `time.time()`
+    time: float
+    #: ``"set"`` or ``"restore"``
+    action: str
+    #: The name of the context manager's type
+    manager: str
+    #: The ID of the context manager, for matching sets with restores
+    manager_id: int
+    #: A description of the object modified
+    target: str
+    #: The repr of the attribute name, mapping key, or environment variable
+    #: name(s) modified, or `None` for `dirchanged()` and `additem()`
+    key: str | None
+    #: The repr of the value before the operation (``"<unset>"`` if unset)
+    old: str
+    #: The repr of the value after the operation (``"<unset>"`` if unset)
+    new: str
+    #: The name of the thread that performed the operation
+    thread: str
+    #: The name of the `asyncio` task that performed the operation, if any
+    task: str | None
+
+    def __str__(self) -> str:
+        where = self.thread
+        if self.task is not None:
+            where += f"/{self.task}"
+        key = "" if self.key is None else f"[{self.key}]"
+        return (
+            f"{self.time:.6f} {where} {self.manager}#{self.manager_id:x}"
+            f" {self.action} {self.target}{key}: {self.old} -> {self.new}"
+        )
+
+
+class MutationTrace(OpenClosable):
+    """
+    .. versionadded:: 0.7.0
+
+    A bounded log of the changes made by `attrset()`, `itemset()`,
+    `envset()`, `dirchanged()`, and `additem()` (including `syspathadd()`),
+    for tracking down patches that are never restored.
+
+    While a `MutationTrace` is open (i.e., inside a ``with`` block for it, or
+    between calls to its ``open()`` and ``close()`` methods), each time one of
+    the above context managers applies its change on entry or restores on
+    exit, a `TraceRecord` is appended to a ring buffer holding the most recent
+    ``maxlen`` records.  `unrestored()` returns the records for sets that have
+    no matching restore in the buffer.
+
+    By default, old & new values are recorded as abbreviated reprs produced
+    with `reprlib`.  If ``reprs`` is false, only the values' type names are
+    recorded, which is cheaper and avoids storing any data from the values
+    themselves.
+
+    When no `MutationTrace` is open, the context managers incur only a single
+    global-variable check per entry & exit.
+    """
+
+    def __init__(self, maxlen: int = 1000, reprs: bool = True) -> None:
+        self.reprs = reprs
+        self._records: deque[TraceRecord] = deque(maxlen=maxlen)
+
+    def open(self) -> None:  # noqa: A003
+        _tracers.append(self)
+
+    def close(self) -> None:
+        _tracers.remove(self)
+
+    def records(self) -> list[TraceRecord]:
+        """Return the recorded operations, oldest first"""
+        return list(self._records)
+
+    def unrestored(self) -> list[TraceRecord]:
+        """
+        Return the records of sets that are not followed by a restore by the
+        same context manager
+        """
+        pending: dict[int, TraceRecord] = {}
+        for r in list(self._records):
+            if r.action == "set":
+                pending[r.manager_id] = r
+            else:
+                pending.pop(r.manager_id, None)
+        return list(pending.values())
+
+    def dump(self, fp: IO[str]) -> None:
+        """Write the records to ``fp`` as JSON Lines"""
+        for r in list(self._records):
+            fp.write(json.dumps(r._asdict()) + "\n")
+
+    def clear(self) -> None:
+        """Discard all records"""
+        self._records.clear()
+
+    def _describe(self, value: Any) -> str:
+        if value is _UNSET:
+            return "<unset>"
+        elif self.reprs:
+            return _trace_repr.repr(value)
+        else:
+            return type(value).__name__
+
+
+#: The `reprlib.Repr` used by `MutationTrace`, with larger limits than the
+#: default so that file paths and the like are shown in full
+_trace_repr = reprlib.Repr()
+_trace_repr.maxstring = 160
+_trace_repr.maxother = 160
+
+
+def _trace(cm: _ContextManager, action: str) -> None:
+    target, key, old, new = cm._trace_values(action == "restore")
+    if target is os.environ:
+        tdesc = "os.environ"
+    elif target is sys.path:
+        tdesc = "sys.path"
+    elif isinstance(target, str):
+        tdesc = target
+    else:
+        tdesc = f"<{type(target).__name__} object at {id(target):#x}>"
+    # `asyncio.current_task()` raises an exception when no event loop is
+    # running, which is comparatively expensive to catch.
+    loop = asyncio._get_running_loop()
+    task = asyncio.current_task(loop) if loop is not None else None
+    now = time.time()
+    thread = threading.current_thread().name
+    if key is None:
+        keyrepr = None
+    elif type(key) is str and len(key) <= _trace_repr.maxstring:
+        keyrepr = repr(key)
+    else:
+        keyrepr = _trace_repr.repr(key)
+    for tracer in list(_tracers):
+        tracer._records.append(
+            TraceRecord(
+                now,
+                action,
+                type(cm).__name__,
+                id(cm),
+                tdesc,
+                keyrepr,
+                tracer._describe(old),
+                tracer._describe(new),
+                thread,
+                None if task is None else task.get_name(),
+            )
+        )
+
+
+class _Watch:
+    __slots__ = ("target", "generation", "callbacks")
+
+    def __init__(self, target: Any) -> None:
+        #: A reference to the target, keeping its ID from being reused
+        self.target = target
+        self.generation = next(_generations)
+        #: Replaced rather than mutated, so that it can be iterated over
+        #: without copying or locking
+        self.callbacks: tuple[Callable[[Any, Any], Any], ...] = ()
+
+
+#: The source of new generation numbers, which are unique across all targets
+#: so that a number is never reused after a target is unwatched & rewatched
+_generations = count(1)
+
+
+def _watch(target: Any) -> _Watch:
+    w = _watched.get(id(target))
+    if w is None:
+        w = _watched.setdefault(id(target), _Watch(target))
+    return w
+
+
+def _bump(target: Any, key: Any) -> None:
+    w = _watched.get(id(target))
+    if w is not None:
+        w.generation = next(_generations)
+        for callback in w.callbacks:
+            try:
+                callback(target, key)
+            except Exception as e:
+                _report_unraisable(
+                    e, "Exception ignored in subscribe() callback", callback
+                )
+
+
+def generation(target: Any) -> int:
+    """
+    .. versionadded:: 0.7.0
+
+    Return the current generation number of ``target`` (an object, a mapping,
+    or `os.environ`) for detecting whether it has been changed by the context
+    managers in this module.
+
+    The generation number changes every time `attrset()`, `attrdel()`,
+    `attrrollback()`, `attrsupdate()`, `itemset()`, `itemdel()`,
+    `itemrollback()`, `itemsupdate()`, `envset()`, `envdel()`,
+    `envrollback()`, `environrollback()`, or a `Patcher` sets or restores
+    something on ``target`` (with the environment variable functions acting on
+    `os.environ`), so a cache of values derived from ``target`` can store the
+    generation number it was computed at and recompute only when the number
+    differs.  Changes made by other means are not detected.
+
+    Generation numbers are only tracked for targets that are being watched.
+    The first call to `generation()` or `subscribe()` for a given target starts
+    watching it, and it remains watched (and referenced by this module) until
+    `unwatch()` is called on it.  While no targets are watched, the context
+    managers skip the bookkeeping entirely.
+    """
+    return _watch(target).generation
+
+
+def subscribe(target: Any, callback: Callable[[Any, Any], Any]) -> Callable[[], None]:
+    """
+    .. versionadded:: 0.7.0
+
+    Arrange for ``callback(target, key)`` to be called each time the
+    generation number of ``target`` (see `generation()`) changes, where
+    ``key`` is the attribute name, mapping key, or environment variable name
+    that was set or restored.  ``target`` is watched if it is not already.
+
+    Callbacks are called synchronously, after the change, by the code that
+    made it, so they should be quick.  Exceptions raised by a callback are
+    reported via `sys.unraisablehook` rather than propagated, so that they
+    cannot interrupt the change.
+
+    Returns a function that unsubscribes ``callback`` when called.
+    """
+    w = _watch(target)
+    w.callbacks = (*w.callbacks, callback)
+
+    def unsubscribe() -> None:
+        callbacks = list(w.callbacks)
+        with suppress(ValueError):
+            callbacks.remove(callback)
+        w.callbacks = tuple(callbacks)
+
+    return unsubscribe
+
+
+def unwatch(target: Any) -> None:
+    """
+    .. versionadded:: 0.7.0
+
+    Stop watching ``target``, discarding its generation number & any
+    callbacks subscribed to it
+    """
+    w = _watched.get(id(target))
+    if w is not None and w.target is target:
+        del _watched[id(target)]
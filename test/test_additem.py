@@ -180,3 +180,65 @@ def test_additem_prepend_remove_append_same_error() -> None:
             lst.append(42)
             raise RuntimeError("Catch this!")
     assert lst == [1, 2, 3]
+
+
+class Counted:
+    eq_calls = 0
+
+    def __eq__(self, other: object) -> bool:
+        Counted.eq_calls += 1
+        return self is other
+
+    __hash__ = object.__hash__
+
+
+def test_additem_no_comparisons() -> None:
+    lst = [Counted() for _ in range(5)]
+    orig = list(lst)
+    value = Counted()
+    Counted.eq_calls = 0
+    with additem(lst, value):
+        assert lst == [*orig, value]
+        Counted.eq_calls = 0
+        extra = [Counted() for _ in range(5)]
+        lst.extend(extra)
+    assert Counted.eq_calls == 0
+    assert lst == [*orig, *extra]
+
+
+def test_additem_prepend_no_comparisons() -> None:
+    lst = [Counted() for _ in range(5)]
+    orig = list(lst)
+    value = Counted()
+    with additem(lst, value, prepend=True):
+        Counted.eq_calls = 0
+        lst.append(Counted())
+    assert Counted.eq_calls == 0
+    assert lst[:5] == orig
+
+
+def test_additem_moved() -> None:
+    lst = ["a", "b", "c"]
+    value = "x"
+    with additem(lst, value):
+        assert lst == ["a", "b", "c", "x"]
+        lst.reverse()
+    assert lst == ["c", "b", "a"]
+
+
+def test_additem_prepend_moved() -> None:
+    lst = ["a", "b", "c"]
+    value = "x"
+    with additem(lst, value, prepend=True):
+        assert lst == ["x", "a", "b", "c"]
+        lst.insert(0, "y")
+    assert lst == ["y", "a", "b", "c"]
+
+
+def test_additem_same_object_readded() -> None:
+    lst: list[str] = []
+    value = "x"
+    with additem(lst, value):
+        lst += ["y", value]
+    # The item at the original index is removed, not the last equal item
+    assert lst == ["y", "x"]
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from collections import UserList
+from collections.abc import MutableSequence
+from typing import Any
+import pytest
+from morecontext import additem, additems
+
+
+def test_additems() -> None:
+    lst = [1, 2, 3]
+    with additems(lst, [42, 23]):
+        assert lst == [1, 2, 3, 42, 23]
+    assert lst == [1, 2, 3]
+
+
+def test_additems_error() -> None:
+    lst = [1, 2, 3]
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with additems(lst, [42, 23]):
+            assert lst == [1, 2, 3, 42, 23]
+            raise RuntimeError("Catch this!")
+    assert lst == [1, 2, 3]
+
+
+def test_additems_prepend() -> None:
+    lst = [1, 2, 3]
+    with additems(lst, [42, 23], prepend=True):
+        assert lst == [42, 23, 1, 2, 3]
+    assert lst == [1, 2, 3]
+
+
+def test_additems_iterator() -> None:
+    lst = [1, 2, 3]
+    with additems(lst, iter([42, 23])):
+        assert lst == [1, 2, 3, 42, 23]
+    assert lst == [1, 2, 3]
+
+
+def test_additems_empty() -> None:
+    lst = [1, 2, 3]
+    with additems(lst, []):
+        assert lst == [1, 2, 3]
+    assert lst == [1, 2, 3]
+
+
+def test_additems_user_list() -> None:
+    lst = UserList([1, 2, 3])
+    with additems(lst, [42, 23], prepend=True):
+        assert lst == [42, 23, 1, 2, 3]
+    assert lst == [1, 2, 3]
+    with additems(lst, [42, 23]):
+        assert lst == [1, 2, 3, 42, 23]
+        lst.insert(0, 0)
+    assert lst == [0, 1, 2, 3]
+
+
+def _nested(
+    lst: MutableSequence[Any], values: list[Any], prepend: bool
+) -> list[additem[Any]]:
+    if prepend:
+        return [additem(lst, v, prepend=True) for v in reversed(values)]
+    else:
+        return [additem(lst, v) for v in values]
+
+
+MUTATIONS = [
+    lambda _lst: None,
+    lambda lst: lst.insert(0, 42),
+    lambda lst: lst.append(42),
+    lambda lst: lst.append(1),
+    lambda lst: lst.pop(),
+    lambda lst: lst.pop(0),
+    lambda lst: lst.reverse(),
+    lambda lst: lst.sort(key=repr),
+    lambda lst: lst.remove(23),
+    lambda lst: lst.extend([23, 42, 23]),
+    lambda lst: lst.clear(),
+]
+
+
+@pytest.mark.parametrize("prepend", [False, True])
+@pytest.mark.parametrize("values", [[42, 23, 42], [[42], 23, [42]]])
+@pytest.mark.parametrize("mutate", MUTATIONS)
+def test_additems_like_nested_additem(
+    prepend: bool, values: list[Any], mutate: Any
+) -> None:
+    lst = [1, 23, 2, 42, 3]
+    with additems(lst, values, prepend=prepend):
+        assert lst == (
+            [*values, 1, 23, 2, 42, 3] if prepend else [1, 23, 2, 42, 3, *values]
+        )
+        mutate(lst)
+    assert lst == _undo_nested(values, prepend, mutate)
+
+
+def _undo_nested(values: list[Any], prepend: bool, mutate: Any) -> list[Any]:
+    lst: list[Any] = [1, 23, 2, 42, 3]
+    cms = _nested(lst, values, prepend)
+    for cm in cms:
+        cm.__enter__()
+    mutate(lst)
+    for cm in reversed(cms):
+        cm.__exit__(None, None, None)
+    return lst
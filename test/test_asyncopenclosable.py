@@ -0,0 +1,52 @@
+from __future__ import annotations
+import asyncio
+from morecontext import AsyncOpenClosable
+
+
+class AsyncOpenCloser(AsyncOpenClosable):
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def open(self) -> None:  # noqa: A003
+        self.calls.append("open")
+        await asyncio.sleep(0.01)
+        self.calls.append("opened")
+
+    async def close(self) -> None:
+        self.calls.append("close")
+        await asyncio.sleep(0.01)
+        self.calls.append("closed")
+
+
+def test_asyncopenclosable() -> None:
+    async def main() -> None:
+        oc = AsyncOpenCloser()
+        assert oc.calls == []
+        async with oc as oc2:
+            assert oc is oc2
+            assert oc.calls == ["open", "opened"]
+            async with oc:
+                assert oc.calls == ["open", "opened"]
+            assert oc.calls == ["open", "opened"]
+        assert oc.calls == ["open", "opened", "close", "closed"]
+
+    asyncio.run(main())
+
+
+def test_asyncopenclosable_concurrent() -> None:
+    async def main() -> None:
+        oc = AsyncOpenCloser()
+        inside: list[list[str]] = []
+
+        async def worker() -> None:
+            async with oc:
+                inside.append(list(oc.calls))
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(worker() for _ in range(10)))
+        assert inside == [["open", "opened"]] * 10
+        assert oc.calls == ["open", "opened", "close", "closed"]
+        await worker()
+        assert oc.calls == ["open", "opened", "close", "closed"] * 2
+
+    asyncio.run(main())
@@ -1,6 +1,10 @@
+from __future__ import annotations
+import asyncio
+from collections.abc import Callable
 from types import SimpleNamespace
+from typing import Any
 import pytest
-from morecontext import attrrollback
+from morecontext import attrrollback, attrset
 
 
 def test_attrrollback_nop() -> None:
@@ -143,3 +147,290 @@ def test_attrrollback_deepcopy_error(copy: bool) -> None:
             obj.foo["quux"] = ["x", "y", "z"]
             raise RuntimeError("Catch this!")
     assert obj.foo == {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+
+
+def test_attrrollback_lazy_copy_read_only() -> None:
+    value = {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", copy=True, lazy=True):
+        assert obj.foo == value
+        assert obj.foo["bar"] == [1, 2, 3]
+        assert list(obj.foo) == ["bar", "quux"]
+        assert len(obj.foo) == 2
+        assert "quux" in obj.foo
+    assert obj.foo is value
+    assert obj.foo == {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+
+
+def test_attrrollback_lazy_copy() -> None:
+    value = {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", copy=True, lazy=True):
+        obj.foo["bar"].append(4)
+        obj.foo["quux"] = ["x", "y", "z"]
+        assert obj.foo == {"bar": [1, 2, 3, 4], "quux": ["x", "y", "z"]}
+        assert value == {"bar": [1, 2, 3, 4], "quux": ["a", "b", "c"]}
+    assert obj.foo is value
+    assert obj.foo == {"bar": [1, 2, 3, 4], "quux": ["a", "b", "c"]}
+
+
+def test_attrrollback_lazy_copy_error() -> None:
+    value = {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+    obj = SimpleNamespace(foo=value)
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with attrrollback(obj, "foo", copy=True, lazy=True):
+            obj.foo["bar"].append(4)
+            obj.foo["quux"] = ["x", "y", "z"]
+            raise RuntimeError("Catch this!")
+    assert obj.foo is value
+    assert obj.foo == {"bar": [1, 2, 3, 4], "quux": ["a", "b", "c"]}
+
+
+def test_attrrollback_lazy_copy_list() -> None:
+    value = [3, 1, 2]
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", copy=True, lazy=True):
+        assert obj.foo == [3, 1, 2]
+        assert obj.foo[1:] == [1, 2]
+        obj.foo.append(0)
+        obj.foo.sort()
+        del obj.foo[0]
+        obj.foo.extend([5, 6])
+        assert obj.foo == [1, 2, 3, 5, 6]
+        assert obj.foo.index(5) == 3
+        assert list(reversed(obj.foo)) == [6, 5, 3, 2, 1]
+    assert obj.foo is value
+    assert obj.foo == [3, 1, 2]
+
+
+def test_attrrollback_lazy_copy_list_operators() -> None:
+    value = [1, 2]
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", copy=True, lazy=True):
+        assert obj.foo + [3] == [1, 2, 3]
+        assert [0] + obj.foo == [0, 1, 2]
+        assert obj.foo + obj.foo == [1, 2, 1, 2]
+        assert obj.foo * 2 == [1, 2, 1, 2]
+        assert 2 * obj.foo == [1, 2, 1, 2]
+        assert obj.foo < [1, 3]
+        assert obj.foo <= [1, 2]
+        assert obj.foo > [1]
+        assert obj.foo >= obj.foo
+        assert sorted([[2], obj.foo, [0]]) == [[0], [1, 2], [2]]
+        obj.foo += [3]
+        obj.foo *= 2
+        assert obj.foo == [1, 2, 3, 1, 2, 3]
+    assert obj.foo is value
+    assert obj.foo == [1, 2]
+
+
+def test_attrrollback_lazy_copy_dict_operators() -> None:
+    value = {"bar": 1}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", copy=True, lazy=True):
+        assert obj.foo | {"baz": 2} == {"bar": 1, "baz": 2}
+        assert {"baz": 2} | obj.foo == {"baz": 2, "bar": 1}
+        obj.foo |= {"baz": 2}
+        assert obj.foo == {"bar": 1, "baz": 2}
+    assert obj.foo is value
+    assert obj.foo == {"bar": 1}
+
+
+def test_attrrollback_lazy_copy_other_type() -> None:
+    value = {1, 2, 3}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", copy=True, lazy=True):
+        assert obj.foo is value
+        obj.foo.add(4)
+    assert obj.foo == {1, 2, 3}
+    assert obj.foo is not value
+
+
+@pytest.mark.parametrize("copy", [False, True])
+def test_attrrollback_lazy_deepcopy(copy: bool) -> None:
+    obj = SimpleNamespace(foo={"bar": [1, 2, 3], "quux": ["a", "b", "c"]})
+    with attrrollback(obj, "foo", copy=copy, deepcopy=True, lazy=True):
+        assert isinstance(obj.foo, dict)
+        obj.foo["bar"].append(4)
+    assert obj.foo == {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+
+
+def test_attrrollback_lazy_no_copy() -> None:
+    value = [1, 2, 3]
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", lazy=True):
+        assert obj.foo is value
+        obj.foo.append(4)
+    assert obj.foo == [1, 2, 3, 4]
+
+
+def make_config() -> dict[str, Any]:
+    return {
+        "bar": [1, 2, 3],
+        "quux": {"a": ["x", "y"], "b": {"c": 1}},
+        "gnusto": "cleesh",
+    }
+
+
+@pytest.mark.parametrize(
+    "copy,deepcopy,lazy", [(False, False, False), (True, True, True)]
+)
+def test_attrrollback_journal(copy: bool, deepcopy: bool, lazy: bool) -> None:
+    value = make_config()
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(
+        obj, "foo", copy=copy, deepcopy=deepcopy, lazy=lazy, journal=True
+    ):
+        assert obj.foo == make_config()
+        obj.foo["bar"].append(4)
+        obj.foo["quux"]["a"][0] = "z"
+        obj.foo["quux"]["b"]["d"] = 2
+        del obj.foo["quux"]["b"]["c"]
+        obj.foo["new"] = {"nested": [1]}
+        obj.foo["new"]["nested"].append(2)
+        obj.foo.pop("gnusto")
+        assert value == {
+            "bar": [1, 2, 3, 4],
+            "quux": {"a": ["z", "y"], "b": {"d": 2}},
+            "new": {"nested": [1, 2]},
+        }
+    assert obj.foo is value
+    assert obj.foo == make_config()
+
+
+def test_attrrollback_journal_error() -> None:
+    value = make_config()
+    obj = SimpleNamespace(foo=value)
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with attrrollback(obj, "foo", journal=True):
+            obj.foo["bar"].append(4)
+            obj.foo["quux"]["b"].clear()
+            obj.foo.clear()
+            assert value == {}
+            raise RuntimeError("Catch this!")
+    assert obj.foo is value
+    assert obj.foo == make_config()
+
+
+LIST_OPS: list[Callable[[Any], Any]] = [
+    lambda x: x[2].append(3),
+    lambda x: x.__setitem__(0, 6),
+    lambda x: x.insert(-100, "first"),
+    lambda x: x.insert(100, "last"),
+    lambda x: x.insert(-1, "penultimate"),
+    lambda x: x.extend(["x", "y"]),
+    lambda x: x.__iadd__(["z"]),
+    lambda x: x.__delitem__(-2),
+    lambda x: x.__delitem__(slice(1, 3)),
+    lambda x: x.__setitem__(slice(1, 2), ["a", "b", "c"]),
+    lambda x: x.__setitem__(slice(None, None, 2), list(range(len(x[::2])))),
+    lambda x: x.__delitem__(slice(None, None, 3)),
+    lambda x: x.remove("last"),
+    lambda x: x.pop(),
+    lambda x: x.reverse(),
+    lambda x: x.sort(key=str),
+    lambda x: x.clear(),
+]
+
+
+def test_attrrollback_journal_list_ops() -> None:
+    value: list[Any] = [5, 3, [1, 2], 4, 1]
+    obj = SimpleNamespace(foo=value)
+    expected: list[Any] = [5, 3, [1, 2], 4, 1]
+    with attrrollback(obj, "foo", journal=True):
+        for op in LIST_OPS:
+            op(obj.foo)
+            op(expected)
+            assert value == expected
+            assert obj.foo == expected
+    assert obj.foo is value
+    assert obj.foo == [5, 3, [1, 2], 4, 1]
+
+
+def test_attrrollback_journal_nested_proxies() -> None:
+    value: dict[str, Any] = {"a": [1], "b": {"c": []}}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", journal=True):
+        assert obj.foo["a"] is obj.foo["a"]
+        assert obj.foo["a"] in list(obj.foo.values())
+        obj.foo["b"]["c"] = obj.foo["a"]
+        obj.foo["b"]["c"].append(2)
+        assert value["b"]["c"] is value["a"]
+        assert type(value["b"]["c"]) is list
+        for x in obj.foo["b"].values():
+            x.append(3)
+        assert value == {"a": [1, 2, 3], "b": {"c": [1, 2, 3]}}
+    assert obj.foo == {"a": [1], "b": {"c": []}}
+    assert type(obj.foo["b"]["c"]) is list
+
+
+def test_attrrollback_journal_operators() -> None:
+    value: dict[str, Any] = {"a": [1, 2]}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", journal=True):
+        assert obj.foo | {"b": 3} == {"a": [1, 2], "b": 3}
+        assert {"b": 3} | obj.foo == {"b": 3, "a": [1, 2]}
+        lst = obj.foo["a"]
+        assert lst + [3] == [1, 2, 3]
+        assert [0] + lst == [0, 1, 2]
+        assert lst + lst == [1, 2, 1, 2]
+        assert lst * 2 == [1, 2, 1, 2]
+        assert 2 * lst == [1, 2, 1, 2]
+        assert lst < [1, 3]
+        assert lst <= [1, 2]
+        assert lst > [1]
+        assert lst >= lst
+        lst *= 2
+        lst += [3]
+        obj.foo |= {"b": 3}
+        assert value == {"a": [1, 2, 1, 2, 3], "b": 3}
+        assert obj.foo is not value
+    assert obj.foo is value
+    assert obj.foo == {"a": [1, 2]}
+
+
+def test_attrrollback_journal_other_type() -> None:
+    value = {1, 2, 3}
+    obj = SimpleNamespace(foo=value)
+    with attrrollback(obj, "foo", journal=True):
+        assert obj.foo is value
+        obj.foo.add(4)
+    assert obj.foo == {1, 2, 3}
+
+
+def test_attrrollback_journal_unset() -> None:
+    obj = SimpleNamespace()
+    with attrrollback(obj, "foo", journal=True):
+        obj.foo = [1]
+    assert not hasattr(obj, "foo")
+
+
+def test_attrrollback_journal_async_out_of_order() -> None:
+    value = [1, 2]
+    obj = SimpleNamespace(foo=value)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with attrrollback(obj, "foo", journal=True):
+                obj.foo.append(3)
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch is still in effect, but the journal has been
+            # rolled back:
+            assert obj.foo == "second"
+            assert value == [1, 2]
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with attrset(obj, "foo", "second"):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert obj.foo is value
+    assert value == [1, 2]
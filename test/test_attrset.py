@@ -1,3 +1,4 @@
+import asyncio
 from types import SimpleNamespace
 import pytest
 from morecontext import attrset
@@ -123,3 +124,94 @@ def test_attrset_not_copied_error() -> None:
             assert obj.foo == "bar"
             raise RuntimeError("Catch this!")
     assert obj.foo is x
+
+
+def test_attrset_decorator() -> None:
+    obj = SimpleNamespace(foo=42)
+
+    @attrset(obj, "foo", "bar")
+    def func(x: int) -> int:
+        assert obj.foo == "bar"
+        return x + 1
+
+    assert obj.foo == 42
+    assert func(1) == 2
+    assert obj.foo == 42
+    assert func(2) == 3
+    assert obj.foo == 42
+
+
+def test_attrset_async_out_of_order() -> None:
+    obj = SimpleNamespace(foo=42)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with attrset(obj, "foo", "first"):
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch is still in effect:
+            assert obj.foo == "second"
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with attrset(obj, "foo", "second"):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert obj.foo == 42
+
+
+def test_attrset_async_decorator() -> None:
+    obj = SimpleNamespace(foo=42)
+
+    @attrset(obj, "foo", "bar")
+    async def func(x: int) -> int:
+        assert obj.foo == "bar"
+        await asyncio.sleep(0)
+        return x + 1
+
+    assert obj.foo == 42
+    assert asyncio.run(func(1)) == 2
+    assert obj.foo == 42
+
+
+def test_attrset_async_many_tasks() -> None:
+    obj = SimpleNamespace(foo=42)
+
+    async def worker(i: int) -> None:
+        async with attrset(obj, "foo", i):
+            for _ in range(i % 3):
+                await asyncio.sleep(0)
+
+    async def main() -> None:
+        await asyncio.gather(*(worker(i) for i in range(50)))
+
+    asyncio.run(main())
+    assert obj.foo == 42
+
+
+def test_attrset_reenter_nested() -> None:
+    obj = SimpleNamespace(foo=42)
+    cm = attrset(obj, "foo", 1)
+    with cm:
+        with pytest.raises(RuntimeError, match="already entered"):
+            with cm:
+                pass  # pragma: no cover
+        assert obj.foo == 1
+    assert obj.foo == 42
+
+
+def test_attrset_reuse_sequential() -> None:
+    obj = SimpleNamespace(foo=42)
+    cm = attrset(obj, "foo", 1)
+    with cm:
+        assert obj.foo == 1
+    with cm:
+        assert obj.foo == 1
+    assert obj.foo == 42
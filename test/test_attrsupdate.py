@@ -0,0 +1,170 @@
+from __future__ import annotations
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+import pytest
+from morecontext import attrset, attrsupdate
+
+
+def test_attrsupdate_kwargs() -> None:
+    obj = SimpleNamespace(foo=42, bar="bar")
+    with attrsupdate(obj, foo=23, baz=[3.14]):
+        assert obj.foo == 23
+        assert obj.bar == "bar"
+        assert obj.baz == [3.14]
+        obj.bar = "quux"
+    assert obj.foo == 42
+    assert obj.bar == "quux"
+    assert not hasattr(obj, "baz")
+
+
+def test_attrsupdate_kwargs_error() -> None:
+    obj = SimpleNamespace(foo=42, bar="bar")
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with attrsupdate(obj, foo=23, baz=[3.14]):
+            assert obj.foo == 23
+            assert obj.baz == [3.14]
+            raise RuntimeError("Catch this!")
+    assert obj.foo == 42
+    assert obj.bar == "bar"
+    assert not hasattr(obj, "baz")
+
+
+def test_attrsupdate_triples() -> None:
+    obj1 = SimpleNamespace(foo=42)
+    obj2 = SimpleNamespace(bar="bar")
+    with attrsupdate([(obj1, "foo", 23), (obj2, "bar", "quux"), (obj2, "baz", 1)]):
+        assert obj1.foo == 23
+        assert obj2.bar == "quux"
+        assert obj2.baz == 1
+        del obj1.foo
+        obj2.baz = 2
+    assert obj1.foo == 42
+    assert obj2.bar == "bar"
+    assert not hasattr(obj2, "baz")
+
+
+def test_attrsupdate_triples_error() -> None:
+    obj1 = SimpleNamespace(foo=42)
+    obj2 = SimpleNamespace(bar="bar")
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with attrsupdate([(obj1, "foo", 23), (obj2, "bar", "quux")]):
+            assert obj1.foo == 23
+            assert obj2.bar == "quux"
+            raise RuntimeError("Catch this!")
+    assert obj1.foo == 42
+    assert obj2.bar == "bar"
+
+
+def test_attrsupdate_repeated_name() -> None:
+    obj = SimpleNamespace(foo=42)
+    with attrsupdate([(obj, "foo", 1), (obj, "foo", 2)]):
+        assert obj.foo == 2
+    assert obj.foo == 42
+
+
+def test_attrsupdate_empty() -> None:
+    with attrsupdate([]):
+        pass
+
+
+class Frozen:
+    def __init__(self) -> None:
+        object.__setattr__(self, "foo", 42)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "frozen":
+            raise AttributeError(f"Cannot set {name}")
+        object.__setattr__(self, name, value)
+
+
+def test_attrsupdate_failed_entry() -> None:
+    obj = Frozen()
+    other = SimpleNamespace(bar="bar")
+    with pytest.raises(AttributeError, match="Cannot set frozen"):
+        with attrsupdate(
+            [(other, "bar", "quux"), (obj, "foo", 23), (obj, "frozen", True)]
+        ):
+            raise AssertionError("Not reached")  # pragma: no cover
+    assert obj.foo == 42  # type: ignore[attr-defined]
+    assert not hasattr(obj, "frozen")
+    assert other.bar == "bar"
+
+
+def test_attrsupdate_async_out_of_order() -> None:
+    obj = SimpleNamespace(a=0, b=0)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with attrsupdate(obj, a=1, b=1):
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch of `a` is still in effect, but `b` has been
+            # restored:
+            assert (obj.a, obj.b) == (2, 0)
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with attrsupdate(obj, a=2):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert (obj.a, obj.b) == (0, 0)
+
+
+def test_attrsupdate_attrset_async_out_of_order() -> None:
+    obj = SimpleNamespace(a=0)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with attrsupdate(obj, a=1):
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch is still in effect:
+            assert obj.a == 2
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with attrset(obj, "a", 2):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert obj.a == 0
+
+
+def test_attrset_attrsupdate_async_out_of_order() -> None:
+    obj = SimpleNamespace(a=0)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with attrset(obj, "a", 1):
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch is still in effect:
+            assert obj.a == 2
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with attrsupdate(obj, a=2):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert obj.a == 0
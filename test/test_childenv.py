@@ -0,0 +1,113 @@
+from __future__ import annotations
+import json
+import os
+import subprocess
+import sys
+from typing import Any
+import pytest
+from morecontext import ChildEnv, localenvset
+
+ENVVAR = "MORECONTEXT_FOO"
+
+PRINT_ENV = (
+    "import json, os;"
+    " print(json.dumps({k: v for k, v in os.environ.items()"
+    " if k.startswith('MORECONTEXT_')}))"
+)
+
+
+@pytest.fixture(autouse=True)
+def _envvar(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv("MORECONTEXT_BAR", raising=False)
+
+
+def decoded(env: Any) -> dict[str, str]:
+    return {os.fsdecode(k): os.fsdecode(v) for k, v in env.items()}
+
+
+def child_env(env: Any) -> dict[str, str]:
+    r = subprocess.run(
+        [sys.executable, "-c", PRINT_ENV],
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    d = json.loads(r.stdout)
+    assert isinstance(d, dict)
+    return d
+
+
+def test_childenv_empty() -> None:
+    env = ChildEnv().env()
+    assert decoded(env) == dict(os.environ)
+    assert env is not ChildEnv().env()
+
+
+def test_childenv() -> None:
+    before = dict(os.environ)
+    ce = ChildEnv({ENVVAR: "bar", "MORECONTEXT_BAR": "baz"})
+    env = decoded(ce.env())
+    assert env == {**before, ENVVAR: "bar", "MORECONTEXT_BAR": "baz"}
+    assert dict(os.environ) == before
+
+
+def test_childenv_unset() -> None:
+    env = decoded(ChildEnv({ENVVAR: None, "MORECONTEXT_BAR": None}).env())
+    assert ENVVAR not in env
+    assert "MORECONTEXT_BAR" not in env
+    assert os.environ[ENVVAR] == "foo"
+
+
+def test_childenv_follows_environ(monkeypatch: pytest.MonkeyPatch) -> None:
+    ce = ChildEnv({"MORECONTEXT_BAR": "bar"})
+    assert decoded(ce.env())[ENVVAR] == "foo"
+    monkeypatch.setenv(ENVVAR, "changed")
+    assert decoded(ce.env())[ENVVAR] == "changed"
+    monkeypatch.delenv(ENVVAR)
+    assert ENVVAR not in decoded(ce.env())
+
+
+def test_childenv_mutation_not_shared() -> None:
+    ce = ChildEnv({ENVVAR: "bar"})
+    env: Any = ce.env()
+    env.clear()
+    assert decoded(ce.env())[ENVVAR] == "bar"
+    assert os.environ[ENVVAR] == "foo"
+
+
+def test_childenv_localenvset() -> None:
+    ce = ChildEnv({"MORECONTEXT_BAR": "bar"})
+    with localenvset({ENVVAR: None, "MORECONTEXT_BAZ": "baz"}):
+        env = decoded(ce.env())
+        assert ENVVAR not in env
+        assert env["MORECONTEXT_BAZ"] == "baz"
+        assert env["MORECONTEXT_BAR"] == "bar"
+    assert decoded(ce.env())[ENVVAR] == "foo"
+
+
+def test_childenv_overrides_localenvset() -> None:
+    with localenvset({ENVVAR: "local", "MORECONTEXT_BAR": "local"}):
+        env = decoded(ChildEnv({ENVVAR: "child", "MORECONTEXT_BAR": None}).env())
+    assert env[ENVVAR] == "child"
+    assert "MORECONTEXT_BAR" not in env
+
+
+def test_childenv_subprocess() -> None:
+    ce = ChildEnv({ENVVAR: None, "MORECONTEXT_BAR": "bar"})
+    assert child_env(ce.env()) == {"MORECONTEXT_BAR": "bar"}
+    assert child_env(None) == {ENVVAR: "foo"}
+
+
+def test_childenv_bad_value() -> None:
+    with pytest.raises(TypeError):
+        ChildEnv({ENVVAR: 42})  # type: ignore[dict-item]
+
+
+def test_childenv_plain_environ(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(os, "environ", {ENVVAR: "foo", "OTHER": "x"})
+    ce = ChildEnv({ENVVAR: None, "MORECONTEXT_BAR": "bar"})
+    with localenvset({"OTHER": "local"}):
+        assert ce.env() == {"OTHER": "local", "MORECONTEXT_BAR": "bar"}
+    assert ce.env() == {"OTHER": "x", "MORECONTEXT_BAR": "bar"}
@@ -1,7 +1,8 @@
+import asyncio
 import os
 from pathlib import Path
 import pytest
-from morecontext import dirchanged
+from morecontext import DirFDCache, dirchanged
 
 
 def test_dirchanged(tmp_path: Path) -> None:
@@ -50,3 +51,87 @@ def test_dirchanged_inner_changed_error(tmp_path: Path) -> None:
             os.chdir(tmp_path / "foo")
             raise RuntimeError("Catch this!")
     assert os.getcwd() == starting_dir
+
+
+@pytest.mark.skipif(not hasattr(os, "fchdir"), reason="Requires os.fchdir()")
+def test_dirchanged_usefd(tmp_path: Path) -> None:
+    starting_dir = os.getcwd()
+    assert Path(starting_dir) != tmp_path
+    with dirchanged(tmp_path, usefd=True):
+        assert Path(os.getcwd()) == tmp_path
+    assert os.getcwd() == starting_dir
+
+
+def test_dirchanged_usefd_nonexistent(tmp_path: Path) -> None:
+    starting_dir = os.getcwd()
+    with pytest.raises(FileNotFoundError):
+        with dirchanged(tmp_path / "nonexistent", usefd=True):
+            raise AssertionError("Not reached")  # pragma: no cover
+    assert os.getcwd() == starting_dir
+
+
+@pytest.mark.skipif(not hasattr(os, "fchdir"), reason="Requires os.fchdir()")
+def test_dirchanged_fdcache(tmp_path: Path) -> None:
+    starting_dir = os.getcwd()
+    (tmp_path / "foo").mkdir()
+    with DirFDCache() as cache:
+        for _ in range(2):
+            with dirchanged(tmp_path, fdcache=cache):
+                assert Path(os.getcwd()) == tmp_path
+                with dirchanged("foo", fdcache=cache):
+                    assert Path(os.getcwd()) == tmp_path / "foo"
+                assert Path(os.getcwd()) == tmp_path
+            assert os.getcwd() == starting_dir
+        assert len(cache) == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("usefd", [False, True])
+def test_dirchanged_async_out_of_order(tmp_path: Path, usefd: bool) -> None:
+    starting_dir = os.getcwd()
+    (tmp_path / "first").mkdir()
+    (tmp_path / "second").mkdir()
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with dirchanged(tmp_path / "first", usefd=usefd):
+                first_entered.set()
+                await second_entered.wait()
+            assert Path(os.getcwd()) == tmp_path / "second"
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with dirchanged(tmp_path / "second", usefd=usefd):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert os.getcwd() == starting_dir
+
+
+def test_dirchanged_reenter_nested(tmp_path: Path) -> None:
+    starting_dir = os.getcwd()
+    cm = dirchanged(tmp_path)
+    with cm:
+        with pytest.raises(RuntimeError, match="already entered"):
+            with cm:
+                pass  # pragma: no cover
+    assert os.getcwd() == starting_dir
+
+
+def test_dirchanged_enter_failure_then_retry(tmp_path: Path) -> None:
+    starting_dir = os.getcwd()
+    target = tmp_path / "later"
+    cm = dirchanged(target)
+    with pytest.raises(FileNotFoundError):
+        with cm:
+            pass  # pragma: no cover
+    target.mkdir()
+    with cm:
+        assert os.getcwd() == str(target)
+    assert os.getcwd() == starting_dir
@@ -0,0 +1,54 @@
+import os
+from pathlib import Path
+import pytest
+from morecontext import DirFDCache
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fchdir"), reason="Requires os.fchdir()"
+)
+
+
+def test_dirfdcache_lru(tmp_path: Path) -> None:
+    for name in "abc":
+        (tmp_path / name).mkdir()
+    cache = DirFDCache(maxsize=2)
+    fd_a = cache.get(tmp_path / "a")
+    assert cache.get(str(tmp_path / "a")) == fd_a
+    fd_b = cache.get(tmp_path / "b")
+    assert len(cache) == 2
+    # Touch "a" so that "b" is the least recently used
+    assert cache.get(tmp_path / "a") == fd_a
+    cache.get(tmp_path / "c")
+    assert len(cache) == 2
+    with pytest.raises(OSError):
+        os.fstat(fd_b)
+    os.fstat(fd_a)
+    cache.clear()
+    assert len(cache) == 0
+    with pytest.raises(OSError):
+        os.fstat(fd_a)
+
+
+def test_dirfdcache_renamed(tmp_path: Path) -> None:
+    (tmp_path / "foo").mkdir()
+    starting_dir = os.getcwd()
+    with DirFDCache() as cache:
+        fd = cache.get(tmp_path / "foo")
+        (tmp_path / "foo").rename(tmp_path / "bar")
+        os.fchdir(fd)
+        try:
+            assert Path(os.getcwd()) == tmp_path / "bar"
+        finally:
+            os.chdir(starting_dir)
+
+
+def test_dirfdcache_nonexistent(tmp_path: Path) -> None:
+    cache = DirFDCache()
+    with pytest.raises(FileNotFoundError):
+        cache.get(tmp_path / "nonexistent")
+    assert len(cache) == 0
+
+
+def test_dirfdcache_bad_maxsize() -> None:
+    with pytest.raises(ValueError):
+        DirFDCache(maxsize=0)
@@ -38,3 +38,25 @@ def test_dirrollback_inner_changed_error(tmp_path: Path) -> None:
             os.chdir(tmp_path)
             raise RuntimeError("Catch this!")
     assert os.getcwd() == starting_dir
+
+
+@pytest.mark.skipif(not hasattr(os, "fchdir"), reason="Requires os.fchdir()")
+def test_dirrollback_usefd_renamed(tmp_path: Path) -> None:
+    (tmp_path / "foo").mkdir()
+    with dirrollback():
+        os.chdir(tmp_path / "foo")
+        with dirrollback(usefd=True):
+            os.chdir(tmp_path)
+            (tmp_path / "foo").rename(tmp_path / "bar")
+        assert Path(os.getcwd()) == tmp_path / "bar"
+
+
+@pytest.mark.skipif(not hasattr(os, "fchdir"), reason="Requires os.fchdir()")
+def test_dirrollback_usefd_error(tmp_path: Path) -> None:
+    starting_dir = os.getcwd()
+    assert Path(starting_dir) != tmp_path
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with dirrollback(usefd=True):
+            os.chdir(tmp_path)
+            raise RuntimeError("Catch this!")
+    assert os.getcwd() == starting_dir
@@ -71,3 +71,44 @@ def test_envdel_unset_modified_error(monkeypatch: pytest.MonkeyPatch) -> None:
             os.environ[ENVVAR] = "quux"
             raise RuntimeError("Catch this!")
     assert ENVVAR not in os.environ
+
+
+ENVVAR2 = "MORECONTEXT_BAR"
+ENVVAR3 = "MORECONTEXT_BAZ"
+
+
+def test_envdel_multiple(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    monkeypatch.setenv(ENVVAR3, "baz")
+    with envdel(ENVVAR, ENVVAR2, ENVVAR3):
+        assert ENVVAR not in os.environ
+        assert ENVVAR2 not in os.environ
+        assert ENVVAR3 not in os.environ
+        os.environ[ENVVAR2] = "quux"
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+    assert os.environ[ENVVAR3] == "baz"
+
+
+def test_envdel_multiple_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    monkeypatch.setenv(ENVVAR3, "baz")
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with envdel(ENVVAR, ENVVAR2, ENVVAR3):
+            assert ENVVAR not in os.environ
+            assert ENVVAR2 not in os.environ
+            assert ENVVAR3 not in os.environ
+            os.environ[ENVVAR2] = "quux"
+            raise RuntimeError("Catch this!")
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+    assert os.environ[ENVVAR3] == "baz"
+
+
+def test_envdel_duplicate(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    with envdel(ENVVAR, ENVVAR):
+        assert ENVVAR not in os.environ
+    assert os.environ[ENVVAR] == "foo"
@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import pytest
+from morecontext import environrollback
+
+ENVVAR = "MORECONTEXT_FOO"
+ENVVAR2 = "MORECONTEXT_BAR"
+
+
+@pytest.fixture(autouse=True)
+def _envvars(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+
+
+def test_environrollback_nop() -> None:
+    before = dict(os.environ)
+    with environrollback():
+        assert dict(os.environ) == before
+    assert dict(os.environ) == before
+
+
+def test_environrollback_modify() -> None:
+    before = dict(os.environ)
+    with environrollback():
+        os.environ[ENVVAR] = "quux"
+        os.environ[ENVVAR2] = "new"
+    assert dict(os.environ) == before
+
+
+def test_environrollback_same_value() -> None:
+    with environrollback():
+        os.environ[ENVVAR] = "".join(["f", "oo"])
+        del os.environ[ENVVAR]
+        os.environ[ENVVAR] = "fo" + "o"
+    assert os.environ[ENVVAR] == "foo"
+
+
+def test_environrollback_del() -> None:
+    with environrollback():
+        del os.environ[ENVVAR]
+    assert os.environ[ENVVAR] == "foo"
+
+
+def test_environrollback_clear() -> None:
+    before = dict(os.environ)
+    with environrollback():
+        os.environ.clear()
+        os.environ[ENVVAR2] = "new"
+    assert dict(os.environ) == before
+
+
+def test_environrollback_error() -> None:
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with environrollback():
+            os.environ[ENVVAR] = "quux"
+            os.environ[ENVVAR2] = "new"
+            raise RuntimeError("Catch this!")
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+
+
+def test_environrollback_nested() -> None:
+    with environrollback():
+        os.environ[ENVVAR] = "outer"
+        with environrollback():
+            os.environ[ENVVAR] = "inner"
+            os.environ[ENVVAR2] = "inner"
+        assert os.environ[ENVVAR] == "outer"
+        assert ENVVAR2 not in os.environ
+    assert os.environ[ENVVAR] == "foo"
+
+
+def test_environrollback_decorator() -> None:
+    @environrollback()
+    def func() -> None:
+        os.environ[ENVVAR] = "quux"
+        os.environ[ENVVAR2] = "new"
+
+    func()
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Uses POSIX shell")
+def test_environrollback_restores_process_env() -> None:
+    with environrollback():
+        os.environ[ENVVAR] = "quux"
+        os.environ[ENVVAR2] = "new"
+    # Check the actual environment as inherited by a child that is not passed
+    # `os.environ` explicitly
+    r = subprocess.run(
+        [sys.executable, "-c", f"import os; print(os.getenv({ENVVAR2!r}))"],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    assert r.stdout.strip() == "None"
+    r = subprocess.run(
+        ["sh", "-c", f'echo "${ENVVAR}"'],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    assert r.stdout.strip() == "foo"
+
+
+def test_environrollback_plain_environ(monkeypatch: pytest.MonkeyPatch) -> None:
+    environ = {ENVVAR: "foo", "OTHER": "x"}
+    monkeypatch.setattr(os, "environ", environ)
+    with environrollback():
+        os.environ[ENVVAR] = "quux"
+        os.environ[ENVVAR2] = "new"
+        del os.environ["OTHER"]
+    assert environ == {ENVVAR: "foo", "OTHER": "x"}
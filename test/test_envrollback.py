@@ -89,3 +89,28 @@ def test_envrollback_unset_modify_error(monkeypatch: pytest.MonkeyPatch) -> None
             os.environ[ENVVAR] = "quux"
             raise RuntimeError("Catch this!")
     assert ENVVAR not in os.environ
+
+
+ENVVAR2 = "MORECONTEXT_BAR"
+
+
+def test_envrollback_multiple(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    with envrollback(ENVVAR, ENVVAR2):
+        del os.environ[ENVVAR]
+        os.environ[ENVVAR2] = "quux"
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+
+
+def test_envrollback_multiple_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with envrollback(ENVVAR, ENVVAR2):
+            del os.environ[ENVVAR]
+            os.environ[ENVVAR2] = "quux"
+            raise RuntimeError("Catch this!")
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytest
 from morecontext import envset
@@ -107,3 +108,100 @@ def test_envset_unset_delled_error(monkeypatch: pytest.MonkeyPatch) -> None:
             del os.environ[ENVVAR]
             raise RuntimeError("Catch this!")
     assert ENVVAR not in os.environ
+
+
+ENVVAR2 = "MORECONTEXT_BAR"
+ENVVAR3 = "MORECONTEXT_BAZ"
+
+
+def test_envset_mapping(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    monkeypatch.setenv(ENVVAR3, "baz")
+    with envset({ENVVAR: "bar", ENVVAR2: "quux", ENVVAR3: None}):
+        assert os.environ[ENVVAR] == "bar"
+        assert os.environ[ENVVAR2] == "quux"
+        assert ENVVAR3 not in os.environ
+        os.environ[ENVVAR3] = "modified"
+        del os.environ[ENVVAR]
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+    assert os.environ[ENVVAR3] == "baz"
+
+
+def test_envset_mapping_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    monkeypatch.setenv(ENVVAR3, "baz")
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with envset({ENVVAR: "bar", ENVVAR2: "quux", ENVVAR3: None}):
+            assert os.environ[ENVVAR] == "bar"
+            assert os.environ[ENVVAR2] == "quux"
+            assert ENVVAR3 not in os.environ
+            raise RuntimeError("Catch this!")
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+    assert os.environ[ENVVAR3] == "baz"
+
+
+def test_envset_mapping_bad_value(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR2, raising=False)
+    with pytest.raises(ValueError):
+        with envset({ENVVAR: "bar", ENVVAR2: "nul\0byte"}):
+            raise AssertionError("Not reached")  # pragma: no cover
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR2 not in os.environ
+
+
+def test_envset_mapping_empty() -> None:
+    env = dict(os.environ)
+    with envset({}):
+        assert os.environ == env
+    assert os.environ == env
+
+
+def test_envset_bad_args() -> None:
+    with pytest.raises(TypeError):
+        envset(ENVVAR)  # type: ignore[call-overload]
+    with pytest.raises(TypeError):
+        envset({ENVVAR: "foo"}, "bar")  # type: ignore[call-overload]
+
+
+def test_envset_async_out_of_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR + "2", raising=False)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with envset({ENVVAR: "first", ENVVAR + "2": "first"}):
+                first_entered.set()
+                await second_entered.wait()
+            # Only the variable also patched by `second()` remains set:
+            assert os.environ[ENVVAR] == "second"
+            assert ENVVAR + "2" not in os.environ
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with envset(ENVVAR, "second"):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR + "2" not in os.environ
+
+
+def test_envset_reenter_nested(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    cm = envset(ENVVAR, "bar")
+    with cm:
+        with pytest.raises(RuntimeError, match="already entered"):
+            with cm:
+                pass  # pragma: no cover
+    assert os.environ[ENVVAR] == "foo"
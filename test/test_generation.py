@@ -0,0 +1,243 @@
+from __future__ import annotations
+from collections.abc import Iterator
+import os
+import sys
+from types import SimpleNamespace
+from typing import Any
+import pytest
+import morecontext
+from morecontext import (
+    Patcher,
+    attrdel,
+    attrrollback,
+    attrset,
+    attrsupdate,
+    envdel,
+    environrollback,
+    envrollback,
+    envset,
+    generation,
+    itemdel,
+    itemrollback,
+    itemset,
+    itemsupdate,
+    subscribe,
+    unwatch,
+)
+
+ENVVAR = "MORECONTEXT_FOO"
+
+
+@pytest.fixture(autouse=True)
+def _unwatch_all() -> Iterator[None]:
+    yield
+    morecontext._watched.clear()
+
+
+def test_generation_attrset() -> None:
+    obj = SimpleNamespace(foo=1)
+    g0 = generation(obj)
+    assert generation(obj) == g0
+    with attrset(obj, "foo", 2):
+        g1 = generation(obj)
+        assert g1 != g0
+    g2 = generation(obj)
+    assert g2 not in (g0, g1)
+
+
+def test_generation_unwatched_target_unaffected() -> None:
+    obj = SimpleNamespace(foo=1)
+    other = SimpleNamespace(foo=1)
+    g = generation(obj)
+    with attrset(other, "foo", 2):
+        pass
+    assert generation(obj) == g
+
+
+def test_generation_not_tracked_before_watching() -> None:
+    obj = SimpleNamespace(foo=1)
+    with attrset(obj, "foo", 2):
+        g = generation(obj)
+        assert generation(obj) == g
+    assert generation(obj) != g
+
+
+@pytest.mark.parametrize(
+    "make_cm",
+    [
+        lambda o: attrset(o, "foo", 2),
+        lambda o: attrdel(o, "foo"),
+        lambda o: attrrollback(o, "foo"),
+        lambda o: attrsupdate(o, foo=2, bar=3),
+    ],
+)
+def test_generation_attr_managers(make_cm: Any) -> None:
+    obj = SimpleNamespace(foo=1)
+    events: list[tuple[Any, Any]] = []
+    subscribe(obj, lambda t, k: events.append((t, k)))
+    g = generation(obj)
+    with make_cm(obj):
+        pass
+    assert generation(obj) != g
+    assert events
+    assert all(t is obj for t, _ in events)
+    assert {k for _, k in events} <= {"foo", "bar"}
+
+
+@pytest.mark.parametrize(
+    "make_cm",
+    [
+        lambda d: itemset(d, "foo", 2),
+        lambda d: itemdel(d, "foo"),
+        lambda d: itemrollback(d, "foo"),
+        lambda d: itemsupdate(d, {"foo": 2}, delete=["bar"]),
+    ],
+)
+def test_generation_item_managers(make_cm: Any) -> None:
+    d = {"foo": 1, "bar": 2}
+    keys: list[Any] = []
+    subscribe(d, lambda _t, k: keys.append(k))
+    g = generation(d)
+    with make_cm(d):
+        pass
+    assert generation(d) != g
+    assert keys
+    assert set(keys) <= {"foo", "bar"}
+
+
+@pytest.mark.parametrize(
+    "make_cm",
+    [
+        lambda: envset(ENVVAR, "bar"),
+        lambda: envset({ENVVAR: None}),
+        lambda: envdel(ENVVAR),
+        lambda: envrollback(ENVVAR),
+    ],
+)
+def test_generation_env_managers(
+    monkeypatch: pytest.MonkeyPatch, make_cm: Any
+) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    keys: list[Any] = []
+    subscribe(os.environ, lambda _t, k: keys.append(k))
+    g = generation(os.environ)
+    with make_cm():
+        pass
+    assert generation(os.environ) != g
+    assert keys and set(keys) == {ENVVAR}
+
+
+def test_generation_environrollback(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    keys: list[Any] = []
+    subscribe(os.environ, lambda _t, k: keys.append(k))
+    g = generation(os.environ)
+    with environrollback():
+        pass
+    assert generation(os.environ) == g
+    with environrollback():
+        # Direct changes are not seen ...
+        os.environ[ENVVAR] = "bar"
+        assert generation(os.environ) == g
+    # ... but undoing them is
+    assert generation(os.environ) != g
+    assert keys == [ENVVAR]
+
+
+def test_generation_patcher(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    obj = SimpleNamespace(foo=1)
+    d = {"foo": 1}
+    gens = [generation(obj), generation(d), generation(os.environ)]
+    with Patcher() as p:
+        p.setattr(obj, "foo", 2)
+        p.setitem(d, "foo", 2)
+        p.setenv(ENVVAR, "bar")
+        mid = [generation(obj), generation(d), generation(os.environ)]
+        assert all(a != b for a, b in zip(gens, mid))
+    after = [generation(obj), generation(d), generation(os.environ)]
+    assert all(a != b for a, b in zip(mid, after))
+
+
+def test_subscribe_order_and_state() -> None:
+    d = {"foo": 1}
+    seen: list[Any] = []
+    subscribe(d, lambda t, k: seen.append(t.get(k)))
+    with itemset(d, "foo", 2):
+        with itemdel(d, "foo"):
+            pass
+    # Callbacks run after each change
+    assert seen == [2, None, 2, 1]
+
+
+def test_subscribe_callback_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    def callback(_t: Any, _k: Any) -> None:
+        raise RuntimeError("Callback failed")
+
+    unraisable: list[sys.UnraisableHookArgs] = []
+    monkeypatch.setattr(sys, "unraisablehook", unraisable.append)
+    obj = SimpleNamespace(foo=42)
+    calls: list[Any] = []
+    subscribe(obj, callback)
+    subscribe(obj, lambda _t, k: calls.append(k))
+    with attrset(obj, "foo", 23):
+        assert obj.foo == 23
+    assert obj.foo == 42
+    assert calls == ["foo", "foo"]
+    assert len(unraisable) == 2
+    assert isinstance(unraisable[0].exc_value, RuntimeError)
+    assert unraisable[0].object is callback
+
+
+def test_unsubscribe() -> None:
+    d = {"foo": 1}
+    calls: list[Any] = []
+    unsubscribe = subscribe(d, lambda _t, k: calls.append(k))
+    with itemset(d, "foo", 2):
+        pass
+    assert calls == ["foo", "foo"]
+    unsubscribe()
+    unsubscribe()
+    g = generation(d)
+    with itemset(d, "foo", 2):
+        pass
+    assert calls == ["foo", "foo"]
+    assert generation(d) != g
+
+
+def test_unwatch() -> None:
+    d = {"foo": 1}
+    calls: list[Any] = []
+    subscribe(d, lambda _t, k: calls.append(k))
+    g = generation(d)
+    unwatch(d)
+    assert not morecontext._watched
+    with itemset(d, "foo", 2):
+        pass
+    assert calls == []
+    # Generation numbers are not reused after rewatching
+    assert generation(d) != g
+    unwatch(d)
+    unwatch(d)
+
+
+def test_generation_cache_pattern(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "1,2,3")
+    parses = 0
+    cache: tuple[int, list[int]] | None = None
+
+    def settings() -> list[int]:
+        nonlocal cache, parses
+        g = generation(os.environ)
+        if cache is None or cache[0] != g:
+            parses += 1
+            cache = (g, [int(x) for x in os.environ[ENVVAR].split(",")])
+        return cache[1]
+
+    assert settings() == [1, 2, 3]
+    assert settings() == [1, 2, 3]
+    with envset(ENVVAR, "4"):
+        assert settings() == [4]
+        assert settings() == [4]
+    assert settings() == [1, 2, 3]
+    assert parses == 3
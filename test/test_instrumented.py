@@ -0,0 +1,225 @@
+from __future__ import annotations
+from io import StringIO
+import json
+import sys
+import threading
+from types import SimpleNamespace
+import pytest
+from morecontext import (
+    InstrumentEvent,
+    InstrumentHistogram,
+    OpenClosable,
+    attrrollback,
+    attrset,
+    instrumented,
+    syspathadd,
+)
+
+
+class Resource(OpenClosable):
+    def open(self) -> None:  # noqa: A003
+        pass
+
+    def close(self) -> None:
+        raise RuntimeError("Close failed")
+
+
+def test_instrumented() -> None:
+    events: list[InstrumentEvent] = []
+    obj = SimpleNamespace(foo=42, bar={"x": [1, 2, 3]})
+    with instrumented(events.append):
+        with attrset(obj, "foo", 23):
+            pass
+        with attrrollback(obj, "bar", deepcopy=True):
+            pass
+        with syspathadd("/nonexistent"):
+            pass
+    assert [(e.type, e.phase) for e in events] == [
+        ("attrset", "enter"),
+        ("attrset", "exit"),
+        ("attrrollback", "snapshot"),
+        ("attrrollback", "enter"),
+        ("attrrollback", "exit"),
+        ("syspathadd", "enter"),
+        ("syspathadd", "exit"),
+    ]
+    assert all(e.ns >= 0 for e in events)
+    assert all(e.error is None for e in events)
+    assert events[2].nbytes is not None and events[2].nbytes > 0
+    assert all(e.nbytes is None for e in events if e.phase != "snapshot")
+
+
+def test_instrumented_lazy_snapshot() -> None:
+    events: list[InstrumentEvent] = []
+    obj = SimpleNamespace(foo=[1, 2, 3])
+    with instrumented(events.append):
+        with attrrollback(obj, "foo", copy=True, lazy=True):
+            pass
+    assert events[0].phase == "snapshot"
+    assert events[0].nbytes == 0
+
+
+def test_instrumented_openclosable_error() -> None:
+    events: list[InstrumentEvent] = []
+    with instrumented(events.append):
+        with pytest.raises(RuntimeError, match="Close failed"):
+            with Resource():
+                pass
+    assert [(e.type, e.phase) for e in events] == [
+        ("Resource", "open"),
+        ("Resource", "enter"),
+        ("Resource", "close"),
+        ("Resource", "exit"),
+    ]
+    assert isinstance(events[2].error, RuntimeError)
+    assert events[3].error is events[2].error
+
+
+def test_instrumented_disabled() -> None:
+    enter = attrset.__dict__["__enter__"]
+    oc_open = Resource.__dict__["open"]
+    snapshot = sys.modules["morecontext"]._snapshot
+    events: list[InstrumentEvent] = []
+    with instrumented(events.append):
+        assert attrset.__dict__["__enter__"] is not enter
+        with instrumented(events.append):
+            pass
+        assert attrset.__dict__["__enter__"] is not enter
+    assert attrset.__dict__["__enter__"] is enter
+    assert Resource.__dict__["open"] is oc_open
+    assert sys.modules["morecontext"]._snapshot is snapshot
+    events.clear()
+    with attrset(SimpleNamespace(), "foo", 42):
+        pass
+    assert events == []
+
+
+def test_instrumented_sink_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    def sink(_event: InstrumentEvent) -> None:
+        raise RuntimeError("Sink failed")
+
+    unraisable: list[sys.UnraisableHookArgs] = []
+    monkeypatch.setattr(sys, "unraisablehook", unraisable.append)
+    events: list[InstrumentEvent] = []
+    obj = SimpleNamespace(foo=42)
+    with instrumented(sink), instrumented(events.append):
+        with attrset(obj, "foo", 23):
+            assert obj.foo == 23
+    assert obj.foo == 42
+    assert [(e.type, e.phase) for e in events] == [
+        ("attrset", "enter"),
+        ("attrset", "exit"),
+    ]
+    assert len(unraisable) == 2
+    assert isinstance(unraisable[0].exc_value, RuntimeError)
+    assert unraisable[0].object is sink
+
+
+def test_instrumented_sink_error_default_hook(
+    capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def sink(_event: InstrumentEvent) -> None:
+        raise RuntimeError("Sink failed")
+
+    monkeypatch.setattr(sys, "unraisablehook", sys.__unraisablehook__)
+    obj = SimpleNamespace(foo=42)
+    with instrumented(sink):
+        with attrset(obj, "foo", 23):
+            pass
+    assert obj.foo == 42
+    err = capsys.readouterr().err
+    assert "Exception ignored in instrumented() sink" in err
+    assert "RuntimeError: Sink failed" in err
+
+
+def test_instrumented_decorator() -> None:
+    events: list[InstrumentEvent] = []
+
+    @instrumented(events.append)
+    def func() -> None:
+        with attrset(SimpleNamespace(), "foo", 42):
+            pass
+
+    func()
+    assert [(e.type, e.phase) for e in events] == [
+        ("attrset", "enter"),
+        ("attrset", "exit"),
+    ]
+
+
+def test_instrumented_user_class_untouched() -> None:
+    class Conn(OpenClosable):
+        def open(self) -> None:  # noqa: A003
+            pass
+
+    def fake_open(self: Conn) -> None:
+        pass
+
+    events: list[InstrumentEvent] = []
+    with instrumented(events.append):
+        assert "__enter__" not in Conn.__dict__
+        Conn.open = fake_open  # type: ignore[method-assign]
+        with Conn():
+            pass
+    assert Conn.__dict__["open"] is fake_open
+    assert [(e.type, e.phase) for e in events] == [
+        ("Conn", "open"),
+        ("Conn", "enter"),
+        ("Conn", "close"),
+        ("Conn", "exit"),
+    ]
+
+
+def test_instrumented_replaced_method_kept() -> None:
+    enter = attrset.__dict__["__enter__"]
+
+    def custom_enter(self: attrset) -> None:
+        enter(self)
+
+    try:
+        with instrumented(lambda _: None):
+            attrset.__enter__ = custom_enter  # type: ignore[method-assign]
+        assert attrset.__dict__["__enter__"] is custom_enter
+    finally:
+        attrset.__enter__ = enter  # type: ignore[method-assign]
+
+
+def test_instrumented_other_thread() -> None:
+    events: list[InstrumentEvent] = []
+
+    def worker() -> None:
+        with attrset(SimpleNamespace(), "foo", 42):
+            pass
+
+    with instrumented(events.append):
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        assert events == []
+        worker()
+    assert [(e.type, e.phase) for e in events] == [
+        ("attrset", "enter"),
+        ("attrset", "exit"),
+    ]
+
+
+def test_instrument_histogram() -> None:
+    hist = InstrumentHistogram()
+    obj = SimpleNamespace(foo=42)
+    with instrumented(hist):
+        for _ in range(3):
+            with attrset(obj, "foo", 23):
+                pass
+    data = hist.as_dict()
+    assert list(data) == ["attrset"]
+    assert sorted(data["attrset"]) == ["enter", "exit"]
+    st = data["attrset"]["enter"]
+    assert st["count"] == 3
+    assert st["errors"] == 0
+    assert st["min_ns"] <= st["total_ns"] / 3 <= st["max_ns"]
+    assert sum(st["buckets"].values()) == 3
+    fp = StringIO()
+    hist.dump(fp)
+    assert json.loads(fp.getvalue())["attrset"]["enter"]["count"] == 3
+    hist.clear()
+    assert hist.as_dict() == {}
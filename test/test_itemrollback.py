@@ -1,7 +1,8 @@
 from __future__ import annotations
+import asyncio
 from typing import Any
 import pytest
-from morecontext import itemrollback
+from morecontext import itemrollback, itemset
 
 
 def test_itemrollback_nop() -> None:
@@ -156,3 +157,119 @@ def test_itemrollback_deepcopy_error(copy: bool) -> None:
             d["foo"]["quux"] = ["x", "y", "z"]
             raise RuntimeError("Catch this!")
     assert d["foo"] == {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+
+
+def test_itemrollback_lazy_copy_read_only() -> None:
+    value = {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+    d = {"foo": value}
+    with itemrollback(d, "foo", copy=True, lazy=True):
+        assert d["foo"] == value
+        assert d["foo"].get("bar") == [1, 2, 3]
+        assert d["foo"].copy() == value
+    assert d["foo"] is value
+
+
+def test_itemrollback_lazy_copy() -> None:
+    value: dict[str, Any] = {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+    d = {"foo": value}
+    with itemrollback(d, "foo", copy=True, lazy=True):
+        d["foo"]["bar"].append(4)
+        d["foo"]["quux"] = ["x", "y", "z"]
+        d["foo"].update(gnusto="cleesh")
+        del d["foo"]["gnusto"]
+        assert d["foo"] == {"bar": [1, 2, 3, 4], "quux": ["x", "y", "z"]}
+    assert d["foo"] is value
+    assert d == {"foo": {"bar": [1, 2, 3, 4], "quux": ["a", "b", "c"]}}
+
+
+def test_itemrollback_lazy_copy_operators() -> None:
+    value = {"bar": 1}
+    d = {"foo": value}
+    with itemrollback(d, "foo", copy=True, lazy=True):
+        assert d["foo"] | {"baz": 2} == {"bar": 1, "baz": 2}
+        assert {"baz": 2} | d["foo"] == {"baz": 2, "bar": 1}
+        d["foo"] |= {"baz": 2}
+        assert d["foo"] == {"bar": 1, "baz": 2}
+    assert d["foo"] is value
+    assert value == {"bar": 1}
+
+
+def test_itemrollback_lazy_copy_error() -> None:
+    value = {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}
+    d = {"foo": value}
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with itemrollback(d, "foo", copy=True, lazy=True):
+            d["foo"].clear()
+            assert d["foo"] == {}
+            raise RuntimeError("Catch this!")
+    assert d["foo"] is value
+    assert d == {"foo": {"bar": [1, 2, 3], "quux": ["a", "b", "c"]}}
+
+
+def test_itemrollback_lazy_copy_unset() -> None:
+    d: dict[str, Any] = {}
+    with itemrollback(d, "foo", copy=True, lazy=True):
+        d["foo"] = [1]
+    assert d == {}
+
+
+def test_itemrollback_journal() -> None:
+    value: dict[str, Any] = {"bar": [1, 2, 3], "quux": {"a": ["x", "y"]}}
+    d: dict[str, Any] = {"foo": value}
+    with itemrollback(d, "foo", journal=True):
+        d["foo"]["bar"].append(4)
+        d["foo"]["quux"]["a"][0] = "z"
+        d["foo"].setdefault("new", []).append(1)
+        d["foo"]["quux"].update(b=2)
+        assert d["foo"].get("quux") == {"a": ["z", "y"], "b": 2}
+        assert value == {
+            "bar": [1, 2, 3, 4],
+            "quux": {"a": ["z", "y"], "b": 2},
+            "new": [1],
+        }
+        d["foo"] = "replaced"
+    assert d["foo"] is value
+    assert d == {"foo": {"bar": [1, 2, 3], "quux": {"a": ["x", "y"]}}}
+
+
+def test_itemrollback_journal_async_out_of_order() -> None:
+    value: dict[str, Any] = {"bar": 1}
+    d: dict[str, Any] = {"foo": value}
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with itemrollback(d, "foo", journal=True):
+                d["foo"]["bar"] = 2
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch is still in effect, but the journal has been
+            # rolled back:
+            assert d["foo"] == "second"
+            assert value == {"bar": 1}
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with itemset(d, "foo", "second"):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert d["foo"] is value
+    assert value == {"bar": 1}
+
+
+def test_itemrollback_journal_error() -> None:
+    value: dict[str, Any] = {"bar": [1, 2, 3], "quux": {"a": ["x", "y"]}}
+    d = {"foo": value}
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with itemrollback(d, "foo", journal=True):
+            d["foo"]["bar"].append(4)
+            del d["foo"]["quux"]
+            raise RuntimeError("Catch this!")
+    assert d["foo"] is value
+    assert d == {"foo": {"bar": [1, 2, 3], "quux": {"a": ["x", "y"]}}}
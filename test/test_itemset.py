@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 from typing import Any
 import pytest
 from morecontext import itemset
@@ -124,3 +125,58 @@ def test_itemset_not_copied_error() -> None:
             assert d["foo"] == "bar"
             raise RuntimeError("Catch this!")
     assert d["foo"] is x
+
+
+def test_itemset_decorator_recursive() -> None:
+    d: dict[str, Any] = {"foo": 42}
+    seen: list[Any] = []
+
+    @itemset(d, "foo", "bar")
+    def func(n: int) -> None:
+        seen.append(d["foo"])
+        d["foo"] = n
+        if n > 0:
+            func(n - 1)
+        seen.append(d["foo"])
+
+    func(2)
+    assert seen == ["bar", "bar", "bar", 0, 1, 2]
+    assert d == {"foo": 42}
+
+
+def test_itemset_async_out_of_order() -> None:
+    d: dict[str, Any] = {"foo": 42}
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with itemset(d, "foo", "first"):
+                first_entered.set()
+                await second_entered.wait()
+            assert d["foo"] == "second"
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with itemset(d, "foo", "second"):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert d == {"foo": 42}
+
+
+def test_itemset_reenter_nested() -> None:
+    d: dict[str, Any] = {"foo": 42}
+    cm = itemset(d, "foo", 1)
+    with cm:
+        with pytest.raises(RuntimeError, match="already entered"):
+            with cm:
+                pass  # pragma: no cover
+    assert d == {"foo": 42}
+    with cm:
+        assert d == {"foo": 1}
+    assert d == {"foo": 42}
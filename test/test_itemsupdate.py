@@ -0,0 +1,132 @@
+from __future__ import annotations
+import asyncio
+from collections import UserDict
+from collections.abc import Callable, MutableMapping
+from typing import Any
+import pytest
+from morecontext import itemset, itemsupdate
+
+Factory = Callable[[dict[str, Any]], MutableMapping[str, Any]]
+
+FACTORIES = [dict, UserDict]
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_itemsupdate(factory: Factory) -> None:
+    d = factory({"foo": 42, "bar": "bar", "baz": [1]})
+    with itemsupdate(d, {"foo": 23, "quux": 3.14}, delete=["bar", "gnusto"]):
+        assert dict(d) == {"foo": 23, "baz": [1], "quux": 3.14}
+        d["baz"] = [2]
+    assert dict(d) == {"foo": 42, "bar": "bar", "baz": [2]}
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_itemsupdate_error(factory: Factory) -> None:
+    d = factory({"foo": 42, "bar": "bar", "baz": [1]})
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with itemsupdate(d, {"foo": 23, "quux": 3.14}, delete=["bar", "gnusto"]):
+            assert dict(d) == {"foo": 23, "baz": [1], "quux": 3.14}
+            raise RuntimeError("Catch this!")
+    assert dict(d) == {"foo": 42, "bar": "bar", "baz": [1]}
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_itemsupdate_modified(factory: Factory) -> None:
+    d = factory({"foo": 42, "bar": "bar"})
+    with itemsupdate(d, {"foo": 23, "quux": 3.14}, delete=["bar"]):
+        d["foo"] = "modified"
+        d["bar"] = "restored"
+        del d["quux"]
+    assert dict(d) == {"foo": 42, "bar": "bar"}
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_itemsupdate_pairs(factory: Factory) -> None:
+    d = factory({"foo": 42})
+    with itemsupdate(d, [("foo", 1), ("bar", 2)]):
+        assert dict(d) == {"foo": 1, "bar": 2}
+    assert dict(d) == {"foo": 42}
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_itemsupdate_set_and_delete(factory: Factory) -> None:
+    d = factory({"foo": 42})
+    with itemsupdate(d, {"foo": 23, "bar": 1}, delete=["foo", "bar"]):
+        assert dict(d) == {}
+    assert dict(d) == {"foo": 42}
+
+
+@pytest.mark.parametrize("factory", FACTORIES)
+def test_itemsupdate_only_delete(factory: Factory) -> None:
+    d = factory({"foo": 42, "bar": "bar"})
+    with itemsupdate(d, delete=["foo"]):
+        assert dict(d) == {"bar": "bar"}
+    assert dict(d) == {"foo": 42, "bar": "bar"}
+
+
+class PickyDict(UserDict[str, Any]):
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "bad":
+            raise ValueError("Bad key")
+        super().__setitem__(key, value)
+
+
+def test_itemsupdate_failed_entry() -> None:
+    d = PickyDict({"foo": 42})
+    with pytest.raises(ValueError, match="Bad key"):
+        with itemsupdate(d, {"foo": 23, "bar": 1, "bad": 2}):
+            raise AssertionError("Not reached")  # pragma: no cover
+    assert dict(d) == {"foo": 42}
+
+
+def test_itemsupdate_async_out_of_order() -> None:
+    d = {"a": 0, "b": 0}
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with itemsupdate(d, {"a": 1, "b": 1}):
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch of `a` is still in effect, but `b` has been
+            # restored:
+            assert d == {"a": 2, "b": 0}
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with itemsupdate(d, {"a": 2}):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert d == {"a": 0, "b": 0}
+
+
+def test_itemsupdate_itemset_async_out_of_order() -> None:
+    d = {"a": 0}
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with itemsupdate(d, delete=["a"]):
+                first_entered.set()
+                await second_entered.wait()
+            # The second patch is still in effect:
+            assert d == {"a": 2}
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with itemset(d, "a", 2):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    asyncio.run(main())
+    assert d == {"a": 0}
@@ -0,0 +1,66 @@
+from __future__ import annotations
+import pytest
+from morecontext import LazyOpenClosable, OpenClosable
+
+
+class OpenCloser(LazyOpenClosable):
+    def __init__(self, fail: bool = False) -> None:
+        self.calls: list[str] = []
+        self.fail = fail
+
+    def open(self) -> None:  # noqa: A003
+        self.calls.append("open")
+        if self.fail:
+            raise RuntimeError("Open failed")
+
+    def close(self) -> None:
+        self.calls.append("close")
+
+
+def test_lazyopenclosable_unused() -> None:
+    oc = OpenCloser()
+    assert isinstance(oc, OpenClosable)
+    with oc as oc2:
+        assert oc is oc2
+        with oc:
+            assert not oc.is_open
+    assert oc.calls == []
+
+
+def test_lazyopenclosable_used() -> None:
+    oc = OpenCloser()
+    with oc:
+        with oc:
+            assert oc.ensure_open() is oc
+            assert oc.is_open
+            assert oc.calls == ["open"]
+        assert oc.calls == ["open"]
+        oc.ensure_open()
+        assert oc.calls == ["open"]
+    # Read `is_open` into a local so that mypy doesn't carry over the narrowing
+    # from the `assert` above:
+    is_open: bool = oc.is_open
+    assert not is_open
+    assert oc.calls == ["open", "close"]
+    with oc:
+        pass
+    assert oc.calls == ["open", "close"]
+    with oc:
+        oc.ensure_open()
+    assert oc.calls == ["open", "close"] * 2
+
+
+def test_lazyopenclosable_outside_with() -> None:
+    oc = OpenCloser()
+    with pytest.raises(RuntimeError):
+        oc.ensure_open()
+    assert oc.calls == []
+
+
+def test_lazyopenclosable_open_error() -> None:
+    oc = OpenCloser(fail=True)
+    with oc:
+        with pytest.raises(RuntimeError, match="Open failed"):
+            oc.ensure_open()
+        assert not oc.is_open
+    assert oc.calls == ["open"]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Any
+import pytest
+from morecontext import LingeringOpenClosable, OpenClosable
+
+
+class OpenCloser(LingeringOpenClosable):
+    def __init__(self, linger: float) -> None:
+        self.linger = linger
+        self.calls: list[str] = []
+
+    def open(self) -> None:  # noqa: A003
+        self.calls.append("open")
+
+    def close(self) -> None:
+        self.calls.append("close")
+
+
+def wait_for_close(oc: OpenCloser, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while oc.closes == 0:
+        assert time.monotonic() < deadline, "close() was never called"
+        time.sleep(0.01)
+
+
+def test_lingeringopenclosable_no_linger() -> None:
+    oc = OpenCloser(0)
+    assert isinstance(oc, OpenClosable)
+    with oc as oc2:
+        assert oc is oc2
+        with oc:
+            assert oc.calls == ["open"]
+    assert oc.calls == ["open", "close"]
+    with oc:
+        pass
+    assert oc.calls == ["open", "close"] * 2
+    assert (oc.opens, oc.closes, oc.avoided_opens) == (2, 2, 0)
+
+
+def test_lingeringopenclosable_reuse() -> None:
+    oc = OpenCloser(60)
+    for _ in range(5):
+        with oc:
+            assert oc.calls == ["open"]
+    assert oc.calls == ["open"]
+    assert (oc.opens, oc.closes, oc.avoided_opens) == (1, 0, 4)
+    oc.close_now()
+    assert oc.calls == ["open", "close"]
+    assert (oc.opens, oc.closes, oc.avoided_opens) == (1, 1, 4)
+    oc.close_now()
+    assert oc.calls == ["open", "close"]
+
+
+def test_lingeringopenclosable_close_now_while_entered() -> None:
+    oc = OpenCloser(60)
+    with oc:
+        oc.close_now()
+        assert oc.calls == ["open"]
+    assert oc.calls == ["open"]
+    oc.close_now()
+    assert oc.calls == ["open", "close"]
+
+
+def test_lingeringopenclosable_expires() -> None:
+    oc = OpenCloser(0.05)
+    with oc:
+        pass
+    assert oc.calls == ["open"]
+    wait_for_close(oc)
+    assert oc.calls == ["open", "close"]
+    with oc:
+        assert oc.calls == ["open", "close", "open"]
+    assert (oc.opens, oc.avoided_opens) == (2, 0)
+    oc.close_now()
+
+
+def test_lingeringopenclosable_reentered_during_linger(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    now = 0.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    timers: list[tuple[float, ManualTimer]] = []
+
+    class ManualTimer(threading.Timer):
+        """A timer that only fires when `fire()` is called"""
+
+        def __init__(self, interval: float, function: Callable[[], Any]) -> None:
+            super().__init__(0, function)
+            self.gate = threading.Event()
+            timers.append((interval, self))
+
+        def run(self) -> None:
+            self.gate.wait()
+            super().run()
+
+        def fire(self) -> None:
+            self.gate.set()
+            self.join()
+
+    monkeypatch.setattr(threading, "Timer", ManualTimer)
+    oc = OpenCloser(60)
+    with oc:
+        pass
+    now = 30
+    with oc:
+        # Hold the resource past the original timer's expiry
+        now = 90
+    assert oc.calls == ["open"]
+    assert [delay for delay, _ in timers] == [60]
+    timers[0][1].fire()
+    # The idle period restarted on the second exit, so the timer was restarted
+    # for the rest of it
+    assert oc.calls == ["open"]
+    assert [delay for delay, _ in timers] == [60, 60]
+    now = 150
+    timers[1][1].fire()
+    assert oc.calls == ["open", "close"]
+    assert (oc.opens, oc.closes, oc.avoided_opens) == (1, 1, 1)
+
+
+def test_lingeringopenclosable_threads() -> None:
+    oc = OpenCloser(60)
+
+    def worker() -> None:
+        for _ in range(100):
+            with oc:
+                assert oc.calls == ["open"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for f in [pool.submit(worker) for _ in range(8)]:
+            f.result()
+    assert oc.opens == 1
+    oc.close_now()
+    assert oc.calls == ["open", "close"]
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import Any
+import pytest
+from morecontext import localattrset
+
+
+class Client:
+    retries = 3
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+
+    def greet(self) -> str:
+        return "hello"
+
+
+class Slotted:
+    __slots__ = ("timeout",)
+
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+
+
+class WithProperty:
+    def __init__(self) -> None:
+        self._timeout = 5.0
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value: float) -> None:
+        self._timeout = value
+
+
+def test_localattrset() -> None:
+    c = Client(5)
+    other = Client(5)
+    with localattrset(c, "timeout", 1):
+        assert c.timeout == 1
+        assert other.timeout == 5
+        assert c.__dict__["timeout"] == 5
+    assert c.timeout == 5
+
+
+def test_localattrset_nested() -> None:
+    c = Client(5)
+    with localattrset(c, "timeout", 1):
+        with localattrset(c, "timeout", 2):
+            assert c.timeout == 2
+        assert c.timeout == 1
+    assert c.timeout == 5
+
+
+def test_localattrset_error() -> None:
+    c = Client(5)
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with localattrset(c, "timeout", 1):
+            raise RuntimeError("Catch this!")
+    assert c.timeout == 5
+
+
+def test_localattrset_set_delete_inside() -> None:
+    c = Client(5)
+    with localattrset(c, "timeout", 1):
+        c.timeout = 7
+        assert c.timeout == 1
+        del c.timeout
+        assert c.timeout == 1
+    with pytest.raises(AttributeError):
+        c.timeout
+    c.timeout = 9
+    assert c.timeout == 9
+
+
+def test_localattrset_class_attribute() -> None:
+    c = Client(5)
+    with localattrset(c, "retries", 0):
+        assert c.retries == 0
+        assert Client.retries == 3
+    assert c.retries == 3
+    assert Client.retries == 3
+    c.retries = 4
+    assert c.retries == 4
+    assert Client(5).retries == 3
+
+
+def test_localattrset_method() -> None:
+    c = Client(5)
+    with localattrset(c, "greet", lambda: "hi"):
+        assert c.greet() == "hi"
+        assert Client(5).greet() == "hello"
+    assert c.greet() == "hello"
+    assert Client.greet(c) == "hello"
+
+
+def test_localattrset_unset() -> None:
+    c = Client(5)
+    with localattrset(c, "extra", 1):
+        assert c.extra == 1  # type: ignore[attr-defined]
+    with pytest.raises(AttributeError):
+        c.extra  # type: ignore[attr-defined]
+
+
+@pytest.mark.parametrize("cls", [Slotted, WithProperty])
+def test_localattrset_descriptors(cls: Any) -> None:
+    obj = cls(5) if cls is Slotted else cls()
+    with localattrset(obj, "timeout", 1):
+        assert obj.timeout == 1
+        obj.timeout = 7
+        assert obj.timeout == 1
+    assert obj.timeout == 7
+
+
+def test_localattrset_threads() -> None:
+    c = Client(5)
+    barrier = threading.Barrier(8)
+
+    def worker(i: int) -> list[float]:
+        seen = []
+        with localattrset(c, "timeout", i):
+            barrier.wait()
+            seen.append(c.timeout)
+            barrier.wait()
+        seen.append(c.timeout)
+        return seen
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(worker, range(8)))
+    assert results == [[i, 5] for i in range(8)]
+
+
+def test_localattrset_tasks() -> None:
+    c = Client(5)
+
+    async def worker(i: int) -> float:
+        with localattrset(c, "timeout", i):
+            await asyncio.sleep(0.01)
+            return c.timeout
+
+    async def main() -> list[float]:
+        return list(await asyncio.gather(*(worker(i) for i in range(5))))
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+    assert c.timeout == 5
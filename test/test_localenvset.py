@@ -0,0 +1,139 @@
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import subprocess
+import sys
+import pytest
+from morecontext import environ_for_subprocess, getenv, localenvset
+
+ENVVAR = "MORECONTEXT_FOO"
+
+
+@pytest.fixture(autouse=True)
+def _envvar(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+
+
+def test_localenvset() -> None:
+    with localenvset(ENVVAR, "bar"):
+        assert getenv(ENVVAR) == "bar"
+        assert os.environ[ENVVAR] == "foo"
+    assert getenv(ENVVAR) == "foo"
+
+
+def test_localenvset_unset() -> None:
+    with localenvset(ENVVAR, None):
+        assert getenv(ENVVAR) is None
+        assert getenv(ENVVAR, "default") == "default"
+        assert ENVVAR not in environ_for_subprocess()
+        assert os.environ[ENVVAR] == "foo"
+    assert getenv(ENVVAR) == "foo"
+
+
+def test_localenvset_mapping(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("MORECONTEXT_BAR", raising=False)
+    with localenvset({ENVVAR: None, "MORECONTEXT_BAR": "bar"}):
+        assert getenv(ENVVAR) is None
+        assert getenv("MORECONTEXT_BAR") == "bar"
+        assert "MORECONTEXT_BAR" not in os.environ
+    assert getenv(ENVVAR) == "foo"
+    assert getenv("MORECONTEXT_BAR") is None
+
+
+def test_localenvset_mapping_with_value() -> None:
+    with pytest.raises(TypeError):
+        localenvset({ENVVAR: "bar"}, "baz")  # type: ignore[call-overload]
+
+
+def test_localenvset_nested() -> None:
+    with localenvset(ENVVAR, "bar"):
+        with localenvset(ENVVAR, None):
+            assert getenv(ENVVAR) is None
+            with localenvset(ENVVAR, "baz"):
+                assert getenv(ENVVAR) == "baz"
+            assert getenv(ENVVAR) is None
+        assert getenv(ENVVAR) == "bar"
+    assert getenv(ENVVAR) == "foo"
+
+
+def test_localenvset_error() -> None:
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with localenvset(ENVVAR, "bar"):
+            assert getenv(ENVVAR) == "bar"
+            raise RuntimeError("Catch this!")
+    assert getenv(ENVVAR) == "foo"
+
+
+def test_localenvset_decorator() -> None:
+    @localenvset(ENVVAR, "bar")
+    def func() -> str | None:
+        return getenv(ENVVAR)
+
+    assert func() == "bar"
+    assert getenv(ENVVAR) == "foo"
+
+
+def test_getenv_sees_os_environ(monkeypatch: pytest.MonkeyPatch) -> None:
+    with localenvset("MORECONTEXT_OTHER", "x"):
+        monkeypatch.setenv(ENVVAR, "changed")
+        assert getenv(ENVVAR) == "changed"
+
+
+def test_environ_for_subprocess() -> None:
+    env = environ_for_subprocess()
+    assert env == dict(os.environ)
+    with localenvset(ENVVAR, "bar"):
+        env = environ_for_subprocess()
+        assert env[ENVVAR] == "bar"
+        env["MORECONTEXT_BAR"] = "x"
+        assert "MORECONTEXT_BAR" not in os.environ
+        r = subprocess.run(
+            [sys.executable, "-c", f"import os; print(os.environ[{ENVVAR!r}])"],
+            env=environ_for_subprocess(),
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+        assert r.stdout.strip() == "bar"
+    assert environ_for_subprocess()[ENVVAR] == "foo"
+
+
+def test_localenvset_threads() -> None:
+    def worker(value: str) -> str | None:
+        with localenvset(ENVVAR, value):
+            return getenv(ENVVAR)
+
+    with localenvset(ENVVAR, "main"):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(worker, [f"t{i}" for i in range(8)]))
+            # New threads don't see the main thread's overrides
+            assert pool.submit(getenv, ENVVAR).result() == "foo"
+        assert getenv(ENVVAR) == "main"
+    assert results == [f"t{i}" for i in range(8)]
+
+
+def test_localenvset_tasks() -> None:
+    async def worker(value: str) -> str | None:
+        async with localenvset(ENVVAR, value):
+            await asyncio.sleep(0.01)
+            return getenv(ENVVAR)
+
+    async def main() -> list[str | None]:
+        tasks = [asyncio.create_task(worker(f"t{i}")) for i in range(4)]
+        await asyncio.sleep(0)
+        assert getenv(ENVVAR) == "foo"
+        return list(await asyncio.gather(*tasks))
+
+    assert asyncio.run(main()) == [f"t{i}" for i in range(4)]
+
+
+def test_localenvset_inherited_by_tasks() -> None:
+    async def child() -> str | None:
+        return getenv(ENVVAR)
+
+    async def main() -> str | None:
+        with localenvset(ENVVAR, "bar"):
+            return await asyncio.create_task(child())
+
+    assert asyncio.run(main()) == "bar"
@@ -0,0 +1,166 @@
+from __future__ import annotations
+import asyncio
+from io import StringIO
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+import pytest
+from morecontext import (
+    MutationTrace,
+    TraceRecord,
+    additem,
+    attrdel,
+    attrset,
+    dirchanged,
+    envset,
+    itemset,
+)
+
+ENVVAR = "MORECONTEXT_FOO"
+
+
+def summarize(records: list[TraceRecord]) -> list[tuple[str, ...]]:
+    return [(r.action, r.manager, r.key or "", r.old, r.new) for r in records]
+
+
+def test_mutationtrace(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    obj = SimpleNamespace(foo=42)
+    d: dict[str, Any] = {"bar": [1, 2]}
+    lst: list[str] = []
+    starting_dir = os.getcwd()
+    with MutationTrace() as trace:
+        with attrset(obj, "foo", "new"):
+            with itemset(d, "baz", 1):
+                with envset(ENVVAR, "bar"):
+                    with additem(lst, "x"):
+                        with dirchanged(tmp_path):
+                            pass
+    assert summarize(trace.records()) == [
+        ("set", "attrset", "'foo'", "42", "'new'"),
+        ("set", "itemset", "'baz'", "<unset>", "1"),
+        ("set", "envset", repr(ENVVAR), "'foo'", "'bar'"),
+        ("set", "additem", "", "<unset>", "'x'"),
+        ("set", "dirchanged", "", repr(starting_dir), repr(str(tmp_path))),
+        ("restore", "dirchanged", "", repr(str(tmp_path)), repr(starting_dir)),
+        ("restore", "additem", "", "'x'", "<unset>"),
+        ("restore", "envset", repr(ENVVAR), "'bar'", "'foo'"),
+        ("restore", "itemset", "'baz'", "1", "<unset>"),
+        ("restore", "attrset", "'foo'", "'new'", "42"),
+    ]
+    r = trace.records()[0]
+    assert r.target == f"<SimpleNamespace object at {id(obj):#x}>"
+    assert trace.records()[2].target == "os.environ"
+    assert trace.records()[4].target == "cwd"
+    assert r.task is None
+    assert trace.unrestored() == []
+    assert str(r).endswith(
+        f"attrset#{r.manager_id:x} set {r.target}['foo']: 42 -> 'new'"
+    )
+
+
+def test_mutationtrace_inactive() -> None:
+    trace = MutationTrace()
+    obj = SimpleNamespace(foo=42)
+    with attrset(obj, "foo", "new"):
+        pass
+    with trace:
+        pass
+    with attrset(obj, "foo", "new"):
+        pass
+    assert trace.records() == []
+
+
+def test_mutationtrace_untraced_managers() -> None:
+    obj = SimpleNamespace(foo=42)
+    with MutationTrace() as trace:
+        with attrdel(obj, "foo"):
+            pass
+    assert trace.records() == []
+
+
+def test_mutationtrace_unrestored() -> None:
+    obj = SimpleNamespace(foo=42)
+    with MutationTrace() as trace:
+        leaked = attrset(obj, "foo", "leaked")
+        leaked.__enter__()
+        with attrset(obj, "foo", "ok"):
+            pass
+    assert summarize(trace.unrestored()) == [
+        ("set", "attrset", "'foo'", "42", "'leaked'")
+    ]
+    leaked.__exit__(None, None, None)
+
+
+def test_mutationtrace_maxlen_reprs() -> None:
+    obj = SimpleNamespace(foo=42)
+    with MutationTrace(maxlen=3, reprs=False) as trace:
+        for i in range(5):
+            with attrset(obj, "foo", str(i)):
+                pass
+    assert summarize(trace.records()) == [
+        ("restore", "attrset", "'foo'", "str", "int"),
+        ("set", "attrset", "'foo'", "int", "str"),
+        ("restore", "attrset", "'foo'", "str", "int"),
+    ]
+
+
+def test_mutationtrace_task() -> None:
+    obj = SimpleNamespace(foo=42)
+
+    async def main() -> None:
+        async with attrset(obj, "foo", "new"):
+            pass
+
+    with MutationTrace() as trace:
+        asyncio.run(main())
+    records = trace.records()
+    assert len(records) == 2
+    assert all(r.task is not None for r in records)
+
+
+def test_mutationtrace_task_out_of_order() -> None:
+    obj = SimpleNamespace(foo=42)
+
+    async def main() -> None:
+        first_entered = asyncio.Event()
+        second_entered = asyncio.Event()
+
+        async def first() -> None:
+            async with attrset(obj, "foo", "first"):
+                first_entered.set()
+                await second_entered.wait()
+
+        async def second() -> None:
+            await first_entered.wait()
+            async with attrset(obj, "foo", "second"):
+                second_entered.set()
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(first(), second())
+
+    with MutationTrace() as trace:
+        asyncio.run(main())
+    assert obj.foo == 42
+    assert [r.action for r in trace.records()] == [
+        "set",
+        "set",
+        "restore",
+        "restore",
+    ]
+    assert trace.unrestored() == []
+
+
+def test_mutationtrace_dump() -> None:
+    obj = SimpleNamespace(foo=42)
+    with MutationTrace() as trace:
+        with attrset(obj, "foo", "new"):
+            pass
+    fp = StringIO()
+    trace.dump(fp)
+    lines = fp.getvalue().splitlines()
+    assert [json.loads(ln)["action"] for ln in lines] == ["set", "restore"]
+    trace.clear()
+    assert trace.records() == []
@@ -0,0 +1,163 @@
+from __future__ import annotations
+from typing import Any
+import pytest
+from morecontext import (
+    LazyOpenClosable,
+    LingeringOpenClosable,
+    OpenClosable,
+    OpenClosablePool,
+    ThreadSafeOpenClosable,
+)
+
+
+class Resource(OpenClosable):
+    def __init__(self, key: str, log: list[str]) -> None:
+        self.key = key
+        self.log = log
+
+    def open(self) -> None:  # noqa: A003
+        self.log.append(f"open {self.key}")
+
+    def close(self) -> None:
+        self.log.append(f"close {self.key}")
+
+
+class LingeringResource(LingeringOpenClosable, Resource):
+    linger = 60
+
+
+def test_openclosablepool() -> None:
+    log: list[str] = []
+    pool: OpenClosablePool[str, Resource] = OpenClosablePool(
+        lambda key: Resource(key, log), maxsize=2
+    )
+    a = pool.get("a")
+    assert pool.get("a") is a
+    with a:
+        with pool.get("a"):
+            assert log == ["open a"]
+    assert log == ["open a", "close a"]
+    assert len(pool) == 1
+    assert "a" in pool
+
+
+def test_openclosablepool_lru() -> None:
+    log: list[str] = []
+    pool: OpenClosablePool[str, Resource] = OpenClosablePool(
+        lambda key: Resource(key, log), maxsize=2
+    )
+    a = pool.get("a")
+    b = pool.get("b")
+    assert pool.get("a") is a
+    pool.get("c")
+    assert len(pool) == 2
+    assert "a" in pool
+    assert "b" not in pool
+    assert pool.get("b") is not b
+
+
+def test_openclosablepool_entered_not_evicted() -> None:
+    log: list[str] = []
+    pool: OpenClosablePool[str, Resource] = OpenClosablePool(
+        lambda key: Resource(key, log), maxsize=1
+    )
+    with pool.get("a") as a:
+        with pool.get("b") as b:
+            assert len(pool) == 2
+            with pool.get("c"):
+                assert len(pool) == 3
+                assert pool.get("a") is a
+                assert pool.get("b") is b
+            # Eviction only happens when a new instance is added
+            assert len(pool) == 3
+        pool.get("d")
+        assert list(pool._instances) == ["a", "d"]
+    pool.get("e")
+    assert list(pool._instances) == ["e"]
+
+
+class EnteredFlag(OpenClosable):
+    # Uses an attribute name that the pool must not rely on
+    def open(self) -> None:  # noqa: A003
+        self._entered = True
+
+    def close(self) -> None:
+        self._entered = False
+
+
+@pytest.mark.parametrize(
+    "cls", [EnteredFlag, LazyOpenClosable, ThreadSafeOpenClosable]
+)
+def test_openclosablepool_entered_not_evicted_subclasses(
+    cls: type[OpenClosable],
+) -> None:
+    pool: OpenClosablePool[str, OpenClosable] = OpenClosablePool(
+        lambda _key: cls(), maxsize=1
+    )
+    with pool.get("a") as a:
+        pool.get("b")
+        assert list(pool._instances) == ["a", "b"]
+        assert pool.get("a") is a
+    pool.get("c")
+    assert list(pool._instances) == ["c"]
+
+
+def test_openclosablepool_lingering() -> None:
+    log: list[str] = []
+    pool: OpenClosablePool[str, Resource] = OpenClosablePool(
+        lambda key: LingeringResource(key, log), maxsize=2
+    )
+    for key in ["a", "b", "a", "b"]:
+        with pool.get(key):
+            pass
+    assert log == ["open a", "open b"]
+    with pool.get("c"):
+        assert log == ["open a", "open b", "close a", "open c"]
+    pool.clear()
+    assert log == ["open a", "open b", "close a", "open c", "close b", "close c"]
+    assert len(pool) == 0
+
+
+def test_openclosablepool_weight() -> None:
+    log: list[str] = []
+    pool: OpenClosablePool[str, Resource] = OpenClosablePool(
+        lambda key: Resource(key, log),
+        maxsize=None,
+        weigher=lambda r: len(r.key),
+        maxweight=5,
+    )
+    pool.get("aa")
+    pool.get("bbb")
+    assert pool.weight == 5
+    pool.get("c")
+    assert "aa" not in pool
+    assert pool.weight == 4
+    pool.get("ddddd")
+    assert list(pool._instances) == ["ddddd"]
+    assert pool.weight == 5
+
+
+def test_openclosablepool_clear() -> None:
+    log: list[str] = []
+    pool: OpenClosablePool[Any, Resource] = OpenClosablePool(
+        lambda key: Resource(key, log)
+    )
+    pool.get(None)
+    with pool.get("a"):
+        pool.clear()
+        assert list(pool._instances) == ["a"]
+    pool.clear()
+    assert len(pool) == 0
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"maxsize": 0},
+        {"weigher": len},
+        {"maxweight": 5},
+    ],
+)
+def test_openclosablepool_bad_args(kwargs: dict[str, Any]) -> None:
+    with pytest.raises(ValueError):
+        OpenClosablePool(lambda key: Resource(key, []), **kwargs)
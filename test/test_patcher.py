@@ -0,0 +1,113 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+import pytest
+from morecontext import Patcher, attrset
+
+ENVVAR = "MORECONTEXT_FOO"
+
+
+def test_patcher(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    monkeypatch.delenv(ENVVAR + "2", raising=False)
+    obj = SimpleNamespace(foo=42, bar=23)
+    d: dict[str, Any] = {"foo": 42, "bar": 23}
+    lst = [1, 2, 3]
+    starting_dir = os.getcwd()
+    with Patcher() as p:
+        p.setattr(obj, "foo", "new")
+        p.setattr(obj, "baz", "new")
+        p.delattr(obj, "bar")
+        p.delattr(obj, "quux")
+        p.setitem(d, "foo", "new")
+        p.setitem(d, "baz", "new")
+        p.delitem(d, "bar")
+        p.delitem(d, "quux")
+        p.setenv(ENVVAR, "bar")
+        p.setenv(ENVVAR + "2", "bar")
+        p.chdir(tmp_path)
+        p.append(lst, 42)
+        p.append(lst, 0, prepend=True)
+        assert obj == SimpleNamespace(foo="new", baz="new")
+        assert d == {"foo": "new", "baz": "new"}
+        assert os.environ[ENVVAR] == "bar"
+        assert os.environ[ENVVAR + "2"] == "bar"
+        assert Path(os.getcwd()) == tmp_path
+        assert lst == [0, 1, 2, 3, 42]
+    assert obj == SimpleNamespace(foo=42, bar=23)
+    assert d == {"foo": 42, "bar": 23}
+    assert os.environ[ENVVAR] == "foo"
+    assert ENVVAR + "2" not in os.environ
+    assert os.getcwd() == starting_dir
+    assert lst == [1, 2, 3]
+    assert len(p) == 0
+
+
+def test_patcher_same_target_twice() -> None:
+    obj = SimpleNamespace(foo=42)
+    with Patcher() as p:
+        p.setattr(obj, "foo", 1)
+        p.setattr(obj, "foo", 2)
+        assert len(p) == 2
+        p.delattr(obj, "foo")
+    assert obj.foo == 42
+
+
+def test_patcher_unsetenv(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(ENVVAR, "foo")
+    with Patcher() as p:
+        p.setenv(ENVVAR, None)
+        assert ENVVAR not in os.environ
+        p.setenv(ENVVAR, None)
+        assert len(p) == 1
+    assert os.environ[ENVVAR] == "foo"
+
+
+def test_patcher_error() -> None:
+    obj = SimpleNamespace(foo=42)
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with Patcher() as p:
+            p.setattr(obj, "foo", "new")
+            raise RuntimeError("Catch this!")
+    assert obj.foo == 42
+
+
+def test_patcher_enter() -> None:
+    obj = SimpleNamespace(foo=42, bar=23)
+    with Patcher() as p:
+        p.setattr(obj, "foo", "new")
+        assert p.enter(attrset(obj, "bar", "new")) is None
+        assert obj == SimpleNamespace(foo="new", bar="new")
+    assert obj == SimpleNamespace(foo=42, bar=23)
+
+
+def test_patcher_restore() -> None:
+    obj = SimpleNamespace(foo=42)
+    p = Patcher()
+    p.setattr(obj, "foo", "new")
+    assert obj.foo == "new"
+    p.restore()
+    assert obj.foo == 42
+    p.setattr(obj, "foo", "newer")
+    assert obj.foo == "newer"
+    p.restore()
+    assert obj.foo == 42
+
+
+def test_patcher_undo_error() -> None:
+    class Failing:
+        def __enter__(self) -> None:
+            pass
+
+        def __exit__(self, *_args: Any) -> None:
+            raise RuntimeError("Exit failed")
+
+    obj = SimpleNamespace(foo=42, bar=23)
+    with pytest.raises(RuntimeError, match="Exit failed"):
+        with Patcher() as p:
+            p.setattr(obj, "foo", "new")
+            p.enter(Failing())
+            p.setattr(obj, "bar", "new")
+    assert obj == SimpleNamespace(foo=42, bar=23)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+from collections.abc import Iterator
+from pathlib import Path
+import sys
+import pytest
+from morecontext import syspathadd
+
+
+@pytest.fixture
+def plugin_dir(tmp_path: Path) -> Iterator[Path]:
+    (tmp_path / "mc_plugin_mod.py").write_text("VALUE = 42\n")
+    (tmp_path / "mc_plugin_pkg").mkdir()
+    (tmp_path / "mc_plugin_pkg" / "__init__.py").write_text("")
+    (tmp_path / "mc_plugin_pkg" / "sub.py").write_text("VALUE = 23\n")
+    (tmp_path / "mc_plugin_ns").mkdir()
+    (tmp_path / "mc_plugin_ns" / "mod.py").write_text("")
+    yield tmp_path
+    for name in list(sys.modules):
+        if name.startswith("mc_plugin_"):
+            del sys.modules[name]
+
+
+def test_syspathadd(plugin_dir: Path) -> None:
+    path = str(plugin_dir)
+    before = list(sys.path)
+    with syspathadd(plugin_dir):
+        assert sys.path == [*before, path]
+        import mc_plugin_mod  # type: ignore[import-not-found]
+
+        assert mc_plugin_mod.VALUE == 42
+        assert path in sys.path_importer_cache
+    assert sys.path == before
+    assert path not in sys.path_importer_cache
+    assert "mc_plugin_mod" in sys.modules
+
+
+def test_syspathadd_prepend(plugin_dir: Path) -> None:
+    path = str(plugin_dir)
+    before = list(sys.path)
+    with syspathadd(path, prepend=True):
+        assert sys.path == [path, *before]
+    assert sys.path == before
+
+
+def test_syspathadd_error(plugin_dir: Path) -> None:
+    before = list(sys.path)
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with syspathadd(plugin_dir):
+            raise RuntimeError("Catch this!")
+    assert sys.path == before
+
+
+def test_syspathadd_new_module(plugin_dir: Path) -> None:
+    with syspathadd(plugin_dir):
+        import mc_plugin_mod  # noqa: F401
+    # Without invalidation, the directory's finder would still be using its
+    # cached listing of the directory.
+    (plugin_dir / "mc_plugin_new.py").write_text("VALUE = 17\n")
+    with syspathadd(plugin_dir):
+        import mc_plugin_new  # type: ignore[import-not-found]
+
+        assert mc_plugin_new.VALUE == 17
+
+
+def test_syspathadd_evict_modules(plugin_dir: Path) -> None:
+    with syspathadd(plugin_dir, evict_modules=True):
+        import mc_plugin_mod  # noqa: F401
+        import mc_plugin_ns.mod  # type: ignore[import-not-found]  # noqa: F401
+        import mc_plugin_pkg.sub  # type: ignore[import-not-found]  # noqa: F401
+
+        assert "mc_plugin_pkg.sub" in sys.modules
+    for name in [
+        "mc_plugin_mod",
+        "mc_plugin_ns",
+        "mc_plugin_ns.mod",
+        "mc_plugin_pkg",
+        "mc_plugin_pkg.sub",
+    ]:
+        assert name not in sys.modules
+    assert "pytest" in sys.modules
+
+
+def test_syspathadd_evict_modules_imported_before(plugin_dir: Path) -> None:
+    with syspathadd(plugin_dir):
+        import mc_plugin_mod  # noqa: F401
+
+        with syspathadd(plugin_dir, evict_modules=True):
+            import mc_plugin_pkg.sub  # noqa: F401
+        assert "mc_plugin_mod" in sys.modules
+        assert "mc_plugin_pkg.sub" not in sys.modules
+
+
+def test_syspathadd_evict_modules_other_entry(plugin_dir: Path) -> None:
+    (plugin_dir / "lib").mkdir()
+    (plugin_dir / "lib" / "mc_plugin_inner.py").write_text("")
+    with syspathadd(plugin_dir / "lib"):
+        with syspathadd(plugin_dir, evict_modules=True):
+            import mc_plugin_inner  # type: ignore[import-not-found]  # noqa: F401
+            import mc_plugin_mod  # noqa: F401
+        assert "mc_plugin_inner" in sys.modules
+        assert "mc_plugin_mod" not in sys.modules
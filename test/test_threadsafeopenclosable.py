@@ -0,0 +1,66 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import pytest
+from morecontext import OpenClosable, ThreadSafeOpenClosable
+
+
+class OpenCloser(ThreadSafeOpenClosable):
+    def __init__(self, fail: int = 0) -> None:
+        self.calls: list[str] = []
+        self.fail = fail
+
+    def open(self) -> None:  # noqa: A003
+        self.calls.append("open")
+        time.sleep(0.01)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("Open failed")
+        self.calls.append("opened")
+
+    def close(self) -> None:
+        self.calls.append("close")
+        time.sleep(0.01)
+        self.calls.append("closed")
+
+
+def test_threadsafeopenclosable() -> None:
+    oc = OpenCloser()
+    assert isinstance(oc, OpenClosable)
+    assert oc.calls == []
+    with oc as oc2:
+        assert oc is oc2
+        assert oc.calls == ["open", "opened"]
+        with oc:
+            assert oc.calls == ["open", "opened"]
+        assert oc.calls == ["open", "opened"]
+    assert oc.calls == ["open", "opened", "close", "closed"]
+
+
+def test_threadsafeopenclosable_threads() -> None:
+    oc = OpenCloser()
+    barrier = threading.Barrier(8)
+
+    def worker() -> list[str]:
+        barrier.wait()
+        with oc:
+            seen = list(oc.calls)
+            time.sleep(0.01)
+        return seen
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        seen = list(pool.map(lambda _: worker(), range(8)))
+    assert seen == [["open", "opened"]] * 8
+    assert oc.calls == ["open", "opened", "close", "closed"]
+
+
+def test_threadsafeopenclosable_open_error() -> None:
+    oc = OpenCloser(fail=1)
+    with pytest.raises(RuntimeError, match="Open failed"):
+        with oc:
+            pass  # pragma: no cover
+    assert oc.calls == ["open"]
+    with oc:
+        assert oc.calls == ["open", "open", "opened"]
+    assert oc.calls == ["open", "open", "opened", "close", "closed"]
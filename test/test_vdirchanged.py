@@ -0,0 +1,120 @@
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+import threading
+import pytest
+from morecontext import vdirchanged, vgetcwd, vlistdir, vopen, vresolve, vstat
+
+pytestmark = pytest.mark.skipif(
+    os.stat not in os.supports_dir_fd, reason="Requires dir_fd support"
+)
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    (tmp_path / "foo").mkdir()
+    (tmp_path / "foo" / "bar.txt").write_text("In foo\n")
+    (tmp_path / "foo" / "sub").mkdir()
+    (tmp_path / "foo" / "sub" / "bar.txt").write_text("In foo/sub\n")
+    (tmp_path / "baz").mkdir()
+    (tmp_path / "baz" / "bar.txt").write_text("In baz\n")
+    return tmp_path
+
+
+def test_vdirchanged(tree: Path) -> None:
+    starting_dir = os.getcwd()
+    assert vgetcwd() == starting_dir
+    with vdirchanged(tree / "foo"):
+        assert os.getcwd() == starting_dir
+        assert vgetcwd() == str(tree / "foo")
+        with vopen("bar.txt") as fp:
+            assert fp.read() == "In foo\n"
+        assert sorted(vlistdir()) == ["bar.txt", "sub"]
+        assert vlistdir("sub") == ["bar.txt"]
+        assert vstat("bar.txt").st_size == 7
+        assert vresolve("sub/../bar.txt") == str(tree / "foo" / "bar.txt")
+        with vdirchanged("sub"):
+            assert vgetcwd() == str(tree / "foo" / "sub")
+            with vopen("bar.txt", "rb") as fp:
+                assert fp.read() == b"In foo/sub\n"
+            with vdirchanged(tree / "baz"):
+                assert vgetcwd() == str(tree / "baz")
+                with vopen("bar.txt") as fp:
+                    assert fp.read() == "In baz\n"
+            assert vgetcwd() == str(tree / "foo" / "sub")
+        assert vgetcwd() == str(tree / "foo")
+    assert vgetcwd() == starting_dir
+
+
+def test_vdirchanged_error(tree: Path) -> None:
+    starting_dir = os.getcwd()
+    with pytest.raises(RuntimeError, match="Catch this!"):
+        with vdirchanged(tree / "foo"):
+            assert vgetcwd() == str(tree / "foo")
+            raise RuntimeError("Catch this!")
+    assert vgetcwd() == starting_dir
+
+
+def test_vdirchanged_nonexistent(tree: Path) -> None:
+    with vdirchanged(tree):
+        with pytest.raises(FileNotFoundError):
+            with vdirchanged("nonexistent"):
+                raise AssertionError("Not reached")  # pragma: no cover
+        assert vgetcwd() == str(tree)
+
+
+def test_vdirchanged_relative(tree: Path) -> None:
+    with vdirchanged(tree):
+        with vdirchanged(Path("foo")):
+            assert vgetcwd() == str(tree / "foo")
+
+
+def test_vopen_write(tree: Path) -> None:
+    with vdirchanged(tree / "baz"):
+        with vopen("new.txt", "w", encoding="utf-8") as fp:
+            fp.write("Written\n")
+    assert (tree / "baz" / "new.txt").read_text(encoding="utf-8") == "Written\n"
+
+
+def test_vhelpers_no_vdir(tree: Path) -> None:
+    starting_dir = os.getcwd()
+    try:
+        os.chdir(tree / "foo")
+        with vopen("bar.txt") as fp:
+            assert fp.read() == "In foo\n"
+        assert sorted(vlistdir()) == ["bar.txt", "sub"]
+        assert vstat("sub/bar.txt").st_size == 11
+        assert vresolve("sub") == str(tree / "foo" / "sub")
+    finally:
+        os.chdir(starting_dir)
+
+
+def test_vdirchanged_threads(tree: Path) -> None:
+    barrier = threading.Barrier(2)
+
+    def worker(name: str) -> str:
+        with vdirchanged(tree / name):
+            barrier.wait()
+            with vopen("bar.txt") as fp:
+                return str(fp.read())
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(worker, ["foo", "baz"]))
+    assert results == ["In foo\n", "In baz\n"]
+
+
+def test_vdirchanged_tasks(tree: Path) -> None:
+    async def worker(name: str) -> str:
+        with vdirchanged(tree / name):
+            # Let the other task enter its own vdirchanged() before reading
+            await asyncio.sleep(0.01)
+            with vopen("bar.txt") as fp:
+                return str(fp.read())
+
+    async def main() -> list[str]:
+        return list(await asyncio.gather(worker("foo"), worker("baz")))
+
+    assert asyncio.run(main()) == ["In foo\n", "In baz\n"]
+    assert vgetcwd() == os.getcwd()